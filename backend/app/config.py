@@ -12,8 +12,49 @@ class Settings(BaseSettings):
         Path(__file__).resolve().parent.parent / "models" / "saved" / "plant_disease_model.pth"
     )
     model_backbone: str = "efficientnet_b0"
+    # Optional second checkpoint loaded at startup and served to
+    # candidate_traffic_percent of requests (A/B rollout). More models can be
+    # loaded, activated and routed at runtime through /api/models.
+    candidate_model_path: str = ""
+    candidate_model_backbone: str = ""
+    candidate_traffic_percent: float = 0.0
+    # Required in the X-Admin-Token header by /api/models write endpoints;
+    # empty disables them.
+    admin_token: str = ""
     num_classes: int = 38
     image_size: int = 224
+    # One of app.models.backends.BACKENDS: eager, compile, torchscript,
+    # dynamic_int8, static_int8, onnx. Artifact backends are produced by
+    # `python -m training.export`.
+    inference_backend: str = "eager"
+
+    # Dynamic micro-batching: concurrent requests are grouped into one forward
+    # pass of at most batch_max_size images, waiting at most batch_max_wait_ms.
+    batch_max_size: int = 16
+    batch_max_wait_ms: float = 5.0
+
+    # Inference executor: "thread" shares one model (and batching engine) across
+    # workers. "process" spawns worker processes that each load their own
+    # classifier, batching engine and plant guard at startup; the API process
+    # loads none, and /api/health/ready waits for every worker. The workers'
+    # in-memory result cache, single-flight table, batching/TTA/model stats and
+    # /api/models changes are per process: /api/health shows the API process
+    # only, so set result_cache_db to share cached results and
+    # PROMETHEUS_MULTIPROC_DIR for /metrics. torch_num_threads=0 splits the
+    # available cores evenly across worker processes, and leaves torch's
+    # default (all cores, for the one batching thread) in thread mode.
+    executor_kind: str = "thread"
+    executor_workers: int = 8
+    executor_max_queue: int = 32
+    executor_retry_after: int = 5
+    torch_num_threads: int = 0
+
+    # Prediction result cache keyed by image hash + model/guard identity.
+    # result_cache_size=0 disables it; result_cache_db enables a SQLite tier
+    # shared by all workers on the host.
+    result_cache_size: int = 1024
+    result_cache_ttl: float = 24 * 60 * 60
+    result_cache_db: str = ""
 
     allowed_origins: list[str] = [
         "http://localhost:5173",
@@ -26,10 +67,58 @@ class Settings(BaseSettings):
     allow_all_origins: bool = True
 
     max_file_size: int = 10 * 1024 * 1024  # 10 MB
+    # Decompression-bomb guard: uploads whose header declares more pixels are
+    # rejected before any pixel data is decoded.
+    max_image_pixels: int = 40_000_000
     allowed_extensions: set[str] = {"jpg", "jpeg", "jfif", "png", "webp", "bmp", "dib", "gif", "tiff", "tif", "avif"}
 
+    # /api/predict/batch: files per request, and files per guard/classifier pass.
+    batch_request_max_files: int = 64
+    batch_request_chunk_size: int = 16
+
+    # /api/jobs: asynchronous predictions. job_queue_db selects the SQLite
+    # queue (jobs survive restarts and every worker on the host shares it);
+    # empty keeps jobs in memory. job_queue_max_items bounds images waiting.
+    job_queue_db: str = ""
+    job_queue_max_items: int = 1024
+    job_workers: int = 2
+    job_batch_size: int = 16
+    job_ttl_seconds: int = 3600
+
+    # Cache-Control max-age (seconds) of /api/classes; clients revalidate with its ETag.
+    classes_cache_max_age: int = 3600
+
+    # Plant guard tier:
+    #   zero_shot - guard_clip_model scored against the label prompts in
+    #               plant_guard.ALL_LABELS with guard_plant_threshold. A small
+    #               CLIP such as "openai/clip-vit-base-patch32" is much cheaper.
+    #   clip_head - a logistic head over CLIP image embeddings trained by
+    #               `python -m training.train_guard`; the CLIP model and the
+    #               calibrated threshold come from guard_head_path.
+    guard_tier: str = "zero_shot"
     guard_clip_model: str = "openai/clip-vit-large-patch14"
     guard_plant_threshold: float = 0.5
+    guard_head_path: str = str(
+        Path(__file__).resolve().parent.parent / "models" / "saved" / "plant_guard_head.pth"
+    )
+
+    # Classifier-feature OOD guard: the classifier runs first and its score
+    # (energy, msp or mahalanobis) accepts or rejects the image outright; only
+    # scores between the two in-distribution quantiles consult the plant guard.
+    # Requires OOD statistics in the checkpoint (`python -m training.ood`).
+    ood_guard: bool = False
+    ood_method: str = "energy"
+    ood_accept_quantile: float = 0.05
+    ood_reject_quantile: float = 0.001
+    guard_cache_dir: str = str(Path(__file__).resolve().parent.parent / "models" / "cache")
+
+    # Test-time augmentation: images whose top-1 probability is below the
+    # threshold get one more batched forward pass over tta_views (hflip, vflip,
+    # center_crop, top_left_crop, bottom_right_crop), and the probabilities of
+    # all views are averaged. Confident images pay nothing extra.
+    tta_enabled: bool = False
+    tta_confidence_threshold: float = 0.6
+    tta_views: list[str] = ["hflip", "vflip", "center_crop"]
 
     class Config:
         env_file = ".env"
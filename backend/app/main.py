@@ -1,25 +1,54 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 
 from app.config import settings
+from app.routes.jobs import router as jobs_router
+from app.routes.models import router as models_router
 from app.routes.predict import router as predict_router
-from app.services.prediction import get_model
+from app.routes.uploads import UploadSizeLimit, upload_body_limits
+from app.services.catalog import class_catalog_payload
+from app.services.executor import get_executor, shutdown_executor
+from app.services.jobs import get_job_queue, shutdown_job_queue, start_job_workers
+from app.services.prediction import get_result_cache, single_flight_stats
+from app.services.registry import registry
+from app.services.tta import tta_stats
+from app.services.warmup import MISSING, READY, readiness, warm_up_models
+from app.utils.memory import load_stats
+from app.utils.metrics import render as render_metrics
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    model = get_model()
-    if model is not None:
-        print(f"Model loaded successfully ({settings.model_backbone})")
-    else:
+async def _warm_up():
+    await warm_up_models(get_executor())
+    if readiness.components["classifier"] == MISSING:
         print(
             "WARNING: No trained model found. The API will return errors for "
             "predictions until a model is trained and placed at: "
             f"{settings.model_path}"
         )
+    elif readiness.components["classifier"] == READY:
+        print(f"Model loaded successfully ({settings.model_backbone}, {settings.inference_backend} backend)")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_executor()
+    class_catalog_payload()
+    # Load models in the background so /api/health/live answers immediately;
+    # /api/health/ready turns 200 once everything is loaded and warm.
+    warmup_task = asyncio.create_task(_warm_up())
+    job_tasks = start_job_workers()
     yield
+    warmup_task.cancel()
+    for task in job_tasks:
+        task.cancel()
+    await asyncio.gather(*job_tasks, return_exceptions=True)
+    shutdown_executor()
+    shutdown_job_queue()
+    registry.close()
 
 
 app = FastAPI(
@@ -28,6 +57,8 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Added first so CORS (outermost) also decorates its 413 responses.
+app.add_middleware(UploadSizeLimit, limits=upload_body_limits())
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"] if settings.allow_all_origins else settings.allowed_origins,
@@ -37,14 +68,46 @@ app.add_middleware(
 )
 
 app.include_router(predict_router)
+app.include_router(models_router)
+app.include_router(jobs_router)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/api/health/live")
+async def liveness_check():
+    return {"status": "alive"}
+
+
+@app.get("/api/health/ready")
+async def readiness_check():
+    if not readiness.ready:
+        return JSONResponse(status_code=503, content={"status": "starting", **readiness.to_dict()})
+    return {"status": "ready", **readiness.to_dict()}
 
 
 @app.get("/api/health")
 async def health_check():
-    model = get_model()
+    # Never block the event loop on a model load that warm-up is still doing.
+    entry = registry.active() if readiness.components["classifier"] == READY else None
     return {
         "status": "healthy",
-        "model_loaded": model is not None,
+        "model_loaded": readiness.components["classifier"] == READY,
+        "ready": readiness.ready,
         "model_backbone": settings.model_backbone,
+        "inference_backend": settings.inference_backend,
         "num_classes": settings.num_classes,
+        "batching": entry.engine.stats() if entry is not None else None,
+        "executor": get_executor().stats(),
+        "cache": get_result_cache().stats(),
+        "single_flight": single_flight_stats(),
+        "jobs": get_job_queue().stats(),
+        "ood": entry.detector.stats() if entry is not None and entry.detector is not None else None,
+        "tta": {"enabled": settings.tta_enabled, **tta_stats.to_dict()},
+        "model_load": load_stats,
+        "registry": registry.stats(),
     }
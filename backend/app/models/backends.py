@@ -0,0 +1,97 @@
+"""Inference backends for the disease classifier.
+
+Every backend returns a callable mapping a ``[N, 3, H, W]`` float tensor to
+``[N, num_classes]`` logits, so the batching engine does not care which one
+is active. Backends other than ``eager``, ``compile`` and ``dynamic_int8``
+load an artifact produced from the ``.pth`` checkpoint by
+``python -m training.export``. The int8 and ONNX backends run on CPU only.
+"""
+
+import logging
+from collections.abc import Callable
+from pathlib import Path
+
+import torch
+import torch.nn as nn
+
+from app.config import settings
+from app.models.classifier import load_model
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("eager", "compile", "torchscript", "dynamic_int8", "static_int8", "onnx")
+
+ARTIFACT_SUFFIXES = {
+    "torchscript": ".ts.pt",
+    "static_int8": ".int8.ts.pt",
+    "onnx": ".onnx",
+}
+
+
+def artifact_path(model_path: str | Path, backend: str) -> Path:
+    """Location of the exported artifact for ``backend``, next to the checkpoint."""
+    model_path = Path(model_path)
+    return model_path.with_name(model_path.stem + ARTIFACT_SUFFIXES[backend])
+
+
+class OnnxRuntimeModel:
+    """Callable wrapper around an ONNX Runtime session with a torch tensor interface."""
+
+    def __init__(self, path: Path, num_threads: int = 0):
+        try:
+            import onnxruntime as ort
+        except ImportError as exc:
+            raise ImportError("The onnx backend requires onnxruntime: pip install onnxruntime") from exc
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        inputs = batch.detach().cpu().contiguous().numpy()
+        (logits,) = self.session.run(None, {self.input_name: inputs})
+        return torch.from_numpy(logits)
+
+
+def quantize_dynamic_int8(model: nn.Module) -> nn.Module:
+    return torch.ao.quantization.quantize_dynamic(model.cpu(), {nn.Linear}, dtype=torch.qint8)
+
+
+def load_inference_model(
+    backend: str | None = None,
+    model_path: str | None = None,
+    backbone: str | None = None,
+) -> Callable[[torch.Tensor], torch.Tensor] | None:
+    """Load a classifier with the given (default: configured) backend, or None if no checkpoint exists."""
+    backend = backend or settings.inference_backend
+    model_path = model_path or settings.model_path
+    if backend not in BACKENDS:
+        raise ValueError(f"Unsupported inference backend: {backend}. Choose from {', '.join(BACKENDS)}")
+
+    if backend in ARTIFACT_SUFFIXES:
+        path = artifact_path(model_path, backend)
+        if not path.exists():
+            logger.warning(
+                "No %s artifact at %s; run `python -m training.export` first. Falling back to eager.",
+                backend,
+                path,
+            )
+            return load_model(model_path, backbone)
+        if backend == "onnx":
+            return OnnxRuntimeModel(path, settings.torch_num_threads)
+        device = "cuda" if backend == "torchscript" and torch.cuda.is_available() else "cpu"
+        model = torch.jit.load(str(path), map_location=device)
+        model.eval()
+        return model
+
+    model = load_model(model_path, backbone)
+    if model is None:
+        return None
+    if backend == "compile":
+        return torch.compile(model, dynamic=True)
+    if backend == "dynamic_int8":
+        return quantize_dynamic_int8(model)
+    return model
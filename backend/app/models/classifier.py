@@ -1,3 +1,4 @@
+import json
 from pathlib import Path
 
 import torch
@@ -5,6 +6,7 @@ import torch.nn as nn
 from torchvision import models
 
 from app.config import settings
+from app.utils.memory import track_load
 
 CLASS_NAMES = [
     "Apple — Apple Scab",
@@ -241,6 +243,26 @@ DISEASE_INFO = {
 }
 
 
+def _class_entry(class_name: str) -> dict:
+    plant, _, condition = class_name.partition(" — ")
+    info = DISEASE_INFO.get(class_name, {})
+    return {
+        "class_name": class_name,
+        "plant": plant,
+        "condition": condition,
+        "is_healthy": condition.lower() == "healthy",
+        "info": {
+            "cause": info.get("cause", "Unknown"),
+            "symptoms": info.get("symptoms", "No information available."),
+            "treatment": info.get("treatment", "No information available."),
+        },
+    }
+
+
+# Per class index: everything a prediction reports about the class except its confidence.
+CLASS_TABLE = [_class_entry(name) for name in CLASS_NAMES]
+
+
 def build_model(num_classes: int, backbone: str = "efficientnet_b0") -> nn.Module:
     if backbone == "efficientnet_b0":
         model = models.efficientnet_b0(weights=None)
@@ -248,24 +270,109 @@ def build_model(num_classes: int, backbone: str = "efficientnet_b0") -> nn.Modul
     elif backbone == "resnet50":
         model = models.resnet50(weights=None)
         model.fc = nn.Linear(model.fc.in_features, num_classes)
+    elif backbone == "mobilenet_v3_small":
+        model = models.mobilenet_v3_small(weights=None)
+        model.classifier[3] = nn.Linear(model.classifier[3].in_features, num_classes)
+    elif backbone == "mobilenet_v3_large":
+        model = models.mobilenet_v3_large(weights=None)
+        model.classifier[3] = nn.Linear(model.classifier[3].in_features, num_classes)
     else:
         raise ValueError(f"Unsupported backbone: {backbone}")
     return model
 
 
-def load_model() -> nn.Module | None:
-    model_path = Path(settings.model_path)
+def supports_features(model) -> bool:
+    return isinstance(model, (models.EfficientNet, models.ResNet, models.MobileNetV3))
+
+
+def forward_with_features(model: nn.Module, x: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
+    """Run an eager classifier and also return its pooled penultimate features."""
+    if isinstance(model, models.EfficientNet):
+        features = torch.flatten(model.avgpool(model.features(x)), 1)
+        return model.classifier(features), features
+    if isinstance(model, models.ResNet):
+        x = model.maxpool(model.relu(model.bn1(model.conv1(x))))
+        x = model.layer4(model.layer3(model.layer2(model.layer1(x))))
+        features = torch.flatten(model.avgpool(x), 1)
+        return model.fc(features), features
+    if isinstance(model, models.MobileNetV3):
+        # The input of the last linear layer, after MobileNetV3's extra hidden layer.
+        features = model.classifier[:-1](torch.flatten(model.avgpool(model.features(x)), 1))
+        return model.classifier[-1](features), features
+    raise TypeError(f"Cannot extract features from {type(model).__name__}")
+
+
+def load_checkpoint(path: str | Path, device: torch.device | str = "cpu") -> dict:
+    """Read a ``.pth`` or ``.safetensors`` checkpoint with memory-mapped tensors.
+
+    Both formats come back in the layout ``training.train`` writes
+    (``model_state_dict``, ``ood_stats``, ``backbone``, ...). A bare
+    state dict is wrapped under ``model_state_dict``.
+    """
+    path = Path(path)
+    if path.suffix == ".safetensors":
+        from safetensors import safe_open
+        from safetensors.torch import load_file
+
+        tensors = load_file(str(path), device=str(device))
+        with safe_open(str(path), framework="pt") as f:
+            metadata = f.metadata() or {}
+        checkpoint = {key: json.loads(value) for key, value in metadata.items()}
+        checkpoint["model_state_dict"] = {
+            key.removeprefix("model."): value for key, value in tensors.items() if key.startswith("model.")
+        }
+        ood = {key.removeprefix("ood_stats."): value for key, value in tensors.items() if key.startswith("ood_stats.")}
+        if ood:
+            checkpoint["ood_stats"] = {
+                "class_means": ood["class_means"],
+                "precision": ood["precision"],
+                "scores": {key.removeprefix("scores."): value for key, value in ood.items() if key.startswith("scores.")},
+            }
+        return checkpoint
+
+    try:
+        checkpoint = torch.load(path, map_location=device, weights_only=True, mmap=True)
+    except RuntimeError:
+        # Legacy (non-zipfile) serialization cannot be memory-mapped.
+        checkpoint = torch.load(path, map_location=device, weights_only=True)
+    if "model_state_dict" not in checkpoint:
+        checkpoint = {"model_state_dict": checkpoint}
+    return checkpoint
+
+
+def checkpoint_model(checkpoint: dict, backbone: str | None = None) -> nn.Module:
+    """Build the eval-mode model a :func:`load_checkpoint` dict holds.
+
+    A bare state dict records no class count or backbone; the configured
+    ones (or ``backbone``) are used for it.
+    """
+    model = build_model(
+        checkpoint.get("num_classes", settings.num_classes),
+        checkpoint.get("backbone") or backbone or settings.model_backbone,
+    )
+    model.load_state_dict(checkpoint["model_state_dict"])
+    model.eval()
+    return model
+
+
+def load_model(model_path: str | None = None, backbone: str | None = None) -> nn.Module | None:
+    model_path = Path(model_path or settings.model_path)
+    backbone = backbone or settings.model_backbone
     if not model_path.exists():
         return None
 
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    model = build_model(settings.num_classes, settings.model_backbone)
+    with track_load(f"classifier:{model_path.name}") as stats:
+        checkpoint = load_checkpoint(model_path, device)
 
-    state_dict = torch.load(model_path, map_location=device, weights_only=True)
-    if "model_state_dict" in state_dict:
-        state_dict = state_dict["model_state_dict"]
-    model.load_state_dict(state_dict)
+        # Build without allocating weights and adopt the checkpoint tensors as-is:
+        # on CPU the parameters stay backed by the mmapped file, whose pages are
+        # shared by every worker process instead of copied into each heap.
+        with torch.device("meta"):
+            model = build_model(settings.num_classes, backbone)
+        model.load_state_dict(checkpoint["model_state_dict"], assign=True)
+        model.eval()
 
-    model.to(device)
-    model.eval()
+        stats["format"] = model_path.suffix.lstrip(".")
+        stats["param_mb"] = round(sum(p.numel() * p.element_size() for p in model.parameters()) / 2**20, 1)
     return model
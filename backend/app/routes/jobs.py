@@ -0,0 +1,94 @@
+import asyncio
+import json
+
+from fastapi import APIRouter, File, HTTPException, Request, UploadFile
+from fastapi.responses import StreamingResponse
+
+from app.config import settings
+from app.routes.uploads import read_upload
+from app.services.jobs import DONE, JobQueueFull, get_job_queue
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+# How often the event stream checks a job for new results.
+EVENTS_POLL_SECONDS = 0.5
+
+
+def _summary(job: dict) -> dict:
+    return {key: value for key, value in job.items() if key != "results"}
+
+
+@router.post("", status_code=202)
+async def create_job(files: list[UploadFile] = File(...)):
+    if len(files) > settings.batch_request_max_files:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many files. Maximum is {settings.batch_request_max_files} per request.",
+        )
+
+    payloads: list[memoryview | None] = []
+    errors: dict[int, dict] = {}
+    for index, file in enumerate(files):
+        payloads.append(None)
+        try:
+            payloads[index] = await read_upload(file)
+        except HTTPException as exc:
+            errors[index] = {"success": False, "error": exc.detail}
+
+    queue = get_job_queue()
+    try:
+        job_id = await asyncio.to_thread(queue.submit, [file.filename for file in files], payloads, errors)
+    except JobQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="The job queue is full. Please try again shortly.",
+            headers={"Retry-After": str(settings.executor_retry_after)},
+        )
+
+    job = await asyncio.to_thread(queue.get, job_id)
+    return {
+        **_summary(job),
+        "status_url": f"/api/jobs/{job_id}",
+        "events_url": f"/api/jobs/{job_id}/events",
+    }
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    job = await asyncio.to_thread(get_job_queue().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found. It may have expired.")
+    return job
+
+
+@router.get("/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """Server-sent events: one ``result`` event per finished image, then ``done``."""
+    queue = get_job_queue()
+    if await asyncio.to_thread(queue.get, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found. It may have expired.")
+
+    async def stream():
+        sent: set[int] = set()
+        while True:
+            job = await asyncio.to_thread(queue.get, job_id)
+            if job is None:
+                yield f"event: error\ndata: {json.dumps({'error': 'Job expired.'})}\n\n"
+                return
+            for result in job["results"]:
+                if result["index"] not in sent:
+                    sent.add(result["index"])
+                    yield f"event: result\ndata: {json.dumps(result)}\n\n"
+            if job["status"] == DONE:
+                yield f"event: done\ndata: {json.dumps(_summary(job))}\n\n"
+                return
+            if await request.is_disconnected():
+                return
+            await asyncio.sleep(EVENTS_POLL_SECONDS)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: let nginx pass events through as they are sent.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
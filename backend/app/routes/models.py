@@ -0,0 +1,70 @@
+import asyncio
+import secrets
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from pydantic import BaseModel
+
+from app.config import settings
+from app.services.registry import registry
+
+router = APIRouter(prefix="/api/models", tags=["models"])
+
+
+def require_admin(x_admin_token: str | None = Header(default=None)) -> None:
+    if not settings.admin_token:
+        raise HTTPException(status_code=403, detail="Model management is disabled. Set PDV_ADMIN_TOKEN to enable it.")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token.")
+
+
+class LoadModelRequest(BaseModel):
+    model_path: str
+    backbone: str = settings.model_backbone
+
+
+class CandidateRequest(BaseModel):
+    name: str | None = None
+    traffic_percent: float = 0.0
+
+
+@router.get("")
+async def list_models():
+    return registry.stats()
+
+
+@router.post("/{name}/load", dependencies=[Depends(require_admin)])
+async def load_model(name: str, request: LoadModelRequest):
+    # Loading takes seconds; keep the event loop (and in-flight requests) moving.
+    entry = await asyncio.to_thread(registry.load, name, request.model_path, request.backbone)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"No checkpoint found at {request.model_path}")
+    return registry.stats()
+
+
+@router.post("/{name}/activate", dependencies=[Depends(require_admin)])
+async def activate_model(name: str):
+    try:
+        registry.activate(name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Model {name!r} is not loaded.")
+    return registry.stats()
+
+
+@router.post("/candidate", dependencies=[Depends(require_admin)])
+async def set_candidate(request: CandidateRequest):
+    try:
+        registry.set_candidate(request.name, request.traffic_percent)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Model {request.name!r} is not loaded.")
+    return registry.stats()
+
+
+@router.delete("/{name}", dependencies=[Depends(require_admin)])
+async def unload_model(name: str):
+    try:
+        await asyncio.to_thread(registry.unload, name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Model {name!r} is not loaded.")
+    except ValueError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    return registry.stats()
@@ -1,61 +1,119 @@
+import json
 import logging
+import time
 
-from fastapi import APIRouter, File, HTTPException, UploadFile
+from fastapi import APIRouter, File, HTTPException, Request, UploadFile
+from fastapi.responses import Response, StreamingResponse
 
 from app.config import settings
-from app.services.prediction import predict
+from app.routes.uploads import read_upload
+from app.services.catalog import class_catalog_payload
+from app.services.executor import ExecutorSaturated, get_executor
+from app.services.prediction import predict, predict_batch
+from app.services.registry import registry
+from app.utils.metrics import ERROR, observe_stage, outcome_of
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api", tags=["prediction"])
 
 
-@router.post("/predict")
-async def predict_disease(file: UploadFile = File(...)):
-    if not file.content_type or not file.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="Uploaded file must be an image.")
-
-    image_bytes = await file.read()
+def _observe_upload_read(seconds: float, outcome: str) -> None:
+    # Routing happens later, in the executor; label by the active model.
+    entry = registry.active()
+    observe_stage("upload_read", seconds, entry.backbone if entry is not None else settings.model_backbone, outcome)
 
-    if len(image_bytes) == 0:
-        raise HTTPException(status_code=400, detail="Uploaded file is empty.")
 
-    if len(image_bytes) > settings.max_file_size:
-        size_mb = settings.max_file_size // (1024 * 1024)
+@router.post("/predict")
+async def predict_disease(file: UploadFile = File(...)):
+    start = time.perf_counter()
+    try:
+        image_bytes = await read_upload(file)
+    except HTTPException:
+        _observe_upload_read(time.perf_counter() - start, ERROR)
+        raise
+    read_seconds = time.perf_counter() - start
+
+    try:
+        result = await get_executor().run(predict, image_bytes)
+    except ExecutorSaturated as exc:
+        _observe_upload_read(read_seconds, ERROR)
         raise HTTPException(
-            status_code=413,
-            detail=f"File too large. Maximum size is {size_mb} MB.",
+            status_code=503,
+            detail="Server is busy. Please try again shortly.",
+            headers={"Retry-After": str(exc.retry_after)},
         )
 
-    result = predict(image_bytes)
-
+    _observe_upload_read(read_seconds, outcome_of(result))
     if not result["success"]:
         raise HTTPException(status_code=422, detail=result["error"])
 
     return result
 
 
-@router.get("/classes")
-async def get_classes():
-    from app.models.classifier import CLASS_NAMES, DISEASE_INFO
-
-    classes = []
-    for name in CLASS_NAMES:
-        plant, _, condition = name.partition(" — ")
-        classes.append(
-            {
-                "class_name": name,
-                "plant": plant,
-                "condition": condition,
-                "is_healthy": condition.lower() == "healthy",
-            }
+@router.post("/predict/batch")
+async def predict_disease_batch(files: list[UploadFile] = File(...)):
+    if len(files) > settings.batch_request_max_files:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many files. Maximum is {settings.batch_request_max_files} per request.",
         )
 
-    plants = sorted(set(c["plant"] for c in classes))
+    # Read everything up front: upload files are closed once the handler returns.
+    payloads: list[memoryview | None] = []
+    errors: dict[int, str] = {}
+    read_seconds: dict[int, float] = {}
+    for index, file in enumerate(files):
+        payloads.append(None)
+        start = time.perf_counter()
+        try:
+            payloads[index] = await read_upload(file)
+        except HTTPException as exc:
+            errors[index] = exc.detail
+        read_seconds[index] = time.perf_counter() - start
+
+    async def stream_results():
+        chunk_size = max(1, settings.batch_request_chunk_size)
+        for start in range(0, len(files), chunk_size):
+            indices = range(start, min(start + chunk_size, len(files)))
+            runnable = [i for i in indices if i not in errors]
+            results = {i: {"success": False, "error": errors[i]} for i in indices if i in errors}
+            if runnable:
+                try:
+                    batch_results = await get_executor().run(predict_batch, [payloads[i] for i in runnable])
+                except ExecutorSaturated:
+                    batch_results = [{"success": False, "error": "Server is busy. Please try again shortly."}] * len(
+                        runnable
+                    )
+                except Exception:
+                    # The response is already streaming: report the chunk's images and carry on.
+                    logger.exception("Batch prediction of %d images failed", len(runnable))
+                    batch_results = [{"success": False, "error": "Prediction failed. Please try again."}] * len(
+                        runnable
+                    )
+                results.update(zip(runnable, batch_results))
+            for i in indices:
+                if i in read_seconds:
+                    _observe_upload_read(read_seconds[i], outcome_of(results[i]))
+
+            yield "".join(
+                json.dumps({"index": i, "filename": files[i].filename, **results[i]}) + "\n" for i in indices
+            )
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
 
-    return {
-        "total_classes": len(CLASS_NAMES),
-        "plants": plants,
-        "classes": classes,
-        "disease_info": DISEASE_INFO,
+@router.get("/classes")
+async def get_classes(request: Request):
+    payload = class_catalog_payload()
+    representation = payload.negotiate(request.headers.get("accept-encoding", ""))
+    headers = {
+        "ETag": representation.etag,
+        "Cache-Control": f"public, max-age={settings.classes_cache_max_age}",
+        "Vary": "Accept-Encoding",
     }
+    if payload.matches(request.headers.get("if-none-match", "")):
+        return Response(status_code=304, headers=headers)
+    if representation.content_encoding:
+        headers["Content-Encoding"] = representation.content_encoding
+    return Response(content=representation.body, media_type="application/json", headers=headers)
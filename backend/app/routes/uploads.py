@@ -0,0 +1,87 @@
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+from app.config import settings
+from app.utils.image_processing import HEADER_SNIFF_BYTES, sniff_image
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Room for the multipart boundaries and part headers around each file.
+MULTIPART_OVERHEAD = 16 * 1024
+
+
+def too_large_error() -> str:
+    return f"File too large. Maximum size is {settings.max_file_size // (1024 * 1024)} MB."
+
+
+async def read_upload(file: UploadFile) -> memoryview:
+    """Read an uploaded image in chunks, rejecting it as early as possible.
+
+    Oversized uploads are refused from their declared size, or as soon as
+    the bytes read exceed ``max_file_size``, and an unsupported format or a
+    decompression bomb as soon as the image header has been read, so none of
+    them is ever buffered in full.
+
+    Returns a read-only view of the single buffer the chunks were read into,
+    which the decode stage reads in place. Only the process executor copies
+    it, to pickle it for its workers.
+
+    Raises:
+        HTTPException: 400 (not an image / empty), 413 (too large) or
+        422 (rejected from the header).
+    """
+    if not file.content_type or not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="Uploaded file must be an image.")
+    if file.size is not None and file.size > settings.max_file_size:
+        raise HTTPException(status_code=413, detail=too_large_error())
+
+    buffer = bytearray()
+    sniffing = True
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        if len(buffer) + len(chunk) > settings.max_file_size:
+            raise HTTPException(status_code=413, detail=too_large_error())
+        buffer += chunk
+        if sniffing:
+            # Views must be released before the buffer grows again.
+            with memoryview(buffer) as view, view[:HEADER_SNIFF_BYTES] as head:
+                parsed, reason = sniff_image(head)
+            if reason:
+                raise HTTPException(status_code=422, detail=reason)
+            sniffing = not parsed and len(buffer) < HEADER_SNIFF_BYTES
+
+    if not buffer:
+        raise HTTPException(status_code=400, detail="Uploaded file is empty.")
+    return memoryview(buffer).toreadonly()
+
+
+def upload_body_limits() -> dict[str, int]:
+    """Largest acceptable request body per upload endpoint."""
+    per_file = settings.max_file_size + MULTIPART_OVERHEAD
+    return {
+        "/api/predict": per_file,
+        "/api/predict/batch": per_file * settings.batch_request_max_files,
+        "/api/jobs": per_file * settings.batch_request_max_files,
+    }
+
+
+class UploadSizeLimit:
+    """ASGI middleware that answers 413 from the Content-Length header alone.
+
+    Runs before the multipart body is parsed, so an oversized upload is
+    refused without being received and spooled at all. Chunked requests
+    carry no length and are bounded by :func:`read_upload` instead.
+    """
+
+    def __init__(self, app, limits: dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if limit is not None:
+            length = dict(scope["headers"]).get(b"content-length", b"")
+            if length.isdigit() and int(length) > limit:
+                response = JSONResponse(status_code=413, content={"detail": too_large_error()})
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
@@ -0,0 +1,157 @@
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable
+from concurrent.futures import Future
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+BatchOutput = torch.Tensor | tuple[torch.Tensor, ...]
+
+_STOP = object()
+
+
+class BatchingEngine:
+    """Dynamic micro-batching scheduler for a single model.
+
+    Callers submit tensors of shape ``[n, C, H, W]`` from any thread. A worker
+    thread concatenates queued requests into one batch, bounded by
+    ``max_batch_size`` rows and ``max_wait_ms`` after the first request of the
+    batch arrives, runs ``forward`` once and hands each caller its own slice of
+    the output (a tensor, or a tuple of tensors sharing the batch dimension).
+    """
+
+    def __init__(
+        self,
+        forward: Callable[[torch.Tensor], BatchOutput],
+        max_batch_size: int,
+        max_wait_ms: float,
+        name: str = "batching-engine",
+    ):
+        self._forward = forward
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._carry = None
+        self._stats_lock = threading.Lock()
+        self._histogram: Counter[int] = Counter()
+        self._batches = 0
+        self._rows = 0
+        self._closed = False
+        # Orders submits against close(), so nothing is queued behind _STOP.
+        self._submit_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, tensor: torch.Tensor) -> Future:
+        future: Future = Future()
+        with self._submit_lock:
+            if self._closed:
+                raise RuntimeError("Batching engine is closed")
+            self._queue.put((tensor, future))
+        return future
+
+    def infer(self, tensor: torch.Tensor) -> BatchOutput:
+        return self.submit(tensor).result()
+
+    def warm_up(self, tensor: torch.Tensor) -> None:
+        """Run ``forward`` directly, bypassing the queue and the statistics."""
+        with torch.inference_mode():
+            self._forward(tensor)
+
+    def close(self) -> None:
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "batches": self._batches,
+                "rows": self._rows,
+                "mean_batch_size": round(self._rows / self._batches, 2) if self._batches else 0.0,
+                "histogram": {str(size): count for size, count in sorted(self._histogram.items())},
+            }
+
+    def _next(self, timeout: float | None):
+        if self._carry is not None:
+            item, self._carry = self._carry, None
+            return item
+        return self._queue.get(timeout=timeout)
+
+    def _collect(self) -> tuple[list, bool]:
+        first = self._next(timeout=None)
+        if first is _STOP:
+            return [], True
+
+        batch = [first]
+        rows = first[0].shape[0]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while rows < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._next(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            if rows + item[0].shape[0] > self.max_batch_size:
+                self._carry = item
+                break
+            batch.append(item)
+            rows += item[0].shape[0]
+        return batch, False
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            batch, stop = self._collect()
+            batch = [(tensor, future) for tensor, future in batch if future.set_running_or_notify_cancel()]
+            if batch:
+                self._dispatch(batch)
+
+        if self._carry is not None:
+            self._carry[1].set_exception(RuntimeError("Batching engine is closed"))
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                item[1].set_exception(RuntimeError("Batching engine is closed"))
+
+    def _dispatch(self, batch: list) -> None:
+        sizes = [tensor.shape[0] for tensor, _ in batch]
+        try:
+            inputs = batch[0][0] if len(batch) == 1 else torch.cat([tensor for tensor, _ in batch])
+            with torch.inference_mode():
+                outputs = self._forward(inputs)
+        except Exception as exc:
+            logger.exception("Batched forward pass failed (batch of %d)", sum(sizes))
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+
+        with self._stats_lock:
+            self._histogram[sum(sizes)] += 1
+            self._batches += 1
+            self._rows += sum(sizes)
+
+        offset = 0
+        for (_, future), size in zip(batch, sizes):
+            if isinstance(outputs, tuple):
+                future.set_result(tuple(out[offset : offset + size] for out in outputs))
+            else:
+                future.set_result(outputs[offset : offset + size])
+            offset += size
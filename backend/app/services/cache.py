@@ -0,0 +1,167 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """Two-tier cache for prediction results.
+
+    The first tier is an in-process LRU bounded by ``max_entries`` and
+    ``ttl_seconds``. The optional second tier is a SQLite database that every
+    uvicorn worker on the host can share. Entries belong to a namespace (the
+    identity of a loaded model and the guard); :meth:`retain_namespaces` drops
+    in-process entries belonging to models that are no longer loaded. It
+    leaves the shared tier alone, since other workers may still serve those
+    models; stale rows there are deleted at most every ``prune_interval``
+    seconds.
+
+    Both tiers hold results as JSON, so every hit is a fresh dict that
+    callers may modify.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        db_path: str | None = None,
+        prune_interval: float = 60.0,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.prune_interval = prune_interval
+        self._entries: OrderedDict[tuple[str, str], tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._db: sqlite3.Connection | None = None
+        # Guards the shared connection, so memory hits never wait on SQLite.
+        self._db_lock = threading.Lock()
+        self._last_prune = 0.0
+        if db_path:
+            self._db = self._open_db(db_path)
+
+    @staticmethod
+    def _open_db(db_path: str) -> sqlite3.Connection | None:
+        try:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=5.0)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, namespace TEXT NOT NULL, created REAL NOT NULL, value TEXT NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS results_created ON results (created)")
+            return db
+        except sqlite3.Error:
+            logger.warning("Result cache database unavailable at %s", db_path, exc_info=True)
+            return None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def retain_namespaces(self, namespaces: set[str]) -> None:
+        with self._lock:
+            for entry_key in [k for k in self._entries if k[0] not in namespaces]:
+                del self._entries[entry_key]
+
+    def get(self, namespace: str, key: str) -> dict | None:
+        if not self.enabled:
+            return None
+        now = time.time()
+        entry_key = (namespace, key)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None:
+                created, value = entry
+                if now - created <= self.ttl_seconds:
+                    self._entries.move_to_end(entry_key)
+                    self._hits += 1
+                    return json.loads(value)
+                del self._entries[entry_key]
+            if self._db is None:
+                self._misses += 1
+                return None
+
+        value = self._get_from_db(namespace, key, now)
+        with self._lock:
+            if value is None:
+                self._misses += 1
+                return None
+            self._store(entry_key, value, now)
+            self._hits += 1
+            self._disk_hits += 1
+        return json.loads(value)
+
+    def _get_from_db(self, namespace: str, key: str, now: float) -> str | None:
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT created, value FROM results WHERE key = ? AND namespace = ?",
+                    (f"{namespace}:{key}", namespace),
+                ).fetchone()
+        except sqlite3.Error:
+            logger.warning("Result cache read failed", exc_info=True)
+            return None
+        if row is None or now - row[0] > self.ttl_seconds:
+            return None
+        return row[1]
+
+    def _store(self, entry_key: tuple[str, str], value: str, now: float) -> None:
+        self._entries[entry_key] = (now, value)
+        self._entries.move_to_end(entry_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def put(self, namespace: str, key: str, value: dict) -> None:
+        if not self.enabled:
+            return
+        now = time.time()
+        encoded = json.dumps(value)
+        with self._lock:
+            self._store((namespace, key), encoded, now)
+        if self._db is None:
+            return
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, namespace, created, value) VALUES (?, ?, ?, ?)",
+                    (f"{namespace}:{key}", namespace, now, encoded),
+                )
+                if now - self._last_prune >= self.prune_interval:
+                    self._last_prune = now
+                    self._db.execute("DELETE FROM results WHERE created < ?", (now - self.ttl_seconds,))
+        except sqlite3.Error:
+            logger.warning("Result cache write failed", exc_info=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self._db is not None:
+            try:
+                with self._db_lock:
+                    self._db.execute("DELETE FROM results")
+            except sqlite3.Error:
+                logger.warning("Failed to clear result cache database", exc_info=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "disk": self._db is not None,
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
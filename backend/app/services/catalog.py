@@ -0,0 +1,85 @@
+import gzip
+import hashlib
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+
+from app.models.classifier import CLASS_NAMES, CLASS_TABLE, DISEASE_INFO
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+
+def _accepted_codings(accept_encoding: str) -> set[str]:
+    accepted = set()
+    for token in accept_encoding.lower().split(","):
+        coding, *params = [part.strip() for part in token.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding)
+    return accepted
+
+
+@dataclass(frozen=True)
+class Representation:
+    body: bytes
+    etag: str
+    content_encoding: str | None = None
+
+
+@dataclass(frozen=True)
+class StaticPayload:
+    """A JSON document serialized, compressed and hashed once."""
+
+    representations: dict[str, Representation]
+
+    def negotiate(self, accept_encoding: str) -> Representation:
+        """Pick the smallest representation the client accepts (identity if none)."""
+        accepted = _accepted_codings(accept_encoding)
+        for coding in ("br", "gzip"):
+            if coding in self.representations and (coding in accepted or "*" in accepted):
+                return self.representations[coding]
+        return self.representations["identity"]
+
+    def matches(self, if_none_match: str) -> bool:
+        """Whether an If-None-Match header names any representation (weak comparison)."""
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or any(r.etag in tags for r in self.representations.values())
+
+
+def build_static_payload(content) -> StaticPayload:
+    # Same serialization as FastAPI's JSONResponse.
+    body = json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    representations = {"identity": Representation(body, f'"{digest}"')}
+    # Strong ETags identify exact bytes, so each encoding gets its own.
+    representations["gzip"] = Representation(gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}-gzip"', "gzip")
+    if brotli is not None:
+        representations["br"] = Representation(brotli.compress(body), f'"{digest}-br"', "br")
+    return StaticPayload(representations)
+
+
+def build_class_catalog() -> dict:
+    classes = [
+        {key: entry[key] for key in ("class_name", "plant", "condition", "is_healthy")} for entry in CLASS_TABLE
+    ]
+    return {
+        "total_classes": len(CLASS_NAMES),
+        "plants": sorted(set(c["plant"] for c in classes)),
+        "classes": classes,
+        "disease_info": DISEASE_INFO,
+    }
+
+
+@lru_cache(maxsize=1)
+def class_catalog_payload() -> StaticPayload:
+    return build_static_payload(build_class_catalog())
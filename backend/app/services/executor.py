@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+import torch
+
+from app.config import settings
+from app.services.warmup import FAILED, load_classifier, load_guard
+from app.utils.metrics import EXECUTOR_IN_FLIGHT, EXECUTOR_REJECTIONS
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorSaturated(Exception):
+    """Raised when the inference executor's bounded queue is full."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Inference executor is saturated")
+        self.retry_after = retry_after
+
+
+def _intra_op_threads(workers: int) -> int:
+    if settings.torch_num_threads > 0:
+        return settings.torch_num_threads
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def _init_process_worker(num_threads: int, reports) -> None:
+    """Load this worker process's own classifier, batching engine and plant guard.
+
+    Workers are spawned, not forked: a forked child would inherit the
+    parent's registry and batching engines but not their worker threads, and
+    every request would wait forever on an engine nothing drains. Each
+    worker puts the readiness of its models on ``reports`` when done.
+    """
+    torch.set_num_threads(num_threads)
+    reports.put({"classifier": load_classifier(), "guard": load_guard()})
+
+
+def _noop() -> None:
+    pass
+
+
+def _picklable(value):
+    """Uploads arrive as memoryviews, which cannot be pickled; copy them to bytes."""
+    if isinstance(value, memoryview):
+        return value.tobytes()
+    if isinstance(value, list):
+        return [_picklable(item) for item in value]
+    return value
+
+
+class InferenceExecutor:
+    """Run blocking inference work off the event loop with a bounded backlog.
+
+    At most ``max_workers`` calls run at once and ``max_queue`` more may wait;
+    beyond that ``run`` fails fast with :class:`ExecutorSaturated` instead of
+    letting requests pile up behind the model.
+    """
+
+    def __init__(self, kind: str, max_workers: int, max_queue: int, retry_after: int):
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self.capacity = self.max_workers + max(0, max_queue)
+        self.retry_after = retry_after
+        self._in_flight = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+        if kind == "process":
+            num_threads = _intra_op_threads(self.max_workers)
+            context = multiprocessing.get_context("spawn")
+            self._reports = context.Queue()
+            self._pool: Executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=context,
+                initializer=_init_process_worker,
+                initargs=(num_threads, self._reports),
+            )
+            # Start the workers (and their model loads) now rather than on the first requests.
+            self._started = [self._pool.submit(_noop) for _ in range(self.max_workers)]
+        elif kind == "thread":
+            # intra-op threads are process-wide, and every forward pass runs on
+            # the batching engine's thread: keep torch's default of all cores.
+            if settings.torch_num_threads > 0:
+                torch.set_num_threads(settings.torch_num_threads)
+            num_threads = torch.get_num_threads()
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        else:
+            raise ValueError(f"Unsupported executor kind: {kind}")
+        logger.info(
+            "Inference executor: %s x%d (queue %d, %d torch threads)",
+            kind,
+            self.max_workers,
+            self.capacity - self.max_workers,
+            num_threads,
+        )
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        EXECUTOR_IN_FLIGHT.dec()
+
+    async def run(self, fn: Callable, *args):
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self._rejected += 1
+                EXECUTOR_REJECTIONS.inc()
+                raise ExecutorSaturated(self.retry_after)
+            self._in_flight += 1
+        EXECUTOR_IN_FLIGHT.inc()
+
+        if self.kind == "process":
+            args = tuple(_picklable(arg) for arg in args)
+        try:
+            future = self._pool.submit(fn, *args)
+        except Exception:
+            self._release(None)
+            raise
+        # Release the slot when the work finishes, not when the caller stops waiting.
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def wait_for_workers(self) -> list[dict[str, str]]:
+        """Block until every worker process has loaded its models; return their readiness reports."""
+        reports = []
+        while len(reports) < self.max_workers:
+            try:
+                reports.append(self._reports.get(timeout=1.0))
+            except queue.Empty:
+                # A worker that died while loading never reports; the pool is then broken.
+                if any(future.done() and future.exception() is not None for future in self._started):
+                    logger.error("An inference worker exited while loading its models")
+                    reports.append({"classifier": FAILED, "guard": FAILED})
+                    break
+        return reports
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "workers": self.max_workers,
+                "capacity": self.capacity,
+                "in_flight": self._in_flight,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+_executor: InferenceExecutor | None = None
+
+
+def get_executor() -> InferenceExecutor:
+    global _executor
+    if _executor is None:
+        _executor = InferenceExecutor(
+            kind=settings.executor_kind,
+            max_workers=settings.executor_workers,
+            max_queue=settings.executor_max_queue,
+            retry_after=settings.executor_retry_after,
+        )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
@@ -0,0 +1,456 @@
+"""Asynchronous prediction jobs.
+
+``POST /api/jobs`` stores the uploaded images as work items in a
+:class:`JobQueue` and returns at once. Job workers (asyncio tasks started
+with the app) claim queued items in batches of up to ``job_batch_size``,
+across jobs, and predict each batch through the inference executor, so a
+burst of uploads is drained at full batched throughput instead of timing
+out at the client.
+
+Two queues are provided: :class:`MemoryJobQueue` (the default) and
+:class:`SQLiteJobQueue` (``PDV_JOB_QUEUE_DB``), whose jobs survive restarts
+and which every uvicorn worker on the host can share.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from app.config import settings
+from app.services.executor import ExecutorSaturated, get_executor
+from app.services.prediction import predict_batch
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+
+# How long an idle worker blocks waiting for work before checking again.
+CLAIM_TIMEOUT_SECONDS = 1.0
+# How often expired jobs are purged.
+PURGE_INTERVAL_SECONDS = 60.0
+# Pause after an unexpected worker error, doubling on each consecutive one.
+WORKER_RETRY_SECONDS = 1.0
+WORKER_MAX_RETRY_SECONDS = 30.0
+
+
+class JobQueueFull(Exception):
+    """Raised when accepting a job would exceed ``job_queue_max_items``."""
+
+
+@dataclass
+class WorkItem:
+    job_id: str
+    index: int
+    payload: bytes | memoryview
+
+
+def job_view(job_id: str, created: float, items: list[tuple[int, str | None, str, dict | None]]) -> dict:
+    """The public state of a job from its (index, filename, state, result) items."""
+    results = [
+        {"index": index, "filename": filename, **result}
+        for index, filename, _, result in sorted(items, key=lambda item: item[0])
+        if result is not None
+    ]
+    if len(results) == len(items):
+        status = DONE
+    elif results or any(state == RUNNING for _, _, state, _ in items):
+        status = RUNNING
+    else:
+        status = QUEUED
+    return {
+        "job_id": job_id,
+        "status": status,
+        "created_at": created,
+        "total": len(items),
+        "completed": len(results),
+        "results": results,
+    }
+
+
+class JobQueue(ABC):
+    """Storage of jobs and their per-image work items.
+
+    ``submit`` takes one entry per uploaded file: its payload, or None
+    together with an entry in ``errors`` (the result recorded for it
+    immediately, e.g. an invalid upload).
+    """
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+
+    @abstractmethod
+    def submit(
+        self, filenames: list[str | None], payloads: list[bytes | memoryview | None], errors: dict[int, dict]
+    ) -> str: ...
+
+    @abstractmethod
+    def claim(self, max_items: int, timeout: float) -> list[WorkItem]:
+        """Take up to ``max_items`` queued items, oldest first, waiting up to ``timeout`` for any."""
+
+    @abstractmethod
+    def complete(self, items: list[WorkItem], results: list[dict]) -> None: ...
+
+    @abstractmethod
+    def release(self, items: list[WorkItem]) -> None:
+        """Put claimed items back at the front of the queue."""
+
+    @abstractmethod
+    def get(self, job_id: str) -> dict | None: ...
+
+    @abstractmethod
+    def purge(self, max_age_seconds: float) -> int:
+        """Delete finished jobs created more than ``max_age_seconds`` ago; return how many.
+
+        Jobs with items still queued or running are kept until they finish.
+        """
+
+    @abstractmethod
+    def stats(self) -> dict: ...
+
+    def close(self) -> None:
+        pass
+
+
+@dataclass
+class _MemoryJob:
+    created: float
+    filenames: list[str | None]
+    states: list[str]
+    results: dict[int, dict] = field(default_factory=dict)
+
+
+class MemoryJobQueue(JobQueue):
+    def __init__(self, max_items: int):
+        super().__init__(max_items)
+        self._jobs: dict[str, _MemoryJob] = {}
+        self._pending: deque[WorkItem] = deque()
+        self._running = 0
+        self._cond = threading.Condition()
+
+    def submit(self, filenames, payloads, errors):
+        job_id = uuid.uuid4().hex
+        items = [WorkItem(job_id, i, payload) for i, payload in enumerate(payloads) if payload is not None]
+        with self._cond:
+            if len(self._pending) + self._running + len(items) > self.max_items:
+                raise JobQueueFull()
+            self._jobs[job_id] = _MemoryJob(
+                created=time.time(),
+                filenames=list(filenames),
+                states=[DONE if i in errors else QUEUED for i in range(len(filenames))],
+                results=dict(errors),
+            )
+            self._pending.extend(items)
+            self._cond.notify_all()
+        return job_id
+
+    def claim(self, max_items, timeout):
+        with self._cond:
+            if not self._pending:
+                self._cond.wait(timeout)
+            items = []
+            while self._pending and len(items) < max_items:
+                item = self._pending.popleft()
+                job = self._jobs.get(item.job_id)
+                if job is None:  # purged while queued
+                    continue
+                job.states[item.index] = RUNNING
+                items.append(item)
+            self._running += len(items)
+            return items
+
+    def complete(self, items, results):
+        with self._cond:
+            for item, result in zip(items, results):
+                job = self._jobs.get(item.job_id)
+                if job is not None:
+                    job.states[item.index] = DONE
+                    job.results[item.index] = result
+            self._running -= len(items)
+
+    def release(self, items):
+        with self._cond:
+            for item in reversed(items):
+                job = self._jobs.get(item.job_id)
+                if job is not None:
+                    job.states[item.index] = QUEUED
+                    self._pending.appendleft(item)
+            self._running -= len(items)
+            self._cond.notify_all()
+
+    def get(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            items = [
+                (i, filename, state, job.results.get(i))
+                for i, (filename, state) in enumerate(zip(job.filenames, job.states))
+            ]
+        return job_view(job_id, job.created, items)
+
+    def purge(self, max_age_seconds):
+        cutoff = time.time() - max_age_seconds
+        with self._cond:
+            expired = [
+                job_id
+                for job_id, job in self._jobs.items()
+                if job.created < cutoff and all(state == DONE for state in job.states)
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+        return len(expired)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "backend": "memory",
+                "jobs": len(self._jobs),
+                "queued_items": len(self._pending),
+                "running_items": self._running,
+                "max_items": self.max_items,
+            }
+
+
+class SQLiteJobQueue(JobQueue):
+    """Job queue in a SQLite database, shareable by every process on the host.
+
+    A claimed item is leased for ``lease_seconds``; if it is not completed by
+    then (its worker crashed or the server restarted) it is claimed again.
+    """
+
+    POLL_SECONDS = 0.1
+
+    def __init__(self, db_path: str, max_items: int, lease_seconds: float = 600.0):
+        super().__init__(max_items)
+        self.lease_seconds = lease_seconds
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=10.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, created REAL NOT NULL)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS job_items ("
+            "job_id TEXT NOT NULL, idx INTEGER NOT NULL, filename TEXT, state TEXT NOT NULL, "
+            "claimed_at REAL, payload BLOB, result TEXT, PRIMARY KEY (job_id, idx))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS job_items_state ON job_items (state)")
+        self._lock = threading.Lock()
+        # Wakes this process's workers on submit; other processes find work by polling.
+        self._submitted = threading.Condition()
+
+    def _transaction(self, fn):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                value = fn()
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return value
+
+    def submit(self, filenames, payloads, errors):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        runnable = sum(payload is not None for payload in payloads)
+
+        def insert():
+            (pending,) = self._db.execute("SELECT COUNT(*) FROM job_items WHERE state != ?", (DONE,)).fetchone()
+            if pending + runnable > self.max_items:
+                raise JobQueueFull()
+            self._db.execute("INSERT INTO jobs (id, created) VALUES (?, ?)", (job_id, now))
+            self._db.executemany(
+                "INSERT INTO job_items (job_id, idx, filename, state, payload, result) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        job_id,
+                        i,
+                        filename,
+                        DONE if i in errors else QUEUED,
+                        payload,
+                        json.dumps(errors[i]) if i in errors else None,
+                    )
+                    for i, (filename, payload) in enumerate(zip(filenames, payloads))
+                ],
+            )
+
+        self._transaction(insert)
+        with self._submitted:
+            self._submitted.notify_all()
+        return job_id
+
+    def _claim_now(self, max_items: int) -> list[WorkItem]:
+        now = time.time()
+
+        def take():
+            rows = self._db.execute(
+                "SELECT job_id, idx, payload FROM job_items "
+                "WHERE state = ? OR (state = ? AND claimed_at < ?) ORDER BY rowid LIMIT ?",
+                (QUEUED, RUNNING, now - self.lease_seconds, max_items),
+            ).fetchall()
+            self._db.executemany(
+                "UPDATE job_items SET state = ?, claimed_at = ? WHERE job_id = ? AND idx = ?",
+                [(RUNNING, now, job_id, idx) for job_id, idx, _ in rows],
+            )
+            return [WorkItem(job_id, idx, payload) for job_id, idx, payload in rows]
+
+        return self._transaction(take)
+
+    def claim(self, max_items, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            items = self._claim_now(max_items)
+            remaining = deadline - time.monotonic()
+            if items or remaining <= 0:
+                return items
+            with self._submitted:
+                self._submitted.wait(min(self.POLL_SECONDS, remaining))
+
+    def complete(self, items, results):
+        with self._lock:
+            self._db.executemany(
+                "UPDATE job_items SET state = ?, payload = NULL, result = ? WHERE job_id = ? AND idx = ?",
+                [(DONE, json.dumps(result), item.job_id, item.index) for item, result in zip(items, results)],
+            )
+
+    def release(self, items):
+        with self._lock:
+            self._db.executemany(
+                "UPDATE job_items SET state = ?, claimed_at = NULL WHERE job_id = ? AND idx = ?",
+                [(QUEUED, item.job_id, item.index) for item in items],
+            )
+        with self._submitted:
+            self._submitted.notify_all()
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.execute("SELECT created FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            rows = self._db.execute(
+                "SELECT idx, filename, state, result FROM job_items WHERE job_id = ?", (job_id,)
+            ).fetchall()
+        items = [(idx, name, state, json.loads(result) if result else None) for idx, name, state, result in rows]
+        return job_view(job_id, row[0], items)
+
+    def purge(self, max_age_seconds):
+        cutoff = time.time() - max_age_seconds
+
+        def delete():
+            expired = [
+                job_id
+                for (job_id,) in self._db.execute(
+                    "SELECT id FROM jobs WHERE created < ? AND NOT EXISTS "
+                    "(SELECT 1 FROM job_items WHERE job_id = jobs.id AND state != ?)",
+                    (cutoff, DONE),
+                ).fetchall()
+            ]
+            self._db.executemany("DELETE FROM job_items WHERE job_id = ?", [(job_id,) for job_id in expired])
+            self._db.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in expired])
+            return len(expired)
+
+        return self._transaction(delete)
+
+    def stats(self):
+        with self._lock:
+            (jobs,) = self._db.execute("SELECT COUNT(*) FROM jobs").fetchone()
+            counts = dict(self._db.execute("SELECT state, COUNT(*) FROM job_items GROUP BY state").fetchall())
+        return {
+            "backend": "sqlite",
+            "jobs": jobs,
+            "queued_items": counts.get(QUEUED, 0),
+            "running_items": counts.get(RUNNING, 0),
+            "max_items": self.max_items,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_job_queue: JobQueue | None = None
+
+
+def get_job_queue() -> JobQueue:
+    global _job_queue
+    if _job_queue is None:
+        if settings.job_queue_db:
+            _job_queue = SQLiteJobQueue(settings.job_queue_db, max_items=settings.job_queue_max_items)
+        else:
+            _job_queue = MemoryJobQueue(max_items=settings.job_queue_max_items)
+    return _job_queue
+
+
+async def _process_batch(queue: JobQueue) -> None:
+    items = await asyncio.to_thread(queue.claim, settings.job_batch_size, CLAIM_TIMEOUT_SECONDS)
+    if not items:
+        return
+    try:
+        results = await get_executor().run(predict_batch, [item.payload for item in items])
+    except ExecutorSaturated as exc:
+        # Synchronous requests have the executor busy; retry the batch shortly.
+        queue.release(items)
+        await asyncio.sleep(min(exc.retry_after, CLAIM_TIMEOUT_SECONDS))
+        return
+    except asyncio.CancelledError:
+        queue.release(items)
+        raise
+    except Exception:
+        logger.exception("Job batch of %d images failed", len(items))
+        results = [{"success": False, "error": "Prediction failed. Please try again."}] * len(items)
+    try:
+        await asyncio.to_thread(queue.complete, items, results)
+    except BaseException:
+        # Hand the items to another claim rather than leave them running forever.
+        queue.release(items)
+        raise
+
+
+async def _run_worker(queue: JobQueue) -> None:
+    delay = WORKER_RETRY_SECONDS
+    while True:
+        try:
+            await _process_batch(queue)
+        except Exception:
+            # A queue error (e.g. a locked database) must not end the worker.
+            logger.exception("Job worker failed; retrying in %.0fs", delay)
+            await asyncio.sleep(delay)
+            delay = min(2 * delay, WORKER_MAX_RETRY_SECONDS)
+        else:
+            delay = WORKER_RETRY_SECONDS
+
+
+async def _purge_expired(queue: JobQueue) -> None:
+    while True:
+        await asyncio.sleep(PURGE_INTERVAL_SECONDS)
+        try:
+            purged = await asyncio.to_thread(queue.purge, settings.job_ttl_seconds)
+        except Exception:
+            logger.exception("Failed to purge expired jobs")
+            continue
+        if purged:
+            logger.info("Purged %d expired jobs", purged)
+
+
+def start_job_workers() -> list[asyncio.Task]:
+    queue = get_job_queue()
+    tasks = [asyncio.create_task(_run_worker(queue)) for _ in range(max(1, settings.job_workers))]
+    tasks.append(asyncio.create_task(_purge_expired(queue)))
+    return tasks
+
+
+def shutdown_job_queue() -> None:
+    global _job_queue
+    if _job_queue is not None:
+        _job_queue.close()
+        _job_queue = None
@@ -1,82 +1,327 @@
+import hashlib
 import logging
+import time
+from typing import NamedTuple
 
+import numpy as np
 import torch
 import torch.nn.functional as F
 
-from app.models.classifier import CLASS_NAMES, DISEASE_INFO, load_model
-from app.utils.image_processing import preprocess_image, validate_image
-from app.utils.plant_guard import check_plant_validity
+from app.config import settings
+from app.models.classifier import CLASS_TABLE
+from app.services.batching import BatchingEngine
+from app.services.cache import ResultCache
+from app.services.registry import CANDIDATE_MODEL, ModelEntry, registry
+from app.services.singleflight import SingleFlight
+from app.services.tta import averaged_probabilities, tta_stats
+from app.utils.image_processing import DecodedImage, load_image, normalize_batch, resize_to_input, validate_image
+from app.utils.metrics import GUARD_REJECTIONS, TTA_ESCALATIONS, StageTimer, record_reused
+from app.utils.ood import AMBIGUOUS, REJECT
+from app.utils.plant_guard import REJECTION_MESSAGE, check_plant_validity_batch
 
 logger = logging.getLogger(__name__)
 
-_model = None
+_result_cache = None
+_namespaces: set[str] = set()
+_in_flight = SingleFlight()
 
 
-def get_model():
-    global _model
-    if _model is None:
-        _model = load_model()
-    return _model
+def warm_up_classifier(batch_sizes: list[int]) -> bool:
+    """Load the configured (and candidate) classifiers, then run dummy forward passes."""
+    entries = [registry.ensure_default()]
+    if settings.candidate_model_path:
+        entries.append(
+            registry.load(
+                CANDIDATE_MODEL,
+                settings.candidate_model_path,
+                settings.candidate_model_backbone or settings.model_backbone,
+            )
+        )
+        if entries[-1] is not None:
+            registry.set_candidate(CANDIDATE_MODEL, settings.candidate_traffic_percent)
+    if entries[0] is None:
+        return False
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    for entry in entries:
+        if entry is None:
+            continue
+        for batch_size in batch_sizes:
+            entry.engine.warm_up(torch.zeros(batch_size, 3, settings.image_size, settings.image_size, device=device))
+    return True
+
+
+def single_flight_stats() -> dict:
+    return _in_flight.stats()
+
+
+def get_result_cache() -> ResultCache:
+    global _result_cache, _namespaces
+    if _result_cache is None:
+        _result_cache = ResultCache(
+            max_entries=settings.result_cache_size,
+            ttl_seconds=settings.result_cache_ttl,
+            db_path=settings.result_cache_db or None,
+        )
+    # Drop results from checkpoints that are no longer loaded (hot swap, new model_path).
+    namespaces = registry.namespaces()
+    if namespaces and namespaces != _namespaces:
+        _result_cache.retain_namespaces(namespaces)
+        _namespaces = namespaces
+    return _result_cache
+
+
+class ClassifierOutput(NamedTuple):
+    probs: np.ndarray
+    logits: torch.Tensor
+    features: torch.Tensor | None  # pooled features, when the OOD method needs them
+    inputs: torch.Tensor  # the preprocessed image, for test-time augmentation
+
+
+PREPROCESS_ERROR = "Failed to process image. Please try a different file."
+
+MODEL_NOT_LOADED_ERROR = (
+    "Model not loaded. Please train a model first or place a "
+    "trained model file at the configured model path."
+)
+
+
+def predict(image_bytes: bytes | memoryview) -> dict:
+    return predict_batch([image_bytes])[0]
+
+
+def predict_batch(images: list[bytes | memoryview]) -> list[dict]:
+    """Predict several uploads with one guard pass and one classifier pass.
+
+    Each entry of the returned list has exactly the shape a single
+    :func:`predict` call would produce for that image.
+    """
+    entry = registry.route()
+    if entry is None:
+        # No checkpoint: still validate and guard, so callers get the usual errors.
+        timer = StageTimer(len(images))
+        results = _predict_uncached(images, None, timer)
+        timer.observe(results, settings.model_backbone)
+        return results
+
+    try:
+        return _predict_routed(images, entry)
+    finally:
+        entry.release()
+
+
+def _predict_routed(images: list[bytes | memoryview], entry: ModelEntry) -> list[dict]:
+    cache = get_result_cache()
+    keys = [(entry.namespace, hashlib.sha256(image_bytes).hexdigest()) for image_bytes in images]
+    results: list[dict | None] = [cache.get(*key) for key in keys]
+    for result in results:
+        if result is not None:
+            record_reused(result, entry.backbone, "cache")
+
+    # Identical uploads already being predicted (retries, double submits, or
+    # duplicates within this batch) wait for that computation instead.
+    owned, waiting = [], {}
+    for i, result in enumerate(results):
+        if result is None:
+            future, leader = _in_flight.claim(keys[i])
+            if leader:
+                owned.append(i)
+            else:
+                waiting[i] = future
 
+    if owned:
+        # Every owned key must be resolved or failed, or its waiters block forever.
+        pending = set(owned)
+        try:
+            start = time.perf_counter()
+            timer = StageTimer(len(owned))
+            computed = _predict_uncached([images[i] for i in owned], entry, timer)
+            entry.stats.record(1000 * (time.perf_counter() - start), computed)
+            timer.observe(computed, entry.backbone)
+            for i, result in zip(owned, computed):
+                results[i] = result
+                # Errors may be transient (e.g. model not loaded yet); only cache answers.
+                if result["success"]:
+                    cache.put(*keys[i], result)
+                _in_flight.resolve(keys[i], result)
+                pending.discard(i)
+        except BaseException as exc:
+            for i in pending:
+                _in_flight.fail(keys[i], exc)
+            pending.clear()
+            raise
+        finally:
+            for i in pending:
+                _in_flight.fail(keys[i], RuntimeError("Prediction was not completed"))
 
-def predict(image_bytes: bytes) -> dict:
-    valid, message = validate_image(image_bytes)
-    if not valid:
-        return {"success": False, "error": message}
+    for i, future in waiting.items():
+        results[i] = future.result()
+        record_reused(results[i], entry.backbone, "coalesced")
+    return results
 
-    is_plant, rejection_reason = check_plant_validity(image_bytes)
-    if not is_plant:
-        return {"success": True, "rejected": True, "reason": rejection_reason}
 
-    model = get_model()
-    if model is None:
-        return {
-            "success": False,
-            "error": (
-                "Model not loaded. Please train a model first or place a "
-                "trained model file at the configured model path."
-            ),
-        }
+def _predict_uncached(images: list[bytes | memoryview], entry: ModelEntry | None, timer: StageTimer) -> list[dict]:
+    results: list[dict | None] = [None] * len(images)
+
+    decoded = {}
+    for i, image_bytes in enumerate(images):
+        with timer.stage("validate", [i]):
+            image, message = validate_image(image_bytes)
+        if image is not None:
+            with timer.stage("decode", [i]):
+                image, message = load_image(image)
+        if image is None:
+            results[i] = {"success": False, "error": message}
+        else:
+            decoded[i] = image
+
+    engine = entry.engine if entry is not None else None
+    detector = entry.detector if entry is not None else None
+
+    if detector is None:
+        _apply_plant_guard(decoded, results, timer)
+        if decoded and engine is None:
+            for i in decoded:
+                results[i] = {"success": False, "error": MODEL_NOT_LOADED_ERROR}
+            return results
+        outputs = _classify(engine, decoded, results, timer)
+    else:
+        # The classifier's own outputs decide; CLIP only sees ambiguous images.
+        outputs = _classify(engine, decoded, results, timer)
+        if outputs:
+            logits = torch.stack([output.logits for output in outputs.values()])
+            features = None
+            if detector.needs_features:
+                features = torch.stack([output.features for output in outputs.values()])
+            with timer.stage("guard", outputs):
+                decisions = detector.decide(logits, features)
+            ambiguous = {}
+            for i, decision in zip(list(outputs), decisions):
+                if decision == REJECT:
+                    GUARD_REJECTIONS.labels("ood").inc()
+                    results[i] = {"success": True, "rejected": True, "reason": REJECTION_MESSAGE}
+                    del outputs[i]
+                elif decision == AMBIGUOUS:
+                    ambiguous[i] = decoded[i]
+            _apply_plant_guard(ambiguous, results, timer)
+            for i in list(outputs):
+                if results[i] is not None:
+                    del outputs[i]
+
+    if settings.tta_enabled and outputs:
+        _escalate_uncertain(engine, outputs, timer)
+
+    for i, output in outputs.items():
+        with timer.stage("postprocess", [i]):
+            results[i] = _format_prediction(output.probs)
+    return results
+
+
+def _apply_plant_guard(decoded: dict[int, DecodedImage], results: list[dict | None], timer: StageTimer) -> None:
+    """Run the plant guard on ``decoded`` in one batch, recording and removing rejections."""
+    with timer.stage("guard", decoded):
+        verdicts = check_plant_validity_batch([image.image for image in decoded.values()])
+    for i, (is_plant, rejection_reason) in zip(list(decoded), verdicts):
+        if not is_plant:
+            GUARD_REJECTIONS.labels(settings.guard_tier).inc()
+            results[i] = {"success": True, "rejected": True, "reason": rejection_reason}
+            del decoded[i]
+
+
+def _classify(
+    engine: BatchingEngine, decoded: dict[int, DecodedImage], results: list[dict | None], timer: StageTimer
+) -> dict[int, ClassifierOutput]:
+    """Preprocess and classify ``decoded`` in one batch.
+
+    Returns the classifier output per image index; failures are recorded in
+    ``results`` instead.
+    """
+    arrays = {}
+    for i, image in decoded.items():
+        try:
+            with timer.stage("preprocess", [i]):
+                arrays[i] = resize_to_input(image.image)
+        except Exception:
+            logger.exception("Failed to preprocess image")
+            results[i] = {"success": False, "error": PREPROCESS_ERROR}
+
+    if not arrays:
+        return {}
 
     try:
-        tensor = preprocess_image(image_bytes)
+        with timer.stage("preprocess", arrays):
+            batch = normalize_batch(list(arrays.values()))
     except Exception:
-        logger.exception("Failed to preprocess image")
-        return {"success": False, "error": "Failed to process image. Please try a different file."}
+        logger.exception("Failed to preprocess batch")
+        for i in arrays:
+            results[i] = {"success": False, "error": PREPROCESS_ERROR}
+        return {}
 
     try:
-        with torch.no_grad():
-            outputs = model(tensor)
-            probabilities = F.softmax(outputs, dim=1)
+        with timer.stage("forward", arrays):
+            outputs = engine.infer(batch)
     except Exception:
         logger.exception("Model inference failed")
-        return {"success": False, "error": "Model inference failed. Please try again."}
+        for i in arrays:
+            results[i] = {"success": False, "error": "Model inference failed. Please try again."}
+        return {}
 
-    probs = probabilities.squeeze().cpu().numpy()
+    with timer.stage("postprocess", arrays):
+        logits, features = outputs if isinstance(outputs, tuple) else (outputs, None)
+        logits = logits.float().cpu()
+        probabilities = F.softmax(logits, dim=1).numpy()
+    return {
+        i: ClassifierOutput(
+            probabilities[row], logits[row], features[row].cpu() if features is not None else None, batch[row]
+        )
+        for row, i in enumerate(arrays)
+    }
 
+
+def _escalate_uncertain(engine: BatchingEngine, outputs: dict[int, ClassifierOutput], timer: StageTimer) -> None:
+    """Replace the probabilities of low-confidence images with their TTA average."""
+    uncertain = [i for i, output in outputs.items() if output.probs.max() < settings.tta_confidence_threshold]
+    if not uncertain:
+        tta_stats.record(len(outputs), 0, 0, 0.0)
+        return
+
+    start = time.perf_counter()
+    try:
+        with timer.stage("tta", uncertain):
+            averaged = averaged_probabilities(
+                engine,
+                torch.stack([outputs[i].inputs for i in uncertain]),
+                np.stack([outputs[i].probs for i in uncertain]),
+                settings.tta_views,
+            )
+    except Exception:
+        logger.exception("Test-time augmentation failed; keeping single-view predictions")
+        return
+    seconds = time.perf_counter() - start
+
+    changed = 0
+    for i, probs in zip(uncertain, averaged):
+        changed += int(probs.argmax() != outputs[i].probs.argmax())
+        outputs[i] = outputs[i]._replace(probs=probs)
+    TTA_ESCALATIONS.inc(len(uncertain))
+    tta_stats.record(len(outputs), len(uncertain), changed, seconds)
+
+
+def _format_prediction(probs: np.ndarray) -> dict:
     top_k = 5
     top_indices = probs.argsort()[::-1][:top_k]
 
     predictions = []
     for idx in top_indices:
-        class_name = CLASS_NAMES[idx]
-        confidence = float(probs[idx])
-        plant, _, condition = class_name.partition(" — ")
-        is_healthy = condition.lower() == "healthy"
-        info = DISEASE_INFO.get(class_name, {})
-
+        entry = CLASS_TABLE[idx]
         predictions.append(
             {
-                "class_name": class_name,
-                "plant": plant,
-                "condition": condition,
-                "confidence": round(confidence * 100, 2),
-                "is_healthy": is_healthy,
-                "info": {
-                    "cause": info.get("cause", "Unknown"),
-                    "symptoms": info.get("symptoms", "No information available."),
-                    "treatment": info.get("treatment", "No information available."),
-                },
+                "class_name": entry["class_name"],
+                "plant": entry["plant"],
+                "condition": entry["condition"],
+                "confidence": round(float(probs[idx]) * 100, 2),
+                "is_healthy": entry["is_healthy"],
+                "info": entry["info"],
             }
         )
 
@@ -0,0 +1,296 @@
+import hashlib
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+
+from app.config import settings
+from app.models.backends import load_inference_model
+from app.models.classifier import CLASS_NAMES, forward_with_features, supports_features
+from app.services.batching import BatchingEngine
+from app.utils.ood import OODDetector, load_ood_detector
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "default"
+CANDIDATE_MODEL = "candidate"
+
+# Upper bounds (ms) of the per-model latency histogram buckets.
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def _file_identity(path: str) -> str:
+    try:
+        stat = Path(path).stat()
+        return f"{Path(path).resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+    except OSError:
+        return f"{path}:missing"
+
+
+def cache_namespace(model_path: str, backbone: str) -> str:
+    """Identity of everything that determines a result: checkpoint, backend, guard and TTA."""
+    if settings.guard_tier == "clip_head":
+        guard = f"clip_head:{_file_identity(settings.guard_head_path)}"
+    else:
+        guard = f"zero_shot:{settings.guard_clip_model}:{settings.guard_plant_threshold}"
+    if settings.ood_guard:
+        guard += f"|ood:{settings.ood_method}:{settings.ood_accept_quantile}:{settings.ood_reject_quantile}"
+    tta = f"{settings.tta_confidence_threshold}:{','.join(settings.tta_views)}" if settings.tta_enabled else "off"
+    identity = "|".join([_file_identity(model_path), backbone, settings.inference_backend, guard, tta])
+    return hashlib.sha256(identity.encode()).hexdigest()[:16]
+
+
+@dataclass
+class ModelStats:
+    """Latency and prediction distribution served by one model."""
+
+    requests: int = 0
+    latency_ms_total: float = 0.0
+    latency_buckets: Counter = field(default_factory=Counter)
+    predictions: Counter = field(default_factory=Counter)
+    rejected: int = 0
+    errors: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, latency_ms: float, results: list[dict]) -> None:
+        bucket = next((str(b) for b in LATENCY_BUCKETS_MS if latency_ms <= b), "+Inf")
+        with self.lock:
+            for result in results:
+                self.requests += 1
+                self.latency_ms_total += latency_ms
+                self.latency_buckets[bucket] += 1
+                if not result["success"]:
+                    self.errors += 1
+                elif result.get("rejected"):
+                    self.rejected += 1
+                else:
+                    self.predictions[result["prediction"]["class_name"]] += 1
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "mean_latency_ms": round(self.latency_ms_total / self.requests, 2) if self.requests else 0.0,
+                "latency_ms_histogram": {
+                    str(b): self.latency_buckets[str(b)] for b in (*LATENCY_BUCKETS_MS, "+Inf")
+                },
+                "rejected": self.rejected,
+                "errors": self.errors,
+                "predictions": {name: self.predictions[name] for name in CLASS_NAMES if self.predictions[name]},
+            }
+
+
+@dataclass
+class ModelEntry:
+    """A loaded classifier together with its batching engine and OOD detector."""
+
+    name: str
+    model_path: str
+    backbone: str
+    model: object
+    engine: BatchingEngine
+    detector: OODDetector | None
+    namespace: str
+    loaded_at: float = field(default_factory=time.time)
+    stats: ModelStats = field(default_factory=ModelStats)
+    _refs: int = field(default=0, repr=False)
+    _retired: bool = field(default=False, repr=False)
+    _ref_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def acquire(self) -> "ModelEntry":
+        with self._ref_lock:
+            self._refs += 1
+        return self
+
+    def release(self) -> None:
+        with self._ref_lock:
+            self._refs -= 1
+            close = self._retired and self._refs == 0
+        if close:
+            self.engine.close()
+
+    def retire(self) -> None:
+        """Close the batching engine once every request routed to this entry has released it."""
+        with self._ref_lock:
+            self._retired = True
+            close = self._refs == 0
+        if close:
+            self.engine.close()
+
+    def to_dict(self) -> dict:
+        with self._ref_lock:
+            in_flight = self._refs
+        return {
+            "model_path": self.model_path,
+            "backbone": self.backbone,
+            "inference_backend": settings.inference_backend,
+            "loaded_at": self.loaded_at,
+            "in_flight": in_flight,
+            "batching": self.engine.stats(),
+            "ood": self.detector.stats() if self.detector is not None else None,
+            **self.stats.to_dict(),
+        }
+
+
+def build_entry(name: str, model_path: str, backbone: str) -> ModelEntry | None:
+    """Load a checkpoint and wrap it for serving, or return None if it does not exist."""
+    model = load_inference_model(model_path=model_path, backbone=backbone)
+    if model is None:
+        return None
+
+    detector = load_ood_detector(model_path) if settings.ood_guard else None
+    if detector is not None and detector.needs_features and not supports_features(model):
+        logger.warning(
+            "OOD method %s needs pooled features, which the %s backend does not expose; "
+            "falling back to the CLIP guard.",
+            detector.method,
+            settings.inference_backend,
+        )
+        detector = None
+
+    forward = partial(forward_with_features, model) if detector and detector.needs_features else model
+    engine = BatchingEngine(
+        forward,
+        max_batch_size=settings.batch_max_size,
+        max_wait_ms=settings.batch_max_wait_ms,
+        name=f"batching-{name}",
+    )
+    return ModelEntry(
+        name=name,
+        model_path=model_path,
+        backbone=backbone,
+        model=model,
+        engine=engine,
+        detector=detector,
+        namespace=cache_namespace(model_path, backbone),
+    )
+
+
+class ModelRegistry:
+    """Holds every loaded classifier and decides which one serves each request.
+
+    Requests go to the active model, except ``candidate_percent`` percent of
+    them, which go to the candidate model when one is set. Swapping the active
+    model replaces a single reference under a lock. :meth:`route` takes a
+    reference on the entry it returns, and a replaced or unloaded entry only
+    closes its batching engine after the last request routed to it calls
+    :meth:`ModelEntry.release`.
+
+    The registry lives in one process: with several uvicorn workers, the
+    admin endpoints only change the worker that receives the request.
+    """
+
+    def __init__(self):
+        self._entries: dict[str, ModelEntry] = {}
+        self._active: str | None = None
+        self._candidate: str | None = None
+        self._candidate_percent = 0.0
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+
+    def load(self, name: str, model_path: str, backbone: str) -> ModelEntry | None:
+        """Load (or reload) ``name``; the previous entry under that name keeps serving until replaced."""
+        with self._load_lock:
+            entry = build_entry(name, model_path, backbone)
+        if entry is None:
+            return None
+        with self._lock:
+            previous = self._entries.get(name)
+            self._entries[name] = entry
+            if self._active is None:
+                self._active = name
+        if previous is not None:
+            previous.retire()
+        logger.info("Loaded model %r from %s (%s)", name, model_path, backbone)
+        return entry
+
+    def ensure_default(self) -> ModelEntry | None:
+        """Return the active entry, loading the configured checkpoint the first time."""
+        with self._lock:
+            if self._active is not None:
+                return self._entries[self._active]
+        with self._load_lock:
+            with self._lock:
+                if self._active is not None:
+                    return self._entries[self._active]
+            entry = build_entry(DEFAULT_MODEL, settings.model_path, settings.model_backbone)
+            if entry is None:
+                return None
+            with self._lock:
+                self._entries[DEFAULT_MODEL] = entry
+                if self._active is None:
+                    self._active = DEFAULT_MODEL
+        return entry
+
+    def activate(self, name: str) -> None:
+        with self._lock:
+            if name not in self._entries:
+                raise KeyError(name)
+            self._active = name
+            if self._candidate == name:
+                self._candidate = None
+                self._candidate_percent = 0.0
+        logger.info("Model %r is now active", name)
+
+    def set_candidate(self, name: str | None, percent: float) -> None:
+        with self._lock:
+            if name is not None and name not in self._entries:
+                raise KeyError(name)
+            self._candidate = name
+            self._candidate_percent = min(100.0, max(0.0, percent)) if name is not None else 0.0
+        logger.info("Candidate model: %r at %.1f%% of traffic", name, self._candidate_percent)
+
+    def unload(self, name: str) -> None:
+        with self._lock:
+            if name == self._active:
+                raise ValueError("Cannot unload the active model; activate another model first.")
+            entry = self._entries.pop(name)
+            if self._candidate == name:
+                self._candidate = None
+                self._candidate_percent = 0.0
+        entry.retire()
+
+    def active(self) -> ModelEntry | None:
+        with self._lock:
+            return self._entries[self._active] if self._active is not None else None
+
+    def route(self) -> ModelEntry | None:
+        """Pick and acquire the entry that serves the next request; the caller must release it."""
+        with self._lock:
+            if self._candidate is not None and random.uniform(0, 100) < self._candidate_percent:
+                return self._entries[self._candidate].acquire()
+            if self._active is not None:
+                return self._entries[self._active].acquire()
+        if self.ensure_default() is None:
+            return None
+        return self.route()
+
+    def namespaces(self) -> set[str]:
+        with self._lock:
+            return {entry.namespace for entry in self._entries.values()}
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = dict(self._entries)
+            active, candidate, percent = self._active, self._candidate, self._candidate_percent
+        return {
+            "active": active,
+            "candidate": candidate,
+            "candidate_traffic_percent": percent,
+            "models": {name: entry.to_dict() for name, entry in entries.items()},
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+            self._active = self._candidate = None
+        for entry in entries:
+            entry.engine.close()
+
+
+registry = ModelRegistry()
@@ -0,0 +1,45 @@
+import threading
+from collections.abc import Hashable
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Coalesces concurrent computations of the same key.
+
+    The first caller to :meth:`claim` a key becomes its leader and must
+    :meth:`resolve` or :meth:`fail` it; callers claiming the key meanwhile
+    get the leader's future and wait on it instead of repeating the work.
+    Only work in flight is shared: once resolved, the key is forgotten.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._leaders = 0
+        self._coalesced = 0
+
+    def claim(self, key: Hashable) -> tuple[Future, bool]:
+        """Return the key's future and whether the caller leads (computes) it."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self._coalesced += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self._leaders += 1
+            return future, True
+
+    def resolve(self, key: Hashable, value) -> None:
+        with self._lock:
+            future = self._calls.pop(key)
+        future.set_result(value)
+
+    def fail(self, key: Hashable, exc: BaseException) -> None:
+        with self._lock:
+            future = self._calls.pop(key)
+        future.set_exception(exc)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"in_flight": len(self._calls), "computed": self._leaders, "coalesced": self._coalesced}
@@ -0,0 +1,110 @@
+"""Confidence-gated test-time augmentation.
+
+Every image gets the usual single forward pass. Only images whose top-1
+probability falls below ``tta_confidence_threshold`` are escalated: their
+preprocessed inputs are augmented into several views (flips and crops), all
+views of all escalated images go through the model in one batch, and the
+softmax probabilities of the original and every view are averaged.
+"""
+
+import threading
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from app.services.batching import BatchingEngine
+
+# Fraction of the side kept by the crop views before resizing back.
+CROP_SCALE = 0.875
+
+
+def _crop(batch: torch.Tensor, top: int, left: int) -> torch.Tensor:
+    height, width = batch.shape[-2:]
+    size_h, size_w = int(height * CROP_SCALE), int(width * CROP_SCALE)
+    crop = batch[:, :, top : top + size_h, left : left + size_w]
+    return F.interpolate(crop, size=(height, width), mode="bilinear", align_corners=False)
+
+
+def hflip(batch: torch.Tensor) -> torch.Tensor:
+    return batch.flip(-1)
+
+
+def vflip(batch: torch.Tensor) -> torch.Tensor:
+    return batch.flip(-2)
+
+
+def center_crop(batch: torch.Tensor) -> torch.Tensor:
+    height, width = batch.shape[-2:]
+    return _crop(batch, (height - int(height * CROP_SCALE)) // 2, (width - int(width * CROP_SCALE)) // 2)
+
+
+def top_left_crop(batch: torch.Tensor) -> torch.Tensor:
+    return _crop(batch, 0, 0)
+
+
+def bottom_right_crop(batch: torch.Tensor) -> torch.Tensor:
+    height, width = batch.shape[-2:]
+    return _crop(batch, height - int(height * CROP_SCALE), width - int(width * CROP_SCALE))
+
+
+TTA_VIEWS = {
+    "hflip": hflip,
+    "vflip": vflip,
+    "center_crop": center_crop,
+    "top_left_crop": top_left_crop,
+    "bottom_right_crop": bottom_right_crop,
+}
+
+
+def augment(inputs: torch.Tensor, views: list[str]) -> torch.Tensor:
+    """``[N, C, H, W]`` inputs -> ``[len(views) * N, C, H, W]``, grouped by view."""
+    unknown = [view for view in views if view not in TTA_VIEWS]
+    if unknown:
+        raise ValueError(f"Unsupported TTA views: {', '.join(unknown)}. Choose from {', '.join(TTA_VIEWS)}")
+    return torch.cat([TTA_VIEWS[view](inputs) for view in views])
+
+
+def averaged_probabilities(
+    engine: BatchingEngine, inputs: torch.Tensor, probs: np.ndarray, views: list[str]
+) -> np.ndarray:
+    """Mean of ``probs`` (the single-view result) and the probabilities of every view."""
+    outputs = engine.infer(augment(inputs, views))
+    logits = outputs[0] if isinstance(outputs, tuple) else outputs
+    view_probs = F.softmax(logits.float().cpu(), dim=1).numpy().reshape(len(views), len(inputs), -1)
+    return (probs + view_probs.sum(axis=0)) / (len(views) + 1)
+
+
+class TTAStats:
+    """How often escalation fires and what it costs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.images = 0
+        self.escalated = 0
+        self.changed_top1 = 0
+        self.passes = 0
+        self.seconds_total = 0.0
+
+    def record(self, images: int, escalated: int, changed_top1: int, seconds: float) -> None:
+        with self._lock:
+            self.images += images
+            self.escalated += escalated
+            self.changed_top1 += changed_top1
+            if escalated:
+                self.passes += 1
+                self.seconds_total += seconds
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "images": self.images,
+                "escalated": self.escalated,
+                "escalation_rate": round(self.escalated / self.images, 4) if self.images else 0.0,
+                "changed_top1": self.changed_top1,
+                # Escalated images of one batch share a pass, so each of them waits this long.
+                "mean_added_latency_ms": round(1000 * self.seconds_total / self.passes, 2) if self.passes else 0.0,
+            }
+
+
+tta_stats = TTAStats()
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import time
+
+from app.config import settings
+from app.services.prediction import warm_up_classifier
+from app.utils.plant_guard import warm_up_guard
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+READY = "ready"
+MISSING = "missing"
+FAILED = "failed"
+
+
+class Readiness:
+    """Load state of each model, as reported by /api/health/ready."""
+
+    def __init__(self):
+        self.components = {"classifier": PENDING, "guard": PENDING}
+        self.started_at = time.monotonic()
+        self.warmup_seconds: float | None = None
+
+    @property
+    def ready(self) -> bool:
+        return all(state == READY for state in self.components.values())
+
+    def to_dict(self) -> dict:
+        return {
+            "ready": self.ready,
+            "components": dict(self.components),
+            "warmup_seconds": self.warmup_seconds,
+        }
+
+
+readiness = Readiness()
+
+
+def load_classifier() -> str:
+    """Load and warm the classifier in this process; return its readiness state."""
+    sizes = sorted({1, settings.batch_max_size})
+    try:
+        loaded = warm_up_classifier(sizes)
+    except Exception:
+        logger.exception("Classifier warm-up failed")
+        return FAILED
+    return READY if loaded else MISSING
+
+
+def load_guard() -> str:
+    """Load and warm the plant guard in this process; return its readiness state."""
+    sizes = sorted({1, settings.batch_request_chunk_size})
+    try:
+        warm_up_guard(sizes)
+    except Exception:
+        logger.exception("Plant guard warm-up failed")
+        return FAILED
+    return READY
+
+
+def combine_reports(reports: list[dict[str, str]]) -> dict[str, str]:
+    """Readiness of each component across worker processes: ready only once every worker is."""
+    combined = {}
+    for component in readiness.components:
+        states = {report.get(component, FAILED) for report in reports}
+        combined[component] = next((state for state in (FAILED, MISSING, PENDING) if state in states), READY)
+    return combined
+
+
+async def warm_up_models(executor=None) -> None:
+    """Load and warm the classifier and the plant guard in parallel threads.
+
+    With the process executor, the worker processes serve every prediction
+    and load their own models, so this process loads none and readiness
+    waits for every worker's report instead.
+    """
+    start = time.perf_counter()
+    if executor is not None and executor.kind == "process":
+        reports = await asyncio.to_thread(executor.wait_for_workers)
+        readiness.components.update(combine_reports(reports))
+    else:
+
+        async def load(component, fn):
+            readiness.components[component] = await asyncio.to_thread(fn)
+
+        await asyncio.gather(load("classifier", load_classifier), load("guard", load_guard))
+    readiness.warmup_seconds = round(time.perf_counter() - start, 2)
+    logger.info("Warm-up finished in %.1fs: %s", readiness.warmup_seconds, readiness.components)
@@ -0,0 +1,58 @@
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Per-model load time and memory, reported on /api/health.
+load_stats: dict[str, dict] = {}
+
+
+def memory_usage() -> dict[str, int]:
+    """Resident and file-backed (shareable) memory of this process, in bytes.
+
+    File-backed pages, such as memory-mapped weights, live in the page cache
+    and are shared by every worker that maps the same file, so ``rss - shared``
+    is what each additional worker really costs.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            fields = f.read().split()
+        page_size = os.sysconf("SC_PAGE_SIZE")
+        return {"rss": int(fields[1]) * page_size, "shared": int(fields[2]) * page_size}
+    except (OSError, ValueError, IndexError):
+        try:
+            import resource
+        except ImportError:
+            return {"rss": 0, "shared": 0}
+        # Peak RSS only; kilobytes on Linux, bytes on macOS.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {"rss": peak if sys.platform == "darwin" else peak * 1024, "shared": 0}
+
+
+@contextmanager
+def track_load(name: str):
+    """Record wall time and memory growth of loading ``name``.
+
+    Yields a dict the caller may add fields to. When several models load
+    concurrently the memory deltas overlap and are only approximate.
+    """
+    before = memory_usage()
+    start = time.perf_counter()
+    stats: dict = {}
+    yield stats
+    after = memory_usage()
+    stats.update(
+        {
+            "seconds": round(time.perf_counter() - start, 3),
+            "rss_mb": round(after["rss"] / 2**20, 1),
+            "rss_delta_mb": round((after["rss"] - before["rss"]) / 2**20, 1),
+            "private_delta_mb": round(
+                ((after["rss"] - after["shared"]) - (before["rss"] - before["shared"])) / 2**20, 1
+            ),
+        }
+    )
+    load_stats[name] = stats
+    logger.info("Loaded %s in %.2fs (%s)", name, stats["seconds"], stats)
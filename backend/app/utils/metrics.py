@@ -0,0 +1,132 @@
+"""Prometheus metrics for the prediction pipeline, served on ``/metrics``.
+
+Stage latencies are recorded per image: an image that shares a batched guard
+or forward pass with others is charged the full duration of that pass, since
+that is the latency it actually experienced.
+
+With ``PDV_EXECUTOR_KIND=process`` (or several uvicorn workers) set
+``PROMETHEUS_MULTIPROC_DIR`` to an empty, writable directory so samples
+recorded in other processes are aggregated into the same exposition.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+import torch
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+STAGES = ("upload_read", "validate", "decode", "guard", "preprocess", "forward", "tta", "postprocess")
+
+SUCCESS = "success"
+REJECTED = "rejected"
+ERROR = "error"
+
+DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+
+# Seconds; fine-grained at the low end where decode and preprocess live.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGE_SECONDS = Histogram(
+    "pdv_stage_duration_seconds",
+    "Time one image spent in a prediction stage.",
+    ["stage", "backbone", "device", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+PREDICTION_SECONDS = Histogram(
+    "pdv_prediction_duration_seconds",
+    "Time from decoding to a result for one image, excluding the upload read.",
+    ["backbone", "device", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+PREDICTIONS = Counter(
+    "pdv_predictions_total",
+    "Images predicted, by outcome and by where the result came from "
+    "(computed, cache, or coalesced with an identical request in flight).",
+    ["backbone", "device", "outcome", "source"],
+)
+GUARD_REJECTIONS = Counter(
+    "pdv_guard_rejections_total",
+    "Images rejected as not a plant leaf, by the guard that rejected them.",
+    ["guard"],
+)
+TTA_ESCALATIONS = Counter(
+    "pdv_tta_escalations_total",
+    "Low-confidence images re-classified with test-time augmentation.",
+)
+EXECUTOR_IN_FLIGHT = Gauge(
+    "pdv_executor_in_flight",
+    "Inference calls running or queued in the executor.",
+    multiprocess_mode="livesum",
+)
+EXECUTOR_REJECTIONS = Counter(
+    "pdv_executor_rejections_total",
+    "Requests turned away with 503 because the executor queue was full.",
+)
+
+
+def outcome_of(result: dict) -> str:
+    if not result["success"]:
+        return ERROR
+    return REJECTED if result.get("rejected") else SUCCESS
+
+
+def observe_stage(stage: str, seconds: float, backbone: str, outcome: str) -> None:
+    STAGE_SECONDS.labels(stage, backbone, DEVICE, outcome).observe(seconds)
+
+
+class StageTimer:
+    """Collects per-image stage durations for one batch of images.
+
+    Nothing is exported until :meth:`observe`, because the outcome label of
+    an image is only known once its result is.
+    """
+
+    def __init__(self, count: int):
+        self._durations: list[dict[str, float]] = [{} for _ in range(count)]
+        self._start = time.perf_counter()
+
+    def add(self, stage: str, indices, seconds: float) -> None:
+        for i in indices:
+            self._durations[i][stage] = self._durations[i].get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, stage: str, indices):
+        """Charge the duration of the block to every image in ``indices``."""
+        indices = list(indices)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, indices, time.perf_counter() - start)
+
+    def observe(self, results: list[dict], backbone: str) -> None:
+        total = time.perf_counter() - self._start
+        for durations, result in zip(self._durations, results):
+            outcome = outcome_of(result)
+            for stage, seconds in durations.items():
+                observe_stage(stage, seconds, backbone, outcome)
+            PREDICTION_SECONDS.labels(backbone, DEVICE, outcome).observe(total)
+            PREDICTIONS.labels(backbone, DEVICE, outcome, "computed").inc()
+
+
+def record_reused(result: dict, backbone: str, source: str) -> None:
+    PREDICTIONS.labels(backbone, DEVICE, outcome_of(result), source).inc()
+
+
+def render() -> tuple[bytes, str]:
+    """Current metrics in the Prometheus text format, with their content type."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
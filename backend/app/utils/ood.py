@@ -0,0 +1,133 @@
+"""Out-of-distribution scoring on the classifier's own outputs.
+
+Scores are oriented so that higher means "looks like the training data":
+
+- ``energy``: negative free energy, ``logsumexp(logits)``
+- ``msp``: maximum softmax probability
+- ``mahalanobis``: negative minimum Mahalanobis distance from the pooled
+  features to the per-class means, under a shared (tied) covariance
+
+The per-class statistics and the in-distribution score distribution are
+computed at training time (``python -m training.ood``) and stored in the
+checkpoint under ``"ood_stats"``.
+"""
+
+import logging
+import threading
+from pathlib import Path
+
+import torch
+
+from app.config import settings
+from app.models.classifier import load_checkpoint
+
+logger = logging.getLogger(__name__)
+
+OOD_METHODS = ("energy", "msp", "mahalanobis")
+
+ACCEPT = "accept"
+REJECT = "reject"
+AMBIGUOUS = "ambiguous"
+
+
+def mahalanobis_score(features: torch.Tensor, class_means: torch.Tensor, precision: torch.Tensor) -> torch.Tensor:
+    features = features.float()
+    projected = features @ precision
+    means_projected = class_means @ precision
+    distances = (
+        (projected * features).sum(dim=1, keepdim=True)
+        - 2 * projected @ class_means.T
+        + (means_projected * class_means).sum(dim=1)
+    )
+    return -distances.min(dim=1).values
+
+
+def ood_score(
+    method: str,
+    logits: torch.Tensor,
+    features: torch.Tensor | None = None,
+    class_means: torch.Tensor | None = None,
+    precision: torch.Tensor | None = None,
+) -> torch.Tensor:
+    logits = logits.float()
+    if method == "energy":
+        return torch.logsumexp(logits, dim=1)
+    if method == "msp":
+        return logits.softmax(dim=1).max(dim=1).values
+    if method == "mahalanobis":
+        return mahalanobis_score(features, class_means, precision)
+    raise ValueError(f"Unsupported OOD method: {method}")
+
+
+class OODDetector:
+    """Three-way plant decision from classifier outputs.
+
+    Images scoring at or above the ``accept_quantile`` of in-distribution
+    validation scores are accepted outright, those below ``reject_quantile``
+    are rejected, and anything in between is left to the CLIP guard.
+    """
+
+    def __init__(self, stats: dict, method: str, accept_quantile: float, reject_quantile: float):
+        if method not in OOD_METHODS:
+            raise ValueError(f"Unsupported OOD method: {method}. Choose from {', '.join(OOD_METHODS)}")
+        self.method = method
+        self.class_means = stats["class_means"].float()
+        self.precision = stats["precision"].float()
+        scores = stats["scores"][method].float()
+        self.accept_threshold = float(torch.quantile(scores, accept_quantile))
+        self.reject_threshold = float(torch.quantile(scores, reject_quantile))
+        self._counts = {ACCEPT: 0, REJECT: 0, AMBIGUOUS: 0}
+        self._lock = threading.Lock()
+
+    @property
+    def needs_features(self) -> bool:
+        return self.method == "mahalanobis"
+
+    def score(self, logits: torch.Tensor, features: torch.Tensor | None = None) -> torch.Tensor:
+        if features is not None:
+            features = features.to(self.class_means.device)
+        return ood_score(self.method, logits.cpu(), features, self.class_means, self.precision)
+
+    def decide(self, logits: torch.Tensor, features: torch.Tensor | None = None) -> list[str]:
+        decisions = []
+        for score in self.score(logits, features).tolist():
+            if score >= self.accept_threshold:
+                decisions.append(ACCEPT)
+            elif score < self.reject_threshold:
+                decisions.append(REJECT)
+            else:
+                decisions.append(AMBIGUOUS)
+        with self._lock:
+            for decision in decisions:
+                self._counts[decision] += 1
+        return decisions
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "method": self.method,
+                "accept_threshold": self.accept_threshold,
+                "reject_threshold": self.reject_threshold,
+                **self._counts,
+            }
+
+
+def load_ood_detector(model_path: str | None = None) -> OODDetector | None:
+    """Build the detector from the statistics stored in a (default: the configured) checkpoint."""
+    model_path = Path(model_path or settings.model_path)
+    if not model_path.exists():
+        return None
+    stats = load_checkpoint(model_path).get("ood_stats")
+    if stats is None:
+        logger.warning(
+            "Checkpoint %s has no OOD statistics; run `python -m training.ood` to add them. "
+            "Falling back to the CLIP guard for every image.",
+            model_path,
+        )
+        return None
+    return OODDetector(
+        stats,
+        method=settings.ood_method,
+        accept_quantile=settings.ood_accept_quantile,
+        reject_quantile=settings.ood_reject_quantile,
+    )
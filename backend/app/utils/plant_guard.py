@@ -1,11 +1,17 @@
+import hashlib
+import json
 import logging
-from io import BytesIO
+import threading
+from functools import partial
+from pathlib import Path
 
 import torch
+import torch.nn as nn
 from PIL import Image
 from transformers import CLIPModel, CLIPProcessor
 
 from app.config import settings
+from app.utils.memory import track_load
 
 logger = logging.getLogger(__name__)
 
@@ -35,53 +41,167 @@ NON_PLANT_LABELS = [
 ]
 ALL_LABELS = PLANT_LABELS + NON_PLANT_LABELS
 
-_clip_model = None
-_clip_processor = None
+GUARD_TIERS = ("zero_shot", "clip_head")
 
 
-def _get_clip():
-    """Load CLIP model and processor (lazy, singleton)."""
-    global _clip_model, _clip_processor
-    if _clip_model is None:
-        logger.info("Loading CLIP model: %s", settings.guard_clip_model)
-        _clip_model = CLIPModel.from_pretrained(settings.guard_clip_model)
-        _clip_processor = CLIPProcessor.from_pretrained(settings.guard_clip_model)
-        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        _clip_model.to(device)
-        _clip_model.eval()
-        logger.info("CLIP guard loaded on %s", device)
-    return _clip_model, _clip_processor
+class PlantHead(nn.Module):
+    """Binary plant/non-plant logistic head over L2-normalized CLIP image embeddings."""
 
+    def __init__(self, embed_dim: int):
+        super().__init__()
+        self.linear = nn.Linear(embed_dim, 1)
 
-def check_plant_validity(image_bytes: bytes) -> tuple[bool, str | None]:
-    """Use CLIP zero-shot classification to verify the image contains a plant leaf.
+    def forward(self, image_embeds: torch.Tensor) -> torch.Tensor:
+        return torch.sigmoid(self.linear(image_embeds)).squeeze(-1)
 
-    Returns:
-        (True, None) if a plant leaf is detected, (False, reason) otherwise.
-    """
-    model, processor = _get_clip()
-    device = next(model.parameters()).device
 
-    image = Image.open(BytesIO(image_bytes)).convert("RGB")
+_clip_model = None
+_clip_processor = None
+_scorer = None
+_threshold = None
+_clip_lock = threading.Lock()
+
 
-    inputs = processor(text=ALL_LABELS, images=image, return_tensors="pt", padding=True)
+def _text_cache_path(model_name: str) -> Path:
+    """Cache file for the label embeddings, keyed by CLIP model and label set."""
+    key = json.dumps({"model": model_name, "labels": ALL_LABELS})
+    digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+    return Path(settings.guard_cache_dir) / f"clip_text_{digest}.pt"
+
+
+def encode_labels(model: CLIPModel, processor: CLIPProcessor, device: torch.device) -> torch.Tensor:
+    """L2-normalized text embeddings for ALL_LABELS."""
+    inputs = processor(text=ALL_LABELS, return_tensors="pt", padding=True)
     inputs = {k: v.to(device) for k, v in inputs.items()}
+    with torch.no_grad():
+        embeds = model.get_text_features(**inputs)
+    return embeds / embeds.norm(dim=-1, keepdim=True)
+
+
+def load_text_embeddings(
+    model: CLIPModel, processor: CLIPProcessor, device: torch.device, model_name: str
+) -> torch.Tensor:
+    """Return L2-normalized text embeddings for ALL_LABELS, computing them at most once."""
+    cache_path = _text_cache_path(model_name)
+    if cache_path.exists():
+        try:
+            embeds = torch.load(cache_path, map_location=device, weights_only=True)
+            if embeds.shape[0] == len(ALL_LABELS):
+                logger.info("Loaded cached CLIP label embeddings from %s", cache_path)
+                return embeds
+        except Exception:
+            logger.warning("Ignoring unreadable CLIP label cache at %s", cache_path, exc_info=True)
+
+    embeds = encode_labels(model, processor, device)
+
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        torch.save(embeds.cpu(), cache_path)
+    except OSError:
+        logger.warning("Could not persist CLIP label embeddings to %s", cache_path, exc_info=True)
+    return embeds
+
+
+def encode_images(model: CLIPModel, processor: CLIPProcessor, images: list[Image.Image]) -> torch.Tensor:
+    """L2-normalized CLIP image embeddings; only the vision tower runs."""
+    device = next(model.parameters()).device
+    pixel_values = processor(images=images, return_tensors="pt")["pixel_values"].to(device)
+    with torch.no_grad():
+        image_embeds = model.get_image_features(pixel_values=pixel_values)
+    return image_embeds / image_embeds.norm(dim=-1, keepdim=True)
 
+
+def zero_shot_plant_probs(model: CLIPModel, text_embeds: torch.Tensor, image_embeds: torch.Tensor) -> torch.Tensor:
+    """Probability mass on PLANT_LABELS, scored exactly like CLIPModel.logits_per_image."""
     with torch.no_grad():
-        outputs = model(**inputs)
-        logits = outputs.logits_per_image.squeeze()
-        probs = logits.softmax(dim=0)
+        logits = model.logit_scale.exp() * image_embeds @ text_embeds.T
+        probs = logits.softmax(dim=1)
+    return probs[:, : len(PLANT_LABELS)].sum(dim=1)
 
-    plant_prob = float(probs[: len(PLANT_LABELS)].sum())
 
-    logger.debug(
-        "CLIP guard: plant_prob=%.3f, top_label=%s (%.3f)",
-        plant_prob,
-        ALL_LABELS[probs.argmax().item()],
-        float(probs.max()),
-    )
+def load_clip(model_name: str) -> tuple[CLIPModel, CLIPProcessor]:
+    # safetensors weights are memory-mapped; low_cpu_mem_usage skips the random
+    # init so they are not materialized twice. use_safetensors=None prefers
+    # them but falls back to pytorch_model.bin for repos that only ship that.
+    model = CLIPModel.from_pretrained(model_name, use_safetensors=None, low_cpu_mem_usage=True)
+    processor = CLIPProcessor.from_pretrained(model_name)
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    model.to(device)
+    model.eval()
+    return model, processor
 
-    if plant_prob < settings.guard_plant_threshold:
-        return False, REJECTION_MESSAGE
 
-    return True, None
+def _get_clip():
+    """Load the guard's CLIP model, processor and scorer for the configured tier (lazy, singleton)."""
+    global _clip_model, _clip_processor, _scorer, _threshold
+    if _clip_model is None:
+        with _clip_lock:
+            if _clip_model is None:
+                if settings.guard_tier not in GUARD_TIERS:
+                    raise ValueError(f"Unsupported guard tier: {settings.guard_tier}")
+
+                if settings.guard_tier == "clip_head":
+                    checkpoint = torch.load(settings.guard_head_path, map_location="cpu", weights_only=True)
+                    model_name = checkpoint["clip_model"]
+                else:
+                    model_name = settings.guard_clip_model
+
+                logger.info("Loading CLIP model: %s (%s guard)", model_name, settings.guard_tier)
+                with track_load("guard") as stats:
+                    model, processor = load_clip(model_name)
+                    stats["model"] = model_name
+                device = next(model.parameters()).device
+
+                if settings.guard_tier == "clip_head":
+                    head = PlantHead(checkpoint["embed_dim"])
+                    head.load_state_dict(checkpoint["state_dict"])
+                    head.to(device)
+                    head.eval()
+                    _scorer = head
+                    _threshold = float(checkpoint["threshold"])
+                else:
+                    text_embeds = load_text_embeddings(model, processor, device, model_name)
+                    _scorer = partial(zero_shot_plant_probs, model, text_embeds)
+                    _threshold = settings.guard_plant_threshold
+
+                _clip_processor = processor
+                _clip_model = model
+                logger.info("CLIP guard loaded on %s", device)
+    return _clip_model, _clip_processor, _scorer, _threshold
+
+
+def warm_up_guard(batch_sizes: list[int]) -> None:
+    """Load the guard and run it once per batch size on blank images."""
+    _get_clip()
+    blank = Image.new("RGB", (settings.image_size, settings.image_size))
+    for batch_size in batch_sizes:
+        check_plant_validity_batch([blank] * batch_size)
+
+
+def check_plant_validity(image: Image.Image) -> tuple[bool, str | None]:
+    """Verify the image contains a plant leaf using the configured guard tier.
+
+    Returns:
+        (True, None) if a plant leaf is detected, (False, reason) otherwise.
+    """
+    return check_plant_validity_batch([image])[0]
+
+
+def check_plant_validity_batch(images: list[Image.Image]) -> list[tuple[bool, str | None]]:
+    """Batched :func:`check_plant_validity`: one vision-tower pass for all images."""
+    if not images:
+        return []
+
+    model, processor, scorer, threshold = _get_clip()
+    image_embeds = encode_images(model, processor, images)
+    with torch.no_grad():
+        plant_probs = scorer(image_embeds)
+
+    results = []
+    for plant_prob in plant_probs.tolist():
+        logger.debug("Plant guard (%s): plant_prob=%.3f", settings.guard_tier, plant_prob)
+        if plant_prob < threshold:
+            results.append((False, REJECTION_MESSAGE))
+        else:
+            results.append((True, None))
+    return results
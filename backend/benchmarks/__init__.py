@@ -0,0 +1,6 @@
+"""Load and stage benchmarks for the prediction API.
+
+    python -m benchmarks.load      # end-to-end, in-process or against a running server
+    python -m benchmarks.stages    # decode / preprocess / guard / forward in isolation
+    python -m benchmarks.compare   # diff two JSON reports
+"""
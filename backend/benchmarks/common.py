@@ -0,0 +1,142 @@
+import json
+import math
+import os
+import platform
+import random
+import resource
+import sys
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+import torch
+from PIL import Image, ImageDraw
+
+FORMATS = {"jpeg": "JPEG", "png": "PNG", "webp": "WEBP"}
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+
+
+def parse_sizes(value: str) -> list[tuple[int, int]]:
+    """``"224x224,1024x768"`` -> ``[(224, 224), (1024, 768)]``."""
+    sizes = []
+    for item in value.split(","):
+        width, _, height = item.strip().lower().partition("x")
+        sizes.append((int(width), int(height or width)))
+    return sizes
+
+
+def synthetic_image(size: tuple[int, int], seed: int) -> Image.Image:
+    """A leaf-like green ellipse on a noisy soil background.
+
+    Synthetic images may still be rejected by the plant guard; use
+    ``--images`` with real photos to exercise the classifier on every request.
+    """
+    rng = random.Random(seed)
+    width, height = size
+    noise = np.random.default_rng(seed).integers(60, 140, (height, width, 3), dtype=np.uint8)
+    image = Image.fromarray(noise)
+    draw = ImageDraw.Draw(image)
+    green = (rng.randint(40, 90), rng.randint(110, 180), rng.randint(30, 70))
+    draw.ellipse((width * 0.15, height * 0.2, width * 0.85, height * 0.8), fill=green)
+    return image
+
+
+def stamp_index(image: Image.Image, index: int) -> None:
+    """Write ``index`` into an 8x8 block of pixels per byte, which survives JPEG quantization."""
+    draw = ImageDraw.Draw(image)
+    for position, value in enumerate(index.to_bytes(4, "little")):
+        draw.rectangle((8 * position, 0, 8 * position + 7, 7), fill=(value, 255 - value, value))
+
+
+def encode(image: Image.Image, fmt: str) -> bytes:
+    buffer = BytesIO()
+    image.convert("RGB").save(buffer, format=FORMATS[fmt], quality=90)
+    return buffer.getvalue()
+
+
+def build_payloads(
+    sizes: list[tuple[int, int]], formats: list[str], count: int, images_dir: str | None = None, seed: int = 0
+) -> list[tuple[str, bytes]]:
+    """``count`` distinct encoded images cycling through every size x format variant.
+
+    Every payload is distinct so the server's result cache does not turn the
+    run into a cache benchmark: synthetic images are drawn from their own
+    seed, and real images (which repeat once ``count`` exceeds the files
+    under ``images_dir``) get the payload index stamped into their top-left
+    pixels. Returns (variant label, bytes) pairs.
+    """
+    sources = []
+    if images_dir:
+        sources = sorted(p for p in Path(images_dir).rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)
+        if not sources:
+            raise SystemExit(f"No images found under {images_dir}")
+
+    variants = [(size, fmt) for size in sizes for fmt in formats]
+    payloads = []
+    for i in range(count):
+        size, fmt = variants[i % len(variants)]
+        if sources:
+            with Image.open(sources[i % len(sources)]) as source:
+                image = source.convert("RGB").resize(size)
+            stamp_index(image, seed + i)
+        else:
+            image = synthetic_image(size, seed + i)
+        payloads.append((f"{size[0]}x{size[1]}.{fmt}", encode(image, fmt)))
+    return payloads
+
+
+def percentile(ordered: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(latencies: list[float], wall_seconds: float, items: int | None = None) -> dict:
+    """Latency percentiles (ms) and throughput (items/s) for one measurement.
+
+    ``items`` defaults to one per latency sample; pass the number of images
+    when each sample covers a batch.
+    """
+    ordered = sorted(latencies)
+    items = len(ordered) if items is None else items
+    return {
+        "count": len(ordered),
+        "throughput_per_s": round(items / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+        "mean_ms": round(1000 * sum(ordered) / len(ordered), 3) if ordered else 0.0,
+        "p50_ms": round(1000 * percentile(ordered, 50), 3),
+        "p95_ms": round(1000 * percentile(ordered, 95), 3),
+        "p99_ms": round(1000 * percentile(ordered, 99), 3),
+        "max_ms": round(1000 * ordered[-1], 3) if ordered else 0.0,
+    }
+
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of this process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return round((peak if sys.platform == "darwin" else peak * 1024) / 2**20, 1)
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch_threads": torch.get_num_threads(),
+        "device": "cuda" if torch.cuda.is_available() else "cpu",
+    }
+
+
+def write_report(report: dict, output: str | None) -> None:
+    report["peak_rss_mb"] = peak_rss_mb()
+    report["environment"] = environment()
+    text = json.dumps(report, indent=2)
+    if output:
+        Path(output).parent.mkdir(parents=True, exist_ok=True)
+        Path(output).write_text(text + "\n")
+        print(f"\nReport saved to {output}")
+    else:
+        print(text)
@@ -0,0 +1,77 @@
+"""
+Diff two benchmark reports written by benchmarks.load or benchmarks.stages.
+
+Usage:
+    python -m benchmarks.compare results/before.json results/after.json [--threshold 5]
+
+Prints the relative change of p50/p95/p99 and throughput for every measurement
+present in both reports, flagging changes beyond --threshold percent.
+Exits with status 1 if any p95 or throughput regressed beyond the threshold.
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+# Metric -> True when higher is better.
+METRICS = {"p50_ms": False, "p95_ms": False, "p99_ms": False, "throughput_per_s": True}
+GATED = ("p95_ms", "throughput_per_s")
+
+
+def flatten(report: dict) -> dict[str, dict]:
+    """Every latency summary in a report, keyed by its path."""
+    results = report["results"]
+    if report.get("benchmark") == "load":
+        flat = {"overall": results["overall"]}
+        flat.update({f"variant/{name}": summary for name, summary in results["by_variant"].items()})
+        return flat
+    return dict(results)
+
+
+def compare(before: dict, after: dict, threshold: float) -> tuple[list[str], bool]:
+    old, new = flatten(before), flatten(after)
+    lines = []
+    regressed = False
+    for name in [name for name in old if name in new]:
+        changes = []
+        for metric, higher_is_better in METRICS.items():
+            a, b = old[name].get(metric, 0.0), new[name].get(metric, 0.0)
+            if not a:
+                continue
+            delta = 100 * (b - a) / a
+            worse = delta < -threshold if higher_is_better else delta > threshold
+            better = delta > threshold if higher_is_better else delta < -threshold
+            mark = " !!" if worse else " ok" if better else ""
+            changes.append(f"{metric} {a:g} -> {b:g} ({delta:+.1f}%){mark}")
+            regressed |= worse and metric in GATED
+        lines.append(f"{name}\n    " + "\n    ".join(changes))
+
+    for name in sorted(set(old) ^ set(new)):
+        lines.append(f"{name}: only in {'before' if name in old else 'after'}")
+    old_rss, new_rss = before.get("peak_rss_mb"), after.get("peak_rss_mb")
+    if old_rss and new_rss:
+        lines.append(f"peak_rss_mb {old_rss:g} -> {new_rss:g} ({100 * (new_rss - old_rss) / old_rss:+.1f}%)")
+    return lines, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diff two benchmark reports")
+    parser.add_argument("before", type=str)
+    parser.add_argument("after", type=str)
+    parser.add_argument("--threshold", type=float, default=5.0, help="Percent change considered significant")
+    args = parser.parse_args()
+
+    before = json.loads(Path(args.before).read_text())
+    after = json.loads(Path(args.after).read_text())
+    if before.get("benchmark") != after.get("benchmark"):
+        parser.error("Reports come from different benchmarks")
+    if before.get("config") != after.get("config"):
+        print("NOTE: the two runs used different configurations\n")
+
+    lines, regressed = compare(before, after, args.threshold)
+    print("\n".join(lines))
+    raise SystemExit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
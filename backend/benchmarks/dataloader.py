@@ -0,0 +1,104 @@
+"""
+Training input pipeline throughput: ImageFolder + PIL augmentation against
+the pre-decoded cache (training.build_cache) + tensor augmentation.
+
+Both paths run the training augmentation through a shuffled DataLoader, as
+training.train does, and report images/s and per-batch latency. The first
+--warmup batches (worker start-up) are not measured.
+
+Usage:
+    python -m benchmarks.dataloader --data-dir data/PlantVillage \
+        --cache-dir data/cache/plantvillage-256 --num-workers 0,4,8 --output results/dataloader.json
+"""
+
+import argparse
+import time
+
+from torch.utils.data import DataLoader
+from torchvision import datasets
+
+from benchmarks.common import summarize, write_report
+from training.dataset import CACHED_TRAIN_TRANSFORMS, TRAIN_TRANSFORMS, CachedImageDataset
+
+SOURCES = ("imagefolder", "cache")
+
+
+def measure_loader(dataset, batch_size: int, num_workers: int, batches: int, warmup: int) -> dict:
+    loader = DataLoader(
+        dataset,
+        batch_size=batch_size,
+        shuffle=True,
+        num_workers=num_workers,
+        drop_last=True,
+    )
+    latencies = []
+    iterator = iter(loader)
+    for _ in range(warmup):
+        next(iterator)
+    start = time.perf_counter()
+    for _ in range(batches):
+        batch_start = time.perf_counter()
+        next(iterator)
+        latencies.append(time.perf_counter() - batch_start)
+    result = summarize(latencies, time.perf_counter() - start, items=batches * batch_size)
+    del iterator
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark training data loading")
+    parser.add_argument("--data-dir", type=str, default="data/PlantVillage")
+    parser.add_argument("--cache-dir", type=str, default="data/cache/plantvillage-256")
+    parser.add_argument("--sources", type=str, default=",".join(SOURCES))
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--num-workers", type=str, default="0,4")
+    parser.add_argument("--batches", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--output", type=str, default=None)
+    args = parser.parse_args()
+
+    sources = [source.strip() for source in args.sources.split(",")]
+    unknown = set(sources) - set(SOURCES)
+    if unknown:
+        parser.error(f"Unknown sources: {', '.join(sorted(unknown))}. Choose from {', '.join(SOURCES)}")
+    worker_counts = [int(count) for count in args.num_workers.split(",")]
+
+    results = {}
+    for source in sources:
+        if source == "imagefolder":
+            dataset = datasets.ImageFolder(root=args.data_dir, transform=TRAIN_TRANSFORMS)
+        else:
+            dataset = CachedImageDataset(args.cache_dir, CACHED_TRAIN_TRANSFORMS)
+        for num_workers in worker_counts:
+            name = f"{source}/workers{num_workers}"
+            results[name] = measure_loader(dataset, args.batch_size, num_workers, args.batches, args.warmup)
+            print(
+                f"{name:30s} {results[name]['throughput_per_s']:9.1f} images/s  "
+                f"p50 {results[name]['p50_ms']:9.3f} ms/batch  p95 {results[name]['p95_ms']:9.3f} ms/batch"
+            )
+
+    for num_workers in worker_counts:
+        baseline, cached = results.get(f"imagefolder/workers{num_workers}"), results.get(f"cache/workers{num_workers}")
+        if baseline and cached and baseline["throughput_per_s"]:
+            print(f"workers={num_workers}: cache is {cached['throughput_per_s'] / baseline['throughput_per_s']:.1f}x")
+
+    write_report(
+        {
+            "benchmark": "dataloader",
+            "config": {
+                "data_dir": args.data_dir,
+                "cache_dir": args.cache_dir,
+                "sources": sources,
+                "batch_size": args.batch_size,
+                "num_workers": worker_counts,
+                "batches": args.batches,
+                "warmup": args.warmup,
+            },
+            "results": results,
+        },
+        args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Data-parallel training throughput for 1, 2, 4 and 8 processes on one node.
+
+Each configuration launches training.train under torchrun for --epochs short
+epochs of --batches batches per process, in a scratch output directory, and
+reads the training images/s of the last epoch (the first pays for worker and
+compile start-up). Every process keeps --batch-size, so the global batch
+grows with the process count. Cores are split evenly between processes.
+
+Usage:
+    python -m benchmarks.ddp_scaling --processes 1,2,4,8 --cache-dir data/cache/plantvillage-256 \
+        --output results/ddp_scaling.json [-- extra training.train flags, e.g. --bf16 --channels-last]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.common import write_report
+
+
+def run_training(processes: int, args, extra: list[str], output_dir: str) -> dict:
+    command = [sys.executable, "-m", "torch.distributed.run", "--standalone", f"--nproc-per-node={processes}"]
+    command += ["-m", "training.train", "--backbone", args.backbone, "--data-dir", args.data_dir]
+    command += ["--epochs", str(args.epochs), "--max-train-batches", str(args.batches)]
+    command += ["--batch-size", str(args.batch_size), "--num-workers", str(args.num_workers)]
+    command += ["--output-dir", output_dir]
+    if args.cache_dir:
+        command += ["--cache-dir", args.cache_dir]
+    command += extra
+    subprocess.run(command, check=True)
+    history = json.loads((Path(output_dir) / "training_history.json").read_text())
+    return history[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DDP training scaling")
+    parser.add_argument("--processes", type=str, default="1,2,4,8")
+    parser.add_argument("--data-dir", type=str, default="data/PlantVillage")
+    parser.add_argument("--cache-dir", type=str, default=None)
+    parser.add_argument("--backbone", type=str, default="efficientnet_b0")
+    parser.add_argument("--batch-size", type=int, default=32, help="Per process")
+    parser.add_argument("--batches", type=int, default=50, help="Training batches per process per epoch")
+    parser.add_argument("--epochs", type=int, default=2)
+    parser.add_argument("--num-workers", type=int, default=2, help="DataLoader workers per process")
+    parser.add_argument("--output", type=str, default=None)
+    args, extra = parser.parse_known_args()
+    extra = [arg for arg in extra if arg != "--"]
+    counts = [int(count) for count in args.processes.split(",")]
+
+    results = {}
+    for processes in counts:
+        with tempfile.TemporaryDirectory() as output_dir:
+            epoch = run_training(processes, args, extra, output_dir)
+        results[f"processes{processes}"] = {
+            "processes": processes,
+            "throughput_per_s": epoch["train_images_per_sec"],
+            "peak_memory_mb_rank0": epoch["peak_memory_mb"],
+        }
+
+    baseline = results.get(f"processes{counts[0]}", {}).get("throughput_per_s")
+    for name, result in results.items():
+        if baseline:
+            result["speedup"] = round(result["throughput_per_s"] / baseline, 2)
+            result["efficiency"] = round(result["speedup"] * counts[0] / result["processes"], 2)
+        print(
+            f"{name:14s} {result['throughput_per_s']:9.1f} images/s  "
+            f"speedup {result.get('speedup', 0):5.2f}x  efficiency {result.get('efficiency', 0):5.0%}"
+        )
+
+    write_report(
+        {
+            "benchmark": "ddp_scaling",
+            "config": {
+                "processes": counts,
+                "data_dir": args.data_dir,
+                "cache_dir": args.cache_dir,
+                "backbone": args.backbone,
+                "batch_size": args.batch_size,
+                "batches": args.batches,
+                "epochs": args.epochs,
+                "num_workers": args.num_workers,
+                "train_args": extra,
+            },
+            "results": results,
+        },
+        args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
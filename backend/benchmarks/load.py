@@ -0,0 +1,155 @@
+"""
+End-to-end load test of POST /api/predict.
+
+Runs the FastAPI app in-process (through httpx's ASGI transport, lifespan and
+warm-up included) or against a running server with --url. Each request uploads
+a distinct image from the size x format mix so the result cache stays cold;
+in-process runs also disable it unless --keep-cache is given.
+
+Usage:
+    python -m benchmarks.load --requests 200 --concurrency 8 \
+        --sizes 256x256,1024x768 --formats jpeg,png,webp --output results/load.json
+    python -m benchmarks.load --url http://localhost:8000 --images data/PlantVillage
+
+Latencies are client-side. In-process, peak RSS covers the server too; with
+--url it only covers the client.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+from benchmarks.common import build_payloads, parse_sizes, summarize, write_report
+
+CONTENT_TYPES = {"jpeg": "image/jpeg", "png": "image/png", "webp": "image/webp"}
+
+
+def _outcome(response: httpx.Response) -> str:
+    if response.status_code != 200:
+        return "error"
+    return "rejected" if response.json().get("rejected") else "success"
+
+
+async def drive(client: httpx.AsyncClient, payloads: list[tuple[str, bytes]], concurrency: int) -> dict:
+    """Send every payload once from ``concurrency`` concurrent clients."""
+    latencies: dict[str, list[float]] = defaultdict(list)
+    statuses: Counter = Counter()
+    outcomes: Counter = Counter()
+    pending = iter(payloads)
+
+    async def worker():
+        for variant, body in pending:
+            fmt = variant.rsplit(".", 1)[1]
+            start = time.perf_counter()
+            response = await client.post(
+                "/api/predict", files={"file": (f"benchmark.{fmt}", body, CONTENT_TYPES[fmt])}
+            )
+            latencies[variant].append(time.perf_counter() - start)
+            statuses[str(response.status_code)] += 1
+            outcomes[_outcome(response)] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall_seconds = time.perf_counter() - start
+
+    overall = [latency for values in latencies.values() for latency in values]
+    return {
+        "wall_seconds": round(wall_seconds, 3),
+        "overall": summarize(overall, wall_seconds),
+        "by_variant": {variant: summarize(values, wall_seconds) for variant, values in sorted(latencies.items())},
+        "status_codes": dict(statuses),
+        "outcomes": dict(outcomes),
+    }
+
+
+async def run_in_process(args, warmup: list, payloads: list) -> dict:
+    if not args.keep_cache:
+        # Settings are read on import, so this must precede importing the app.
+        os.environ.setdefault("PDV_RESULT_CACHE_SIZE", "0")
+    from app.main import app
+    from app.services.warmup import PENDING, readiness
+
+    async with app.router.lifespan_context(app):
+        deadline = time.monotonic() + args.ready_timeout
+        while PENDING in readiness.components.values() and time.monotonic() < deadline:
+            await asyncio.sleep(0.2)
+        if not readiness.ready:
+            print(f"WARNING: app not ready ({readiness.components}); results will include errors")
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            await drive(client, warmup, args.concurrency)
+            return await drive(client, payloads, args.concurrency)
+
+
+async def run_against_url(args, warmup: list, payloads: list) -> dict:
+    async with httpx.AsyncClient(base_url=args.url, timeout=None) as client:
+        deadline = time.monotonic() + args.ready_timeout
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/api/health/ready")).status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.5)
+        else:
+            print(f"WARNING: {args.url} is not ready; results will include errors")
+
+        await drive(client, warmup, args.concurrency)
+        return await drive(client, payloads, args.concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test POST /api/predict")
+    parser.add_argument("--url", type=str, default=None, help="Running server; in-process when omitted")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=16, help="Unmeasured requests sent first")
+    parser.add_argument("--sizes", type=str, default="256x256,1024x768")
+    parser.add_argument("--formats", type=str, default="jpeg,png,webp")
+    parser.add_argument("--images", type=str, default=None, help="Directory of real images to resize")
+    parser.add_argument("--keep-cache", action="store_true", help="Leave the in-process result cache enabled")
+    parser.add_argument("--ready-timeout", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, default=None)
+    args = parser.parse_args()
+
+    sizes = parse_sizes(args.sizes)
+    formats = [fmt.strip().lower() for fmt in args.formats.split(",")]
+    warmup = build_payloads(sizes, formats, args.warmup, args.images, seed=args.seed + args.requests)
+    payloads = build_payloads(sizes, formats, args.requests, args.images, seed=args.seed)
+
+    runner = run_against_url if args.url else run_in_process
+    results = asyncio.run(runner(args, warmup, payloads))
+    overall = results["overall"]
+    print(
+        f"{overall['count']} requests x{args.concurrency}: {overall['throughput_per_s']} req/s, "
+        f"p50 {overall['p50_ms']} ms, p95 {overall['p95_ms']} ms, p99 {overall['p99_ms']} ms "
+        f"{results['outcomes']}"
+    )
+
+    write_report(
+        {
+            "benchmark": "load",
+            "config": {
+                "target": args.url or "in-process",
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "warmup": args.warmup,
+                "sizes": args.sizes,
+                "formats": formats,
+                "images": args.images,
+                "result_cache": None if args.url else args.keep_cache,
+            },
+            "results": results,
+        },
+        args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
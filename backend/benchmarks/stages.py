@@ -0,0 +1,188 @@
+"""
+Microbenchmarks of each prediction stage in isolation.
+
+- decode: validate + decode to RGB, per size x format variant
+- preprocess: resize + normalize of a decoded image to the model input, next
+  to the per-call torchvision Compose it replaced (preprocess_reference) and
+  per-image cost when a whole batch is preprocessed at once (preprocess_batch)
+- guard: CLIP plant guard (the configured tier), per batch size
+- forward: classifier forward pass, per backbone and batch size (random weights)
+
+Usage:
+    python -m benchmarks.stages --stages decode,preprocess,forward \
+        --backbones efficientnet_b0,resnet50 --batch-sizes 1,8,16 --output results/stages.json
+"""
+
+import argparse
+import time
+
+import torch
+from torchvision import transforms
+
+from app.config import settings
+from app.models.classifier import build_model
+from app.utils.image_processing import IMAGENET_MEAN, IMAGENET_STD, decode_image, preprocess_image, preprocess_images
+from benchmarks.common import build_payloads, parse_sizes, summarize, write_report
+
+STAGES = ("decode", "preprocess", "guard", "forward")
+
+
+def measure(fn, repeats: int, warmup: int, items: int = 1) -> dict:
+    """Call ``fn`` ``warmup`` times unmeasured, then ``repeats`` times."""
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeats):
+        call_start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - call_start)
+    return summarize(latencies, time.perf_counter() - start, items=items * repeats)
+
+
+def bench_decode(payloads: list[tuple[str, bytes]], repeats: int, warmup: int) -> dict:
+    results = {}
+    for variant, body in dict(payloads).items():
+        decoded, message = decode_image(body)
+        if decoded is None:
+            raise SystemExit(f"Cannot decode {variant}: {message}")
+        results[f"decode/{variant}"] = measure(lambda body=body: decode_image(body), repeats, warmup)
+    return results
+
+
+def reference_transform() -> transforms.Compose:
+    """The torchvision pipeline that preprocess_images replaced, for single images."""
+    return transforms.Compose(
+        [
+            transforms.Resize((settings.image_size, settings.image_size)),
+            transforms.ToTensor(),
+            transforms.Normalize(mean=list(IMAGENET_MEAN), std=list(IMAGENET_STD)),
+        ]
+    )
+
+
+def reference_preprocess(image) -> torch.Tensor:
+    """The original serving path: a fresh Resize/ToTensor/Normalize Compose per call."""
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    return reference_transform()(image).unsqueeze(0).to(device)
+
+
+def bench_preprocess(
+    payloads: list[tuple[str, bytes]], batch_sizes: list[int], repeats: int, warmup: int
+) -> dict:
+    images = {}
+    for variant, body in dict(payloads).items():
+        decoded, message = decode_image(body)
+        if decoded is None:
+            raise SystemExit(f"Cannot decode {variant}: {message}")
+        images[variant] = decoded.image
+
+    results = {}
+    for variant, image in images.items():
+        results[f"preprocess_reference/{variant}"] = measure(
+            lambda image=image: reference_preprocess(image), repeats, warmup
+        )
+        results[f"preprocess/{variant}"] = measure(lambda image=image: preprocess_image(image), repeats, warmup)
+
+    mix = list(images.values())
+    for batch_size in batch_sizes:
+        batch = [mix[i % len(mix)] for i in range(batch_size)]
+        results[f"preprocess_batch/bs{batch_size}"] = measure(
+            lambda batch=batch: preprocess_images(batch), repeats, warmup, items=batch_size
+        )
+    return results
+
+
+def bench_guard(payloads: list[tuple[str, bytes]], batch_sizes: list[int], repeats: int, warmup: int) -> dict:
+    from app.utils.plant_guard import check_plant_validity_batch
+
+    images = [decode_image(body)[0].image for _, body in payloads]
+    results = {}
+    for batch_size in batch_sizes:
+        batch = [images[i % len(images)] for i in range(batch_size)]
+        results[f"guard/{settings.guard_tier}/bs{batch_size}"] = measure(
+            lambda batch=batch: check_plant_validity_batch(batch), repeats, warmup, items=batch_size
+        )
+    return results
+
+
+def bench_forward(backbones: list[str], batch_sizes: list[int], repeats: int, warmup: int) -> dict:
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    results = {}
+    for backbone in backbones:
+        model = build_model(settings.num_classes, backbone).to(device).eval()
+        for batch_size in batch_sizes:
+            inputs = torch.randn(batch_size, 3, settings.image_size, settings.image_size, device=device)
+
+            def forward(model=model, inputs=inputs):
+                with torch.inference_mode():
+                    model(inputs)
+                if device.type == "cuda":
+                    torch.cuda.synchronize()
+
+            results[f"forward/{backbone}/bs{batch_size}"] = measure(forward, repeats, warmup, items=batch_size)
+        del model
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each prediction stage")
+    parser.add_argument("--stages", type=str, default=",".join(STAGES))
+    parser.add_argument("--sizes", type=str, default="256x256,1024x768,2048x1536")
+    parser.add_argument("--formats", type=str, default="jpeg,png,webp")
+    parser.add_argument("--images", type=str, default=None, help="Directory of real images to resize")
+    parser.add_argument("--backbones", type=str, default="efficientnet_b0,resnet50")
+    parser.add_argument("--batch-sizes", type=str, default="1,8,16")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--output", type=str, default=None)
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(",")]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(sorted(unknown))}. Choose from {', '.join(STAGES)}")
+    sizes = parse_sizes(args.sizes)
+    formats = [fmt.strip().lower() for fmt in args.formats.split(",")]
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+    backbones = [backbone.strip() for backbone in args.backbones.split(",")]
+    payloads = build_payloads(sizes, formats, len(sizes) * len(formats), args.images)
+
+    results = {}
+    if "decode" in stages:
+        results.update(bench_decode(payloads, args.repeats, args.warmup))
+    if "preprocess" in stages:
+        results.update(bench_preprocess(payloads, batch_sizes, args.repeats, args.warmup))
+    if "guard" in stages:
+        results.update(bench_guard(payloads, batch_sizes, args.repeats, args.warmup))
+    if "forward" in stages:
+        results.update(bench_forward(backbones, batch_sizes, args.repeats, args.warmup))
+
+    for name, summary in results.items():
+        print(
+            f"{name:40s} p50 {summary['p50_ms']:9.3f} ms  p95 {summary['p95_ms']:9.3f} ms  "
+            f"{summary['throughput_per_s']:9.1f} items/s"
+        )
+
+    write_report(
+        {
+            "benchmark": "stages",
+            "config": {
+                "stages": stages,
+                "sizes": args.sizes,
+                "formats": formats,
+                "images": args.images,
+                "backbones": backbones,
+                "batch_sizes": batch_sizes,
+                "repeats": args.repeats,
+                "warmup": args.warmup,
+                "image_size": settings.image_size,
+            },
+            "results": results,
+        },
+        args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
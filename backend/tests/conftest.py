@@ -0,0 +1,53 @@
+import time
+from io import BytesIO
+
+import pytest
+import torch
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.main import app
+from app.services.batching import BatchingEngine
+from app.services.executor import shutdown_executor
+from app.services.registry import ModelEntry
+
+
+def slow_forward(inputs: torch.Tensor) -> torch.Tensor:
+    time.sleep(0.02)
+    return inputs
+
+
+@pytest.fixture
+def make_entry():
+    """Build registry entries around a pass-through batching engine instead of a checkpoint."""
+    entries = []
+
+    def build(name: str, model_path: str = "model.pth", backbone: str = "efficientnet_b0") -> ModelEntry:
+        entry = ModelEntry(
+            name=name,
+            model_path=model_path,
+            backbone=backbone,
+            model=None,
+            engine=BatchingEngine(slow_forward, max_batch_size=4, max_wait_ms=1, name=f"batching-{name}"),
+            detector=None,
+            namespace=f"{name}:{model_path}",
+        )
+        entries.append(entry)
+        return entry
+
+    yield build
+    for entry in entries:
+        entry.engine.close()
+
+
+def image_bytes(size: tuple[int, int] = (32, 32), format: str = "PNG", color: str = "green") -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", size, color).save(buffer, format=format)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def client():
+    # Without the lifespan: no model warm-up or job workers.
+    yield TestClient(app)
+    shutdown_executor()
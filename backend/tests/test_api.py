@@ -0,0 +1,39 @@
+import json
+
+from app.config import settings
+from app.routes import predict as predict_routes
+from tests.conftest import image_bytes
+
+
+def test_batch_streams_one_line_per_image(client, monkeypatch):
+    monkeypatch.setattr(settings, "batch_request_chunk_size", 2)
+
+    def predict_batch(images):
+        if len(images) == 1:
+            raise RuntimeError("engine closed")
+        return [{"success": True, "prediction": {"class_name": "healthy"}} for _ in images]
+
+    monkeypatch.setattr(predict_routes, "predict_batch", predict_batch)
+    files = [
+        ("files", ("a.png", image_bytes(), "image/png")),
+        ("files", ("notes.txt", b"hello", "text/plain")),
+        ("files", ("b.png", image_bytes(), "image/png")),
+        ("files", ("c.png", image_bytes(), "image/png")),
+        ("files", ("d.png", image_bytes(), "image/png")),
+    ]
+    response = client.post("/api/predict/batch", files=files)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["index"] for line in lines] == [0, 1, 2, 3, 4]
+    assert [line["filename"] for line in lines] == ["a.png", "notes.txt", "b.png", "c.png", "d.png"]
+    assert lines[0]["success"] is False and lines[0]["error"] == "Prediction failed. Please try again."
+    assert lines[1] == {
+        "index": 1,
+        "filename": "notes.txt",
+        "success": False,
+        "error": "Uploaded file must be an image.",
+    }
+    assert all(line["success"] for line in lines[2:4])
+    assert lines[4]["success"] is False
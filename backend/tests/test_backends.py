@@ -0,0 +1,43 @@
+import torch
+import torch.nn as nn
+
+from app.models import backends
+from app.models import classifier
+from app.models.classifier import checkpoint_model, load_checkpoint
+
+
+def test_missing_artifact_falls_back_to_eager(tmp_path, monkeypatch):
+    eager = nn.Identity()
+    calls = []
+    monkeypatch.setattr(backends, "load_model", lambda path, backbone: calls.append(path) or eager)
+
+    model_path = tmp_path / "model.pth"
+    for backend in ("torchscript", "static_int8", "onnx"):
+        assert not backends.artifact_path(model_path, backend).exists()
+        assert backends.load_inference_model(backend, str(model_path)) is eager
+    assert calls == [str(model_path)] * 3
+
+
+def test_artifact_paths_sit_next_to_checkpoint():
+    assert backends.artifact_path("models/saved/m.pth", "static_int8").as_posix() == "models/saved/m.int8.ts.pt"
+    assert backends.artifact_path("models/saved/m.pth", "onnx").as_posix() == "models/saved/m.onnx"
+
+
+def test_bare_state_dict_checkpoint_builds_configured_model(tmp_path, monkeypatch):
+    built = []
+
+    def build_model(num_classes, backbone):
+        built.append((num_classes, backbone))
+        return nn.Linear(4, num_classes)
+
+    monkeypatch.setattr(classifier, "build_model", build_model)
+    weights = nn.Linear(4, classifier.settings.num_classes).state_dict()
+    path = tmp_path / "bare.pth"
+    torch.save(weights, path)
+
+    checkpoint = load_checkpoint(path)
+    assert checkpoint.keys() == {"model_state_dict"}
+    model = checkpoint_model(checkpoint, backbone="resnet50")
+    assert built == [(classifier.settings.num_classes, "resnet50")]
+    assert not model.training
+    assert torch.equal(model.weight, weights["weight"])
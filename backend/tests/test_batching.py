@@ -0,0 +1,127 @@
+import queue
+import threading
+import time
+
+import pytest
+import torch
+
+from app.services import batching
+from app.services.batching import BatchingEngine
+
+
+class RecordingForward:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.batch_sizes = []
+        self.started = threading.Event()
+
+    def __call__(self, inputs: torch.Tensor) -> torch.Tensor:
+        self.started.set()
+        time.sleep(self.delay)
+        self.batch_sizes.append(inputs.shape[0])
+        return inputs * 2
+
+
+@pytest.fixture
+def engines():
+    created = []
+
+    def build(forward, max_batch_size=8, max_wait_ms=50.0):
+        engine = BatchingEngine(forward, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        created.append(engine)
+        return engine
+
+    yield build
+    for engine in created:
+        engine.close()
+
+
+def test_concurrent_requests_share_a_batch(engines):
+    forward = RecordingForward()
+    engine = engines(forward, max_batch_size=8, max_wait_ms=200)
+    inputs = [torch.full((1, 3, 2, 2), float(i)) for i in range(4)]
+
+    futures = [engine.submit(tensor) for tensor in inputs]
+    outputs = [future.result(timeout=5) for future in futures]
+
+    assert forward.batch_sizes == [4]
+    for tensor, output in zip(inputs, outputs):
+        assert output.shape == (1, 3, 2, 2)
+        assert (output == tensor * 2).all()
+    assert engine.stats()["histogram"] == {"4": 1}
+
+
+def test_batches_are_capped_at_max_batch_size(engines):
+    forward = RecordingForward(delay=0.05)
+    engine = engines(forward, max_batch_size=4, max_wait_ms=100)
+    blocker = engine.submit(torch.zeros(1, 3, 2, 2))
+    forward.started.wait(5)
+    futures = [engine.submit(torch.zeros(3, 3, 2, 2)) for _ in range(3)]
+
+    for future in [blocker, *futures]:
+        future.result(timeout=5)
+    # A request never splits: 3 + 3 rows exceed 4, so each waits for the next batch.
+    assert forward.batch_sizes == [1, 3, 3, 3]
+    assert engine.stats()["rows"] == 10
+
+
+def test_tuple_outputs_are_sliced_per_request(engines):
+    engine = engines(lambda inputs: (inputs + 1, inputs.sum(dim=(1, 2, 3))), max_wait_ms=100)
+    first = engine.submit(torch.zeros(2, 3, 2, 2))
+    second = engine.submit(torch.ones(1, 3, 2, 2))
+
+    logits, sums = second.result(timeout=5)
+    assert logits.shape == (1, 3, 2, 2) and sums.tolist() == [12.0]
+    assert first.result(timeout=5)[1].tolist() == [0.0, 0.0]
+
+
+def test_forward_errors_reach_every_caller(engines):
+    def forward(inputs):
+        raise ValueError("bad batch")
+
+    engine = engines(forward)
+    futures = [engine.submit(torch.zeros(1, 3, 2, 2)) for _ in range(2)]
+    for future in futures:
+        with pytest.raises(ValueError, match="bad batch"):
+            future.result(timeout=5)
+
+
+def test_close_drains_queued_requests_and_refuses_new_ones(engines):
+    forward = RecordingForward(delay=0.05)
+    engine = engines(forward, max_batch_size=1, max_wait_ms=0)
+    futures = [engine.submit(torch.zeros(1, 3, 2, 2)) for _ in range(3)]
+
+    engine.close()
+
+    assert all(future.done() for future in futures)
+    assert [future.result().shape for future in futures] == [(1, 3, 2, 2)] * 3
+    with pytest.raises(RuntimeError, match="closed"):
+        engine.submit(torch.zeros(1, 3, 2, 2))
+    engine.close()  # idempotent
+
+
+
+class SlowPutQueue(queue.SimpleQueue):
+    """Widens the window between a submit's closed check and its enqueue."""
+
+    def __init__(self):
+        self.putting = threading.Event()
+
+    def put(self, item, block=True, timeout=None):
+        if isinstance(item, tuple):
+            self.putting.set()
+            time.sleep(0.1)
+        super().put(item, block, timeout)
+
+
+def test_submit_racing_close_is_served_not_stranded(engines, monkeypatch):
+    monkeypatch.setattr(batching.queue, "SimpleQueue", SlowPutQueue)
+    engine = engines(RecordingForward(), max_batch_size=4, max_wait_ms=1)
+    futures = []
+    client = threading.Thread(target=lambda: futures.append(engine.submit(torch.zeros(1, 2))))
+    client.start()
+    engine._queue.putting.wait()
+
+    engine.close()
+    client.join()
+    assert futures[0].result(timeout=1).shape == (1, 2)
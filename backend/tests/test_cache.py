@@ -0,0 +1,124 @@
+import time
+
+import pytest
+
+from app.services.cache import ResultCache
+
+RESULT = {"success": True, "prediction": {"class_name": "Tomato___healthy"}}
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ResultCache(max_entries=2, ttl_seconds=60)
+    cache.put("model", "a", {"n": 1})
+    cache.put("model", "b", {"n": 2})
+    assert cache.get("model", "a") == {"n": 1}  # a is now the most recently used
+    cache.put("model", "c", {"n": 3})
+
+    assert cache.get("model", "b") is None
+    assert cache.get("model", "a") == {"n": 1}
+    assert cache.get("model", "c") == {"n": 3}
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (2, 3, 1)
+
+
+def test_entries_expire_after_ttl():
+    cache = ResultCache(max_entries=8, ttl_seconds=0.05)
+    cache.put("model", "a", RESULT)
+    time.sleep(0.1)
+    assert cache.get("model", "a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_namespaces_are_separate():
+    cache = ResultCache(max_entries=8, ttl_seconds=60)
+    cache.put("v1", "a", RESULT)
+    assert cache.get("v2", "a") is None
+
+    cache.retain_namespaces({"v2"})
+    assert cache.get("v1", "a") is None
+
+
+def test_disabled_cache_stores_nothing():
+    cache = ResultCache(max_entries=0, ttl_seconds=60)
+    cache.put("model", "a", RESULT)
+    assert cache.get("model", "a") is None
+    assert cache.stats()["enabled"] is False
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "cache" / "results.db")
+
+
+def test_sqlite_tier_is_shared_between_caches(db_path):
+    writer = ResultCache(max_entries=8, ttl_seconds=60, db_path=db_path)
+    reader = ResultCache(max_entries=8, ttl_seconds=60, db_path=db_path)
+    writer.put("model", "a", RESULT)
+
+    assert reader.get("model", "a") == RESULT
+    assert reader.get("model", "a") == RESULT  # now served from memory
+    stats = reader.stats()
+    assert (stats["disk"], stats["hits"], stats["disk_hits"]) == (True, 2, 1)
+
+
+def test_sqlite_tier_outlives_memory_eviction(db_path):
+    cache = ResultCache(max_entries=1, ttl_seconds=60, db_path=db_path)
+    cache.put("model", "a", RESULT)
+    cache.put("model", "b", RESULT)
+    assert cache.get("model", "a") == RESULT
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_retain_namespaces_leaves_the_shared_tier(db_path):
+    # Another worker may still serve "v1"; its rows expire by TTL instead.
+    cache = ResultCache(max_entries=8, ttl_seconds=60, db_path=db_path)
+    other_worker = ResultCache(max_entries=8, ttl_seconds=60, db_path=db_path)
+    cache.put("v1", "a", RESULT)
+    cache.retain_namespaces({"v2"})
+
+    assert other_worker.get("v1", "a") == RESULT
+
+
+def test_sqlite_rows_expire_after_ttl(db_path):
+    cache = ResultCache(max_entries=8, ttl_seconds=0.05, db_path=db_path)
+    cache.put("model", "a", RESULT)
+    time.sleep(0.1)
+    assert ResultCache(max_entries=8, ttl_seconds=0.05, db_path=db_path).get("model", "a") is None
+
+
+def test_clear_empties_both_tiers(db_path):
+    cache = ResultCache(max_entries=8, ttl_seconds=60, db_path=db_path)
+    cache.put("model", "a", RESULT)
+    cache.clear()
+    assert cache.get("model", "a") is None
+
+
+def test_callers_cannot_mutate_cached_results():
+    cache = ResultCache(max_entries=8, ttl_seconds=60)
+    result = {"success": True, "prediction": {"class_name": "Tomato___healthy"}}
+    cache.put("model", "a", result)
+    result["index"] = 3
+
+    hit = cache.get("model", "a")
+    hit["filename"] = "leaf.jpg"
+    hit["prediction"]["class_name"] = "changed"
+    assert cache.get("model", "a") == RESULT
+
+
+def test_expired_rows_are_pruned_on_an_interval(db_path):
+    cache = ResultCache(max_entries=8, ttl_seconds=0.05, db_path=db_path, prune_interval=3600)
+    cache.put("model", "a", RESULT)  # the first put prunes
+    time.sleep(0.1)
+    cache.put("model", "b", RESULT)
+
+    def rows():
+        return cache._db.execute("SELECT key FROM results ORDER BY key").fetchall()
+
+    assert rows() == [("model:a",), ("model:b",)]
+    cache.prune_interval = 0
+    time.sleep(0.1)
+    cache.put("model", "c", RESULT)
+    assert rows() == [("model:c",)]
+
+    plan = cache._db.execute("EXPLAIN QUERY PLAN DELETE FROM results WHERE created < 0").fetchall()
+    assert "results_created" in str(plan)
@@ -0,0 +1,68 @@
+import torch
+import torch.nn as nn
+
+from app.models.classifier import load_checkpoint
+from app.utils.memory import load_stats, track_load
+from training.convert_checkpoint import save_checkpoint, to_safetensors
+
+
+def make_checkpoint() -> dict:
+    return {
+        "model_state_dict": nn.Linear(4, 3).state_dict(),
+        "class_names": ["a", "b", "c"],
+        "backbone": "efficientnet_b0",
+        "num_classes": 3,
+        "ood_stats": {
+            "class_means": torch.randn(3, 4),
+            "precision": torch.eye(4),
+            "scores": {"energy": torch.arange(5.0), "msp": torch.linspace(0, 1, 5)},
+        },
+    }
+
+
+def assert_same(loaded: dict, expected: dict):
+    assert loaded["class_names"] == expected["class_names"]
+    assert loaded["num_classes"] == expected["num_classes"]
+    for key, value in expected["model_state_dict"].items():
+        assert torch.equal(loaded["model_state_dict"][key], value)
+    assert torch.equal(loaded["ood_stats"]["class_means"], expected["ood_stats"]["class_means"])
+    assert loaded["ood_stats"]["scores"].keys() == expected["ood_stats"]["scores"].keys()
+    assert torch.equal(loaded["ood_stats"]["scores"]["msp"], expected["ood_stats"]["scores"]["msp"])
+
+
+def test_pth_checkpoint_round_trip(tmp_path):
+    checkpoint = make_checkpoint()
+    path = tmp_path / "model.pth"
+    torch.save(checkpoint, path)
+    assert_same(load_checkpoint(path), checkpoint)
+
+
+def test_safetensors_conversion_round_trip(tmp_path):
+    checkpoint = make_checkpoint()
+    path = tmp_path / "model.pth"
+    torch.save(checkpoint, path)
+
+    output = to_safetensors(str(path))
+    assert output == tmp_path / "model.safetensors"
+    assert_same(load_checkpoint(output), checkpoint)
+
+
+def test_save_checkpoint_overwrites_a_mapped_checkpoint_in_its_format(tmp_path):
+    for name in ("model.pth", "model.safetensors"):
+        path = tmp_path / name
+        checkpoint = make_checkpoint()
+        save_checkpoint(checkpoint, path)
+        loaded = load_checkpoint(path)  # memory-mapped from the file being replaced
+        loaded["class_names"] = ["x", "y", "z"]
+        save_checkpoint(loaded, path)
+
+        assert load_checkpoint(path)["class_names"] == ["x", "y", "z"]
+        assert sorted(p.name for p in tmp_path.iterdir() if p.name.startswith(".")) == []
+
+
+def test_track_load_records_time_and_memory():
+    with track_load("test-model") as stats:
+        stats["model"] = "tiny"
+    recorded = load_stats.pop("test-model")
+    assert recorded["model"] == "tiny"
+    assert {"seconds", "rss_mb", "rss_delta_mb", "private_delta_mb"} <= recorded.keys()
@@ -0,0 +1,38 @@
+import json
+
+from app.services.catalog import build_class_catalog
+
+
+def test_classes_carry_etag_and_cache_headers(client):
+    response = client.get("/api/classes", headers={"Accept-Encoding": "identity"})
+
+    assert response.status_code == 200
+    assert response.json() == json.loads(json.dumps(build_class_catalog()))
+    assert response.headers["etag"].startswith('"')
+    assert response.headers["cache-control"].startswith("public, max-age=")
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert "content-encoding" not in response.headers
+
+
+def test_matching_etag_is_304(client):
+    etag = client.get("/api/classes", headers={"Accept-Encoding": "identity"}).headers["etag"]
+
+    response = client.get("/api/classes", headers={"If-None-Match": etag, "Accept-Encoding": "identity"})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    assert client.get("/api/classes", headers={"If-None-Match": '"stale"'}).status_code == 200
+    assert client.get("/api/classes", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+
+
+def test_gzip_representation_has_its_own_etag(client):
+    identity = client.get("/api/classes", headers={"Accept-Encoding": "identity"})
+    response = client.get("/api/classes", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] != identity.headers["etag"]
+    assert response.content == identity.content  # httpx decodes gzip
+    # Either representation's tag revalidates.
+    for etag in (identity.headers["etag"], response.headers["etag"]):
+        assert client.get("/api/classes", headers={"If-None-Match": etag}).status_code == 304
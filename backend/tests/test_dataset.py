@@ -0,0 +1,111 @@
+import pickle
+
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+
+from training.build_cache import build_cache, load_square
+from training.dataset import CachedImageDataset, create_split, load_split, split_dataset
+
+CLASSES = ["Apple___healthy", "Tomato___healthy"]
+
+
+@pytest.fixture
+def image_folder(tmp_path):
+    root = tmp_path / "PlantVillage"
+    for label, name in enumerate(CLASSES):
+        (root / name).mkdir(parents=True)
+        for i in range(3):
+            color = (40 * i, 200 * label, 10)
+            Image.new("RGB", (48 + 8 * i, 40), color).save(root / name / f"{i}.png")
+    return root
+
+
+def test_load_square_center_crops_after_resizing_the_short_side(tmp_path):
+    # 120x40: a red band, a green center square and a blue band.
+    image = Image.new("RGB", (120, 40), "red")
+    image.paste(Image.new("RGB", (40, 40), "green"), (40, 0))
+    image.paste(Image.new("RGB", (40, 40), "blue"), (80, 0))
+    image.save(tmp_path / "wide.png")
+
+    square = load_square(str(tmp_path / "wide.png"), 20)
+    assert square.shape == (20, 20, 3) and square.dtype == np.uint8
+    assert tuple(square[10, 10]) == (0, 128, 0)
+
+
+def test_cache_round_trips_every_image(image_folder, tmp_path):
+    manifest = build_cache(str(image_folder), str(tmp_path / "cache"), image_size=32, shard_size=4, workers=1)
+    assert manifest["count"] == 6
+    assert [shard["count"] for shard in manifest["shards"]] == [4, 2]
+
+    dataset = CachedImageDataset(str(tmp_path / "cache"))
+    assert dataset.classes == CLASSES
+    assert len(dataset) == 6
+    for i, relative in enumerate(manifest["samples"]):
+        image, label = dataset[i]
+        assert image.dtype == torch.uint8 and image.shape == (3, 32, 32)
+        assert label == CLASSES.index(relative.split("/")[0])
+        expected = load_square(str(image_folder / relative), 32)
+        assert torch.equal(image, torch.from_numpy(expected).permute(2, 0, 1))
+
+
+def test_cache_subset_and_pickling(image_folder, tmp_path):
+    build_cache(str(image_folder), str(tmp_path / "cache"), image_size=32, shard_size=4, workers=1)
+    full = CachedImageDataset(str(tmp_path / "cache"))
+    subset = CachedImageDataset(str(tmp_path / "cache"), indices=[5, 0])
+    assert len(subset) == 2
+    assert torch.equal(subset[0][0], full[5][0])
+
+    subset[0]  # opens the shards
+    clone = pickle.loads(pickle.dumps(subset))
+    assert clone._shards is None
+    assert torch.equal(clone[1][0], full[0][0])
+
+
+def test_missing_cache_points_at_build_cache(tmp_path):
+    with pytest.raises(FileNotFoundError, match="build_cache"):
+        CachedImageDataset(str(tmp_path / "nowhere"))
+
+
+def make_samples(counts: list[int]) -> list[tuple[str, int]]:
+    return [(f"{CLASSES[label]}/{i}.jpg", label) for label, count in enumerate(counts) for i in range(count)]
+
+
+def test_split_is_reproducible_from_the_seed():
+    samples = make_samples([20, 30])
+    first = create_split(samples, CLASSES, 0.2, seed=7)
+    assert create_split(list(reversed(samples)), CLASSES, 0.2, seed=7) == first
+    assert create_split(samples, CLASSES, 0.2, seed=8)["val"] != first["val"]
+
+
+def test_split_is_stratified_and_disjoint():
+    samples = make_samples([20, 30])
+    split = create_split(samples, CLASSES, 0.2, seed=7)
+    assert split["val"]["labels"].count(0) == 4
+    assert split["val"]["labels"].count(1) == 6
+    assert not set(split["train"]["files"]) & set(split["val"]["files"])
+    assert sorted(split["train"]["files"] + split["val"]["files"]) == sorted(path for path, _ in samples)
+    for name in ("train", "val"):
+        for path, label in zip(split[name]["files"], split[name]["labels"]):
+            assert path.startswith(CLASSES[label])
+
+
+def test_split_manifest_is_saved_once_and_checked(image_folder, tmp_path):
+    split_file = tmp_path / "splits" / "plantvillage.json"
+    split = load_split(str(split_file), str(image_folder), val_split=0.34, seed=1)
+    assert split_file.exists()
+    assert load_split(str(split_file), "missing-dir", val_split=0.34, seed=1) == split
+
+    with pytest.raises(ValueError, match="seed"):
+        load_split(str(split_file), str(image_folder), val_split=0.34, seed=2)
+
+
+def test_splits_read_the_same_images_from_folder_and_cache(image_folder, tmp_path):
+    build_cache(str(image_folder), str(tmp_path / "cache"), image_size=32, shard_size=4, workers=1)
+    split = load_split(str(tmp_path / "split.json"), cache_dir=str(tmp_path / "cache"), val_split=0.34, seed=1)
+    from_cache = split_dataset(split, "val", cache_dir=str(tmp_path / "cache"), transform=lambda image: image)
+    from_folder = split_dataset(split, "val", str(image_folder), transform=lambda image: image)
+
+    assert len(from_cache) == len(from_folder) == 2
+    assert [label for _, label in from_cache] == [label for _, label in from_folder] == [0, 1]
@@ -0,0 +1,35 @@
+import pytest
+import torch
+import torch.nn.functional as F
+
+from app.models.classifier import build_model, forward_with_features, supports_features
+from training.distill import distillation_loss
+
+
+@pytest.mark.parametrize("backbone", ["mobilenet_v3_small", "mobilenet_v3_large"])
+def test_mobilenet_features_feed_the_last_layer(backbone):
+    model = build_model(5, backbone).eval()
+    inputs = torch.randn(2, 3, 64, 64, generator=torch.Generator().manual_seed(0))
+    with torch.no_grad():
+        logits, features = forward_with_features(model, inputs)
+        expected = model(inputs)
+
+    assert supports_features(model)
+    assert logits.shape == (2, 5)
+    assert features.shape == (2, model.classifier[-1].in_features)
+    assert torch.allclose(logits, expected, atol=1e-5)
+
+
+def test_distillation_loss_blends_soft_and_hard_targets():
+    generator = torch.Generator().manual_seed(0)
+    student = torch.randn(4, 5, generator=generator)
+    teacher = torch.randn(4, 5, generator=generator)
+    labels = torch.tensor([0, 1, 2, 3])
+
+    hard = F.cross_entropy(student, labels)
+    assert torch.allclose(distillation_loss(student, teacher, labels, temperature=4.0, alpha=0.0), hard)
+    assert distillation_loss(teacher, teacher, labels, temperature=4.0, alpha=1.0).item() == pytest.approx(0.0, abs=1e-6)
+
+    soft_only = distillation_loss(student, teacher, labels, temperature=4.0, alpha=1.0)
+    mixed = distillation_loss(student, teacher, labels, temperature=4.0, alpha=0.5)
+    assert torch.allclose(mixed, 0.5 * soft_only + 0.5 * hard)
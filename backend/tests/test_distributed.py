@@ -0,0 +1,51 @@
+import os
+import socket
+
+import torch
+import torch.multiprocessing as mp
+
+from training import distributed
+from training.distributed import all_reduce_sum, barrier, cleanup_distributed, is_main_process, setup_distributed
+
+
+def test_single_process_is_a_no_op(monkeypatch):
+    monkeypatch.delenv("WORLD_SIZE", raising=False)
+    info = setup_distributed()
+    assert (info.rank, info.world_size, info.local_rank, info.enabled) == (0, 1, 0, False)
+    assert is_main_process()
+    assert all_reduce_sum(torch.tensor([2.0])).item() == 2.0
+    barrier()
+    cleanup_distributed()
+
+
+def _worker(rank: int, world_size: int, port: int, results) -> None:
+    os.environ.update(
+        {
+            "RANK": str(rank),
+            "WORLD_SIZE": str(world_size),
+            "LOCAL_RANK": str(rank),
+            "LOCAL_WORLD_SIZE": str(world_size),
+            "MASTER_ADDR": "127.0.0.1",
+            "MASTER_PORT": str(port),
+        }
+    )
+    info = distributed.setup_distributed(threads_per_process=1)
+    total = all_reduce_sum(torch.tensor([float(rank + 1)]))
+    results.put((info.rank, info.enabled, total.item(), torch.get_num_threads(), is_main_process()))
+    cleanup_distributed()
+
+
+def test_processes_join_a_gloo_group_and_sum():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    context = mp.get_context("spawn")
+    results = context.Queue()
+    processes = [context.Process(target=_worker, args=(rank, 2, port, results)) for rank in range(2)]
+    for process in processes:
+        process.start()
+    reports = sorted(results.get(timeout=60) for _ in processes)
+    for process in processes:
+        process.join(timeout=60)
+
+    assert reports == [(0, True, 3.0, 1, True), (1, True, 3.0, 1, False)]
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+
+from app.utils import image_processing
+from app.utils.image_processing import decode_image, preprocess_images
+from benchmarks.stages import reference_transform
+from tests.conftest import image_bytes
+
+
+def gradient_image(width: int, height: int) -> Image.Image:
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.stack([x * 255 // width, y * 255 // height, (x + y) % 256], axis=-1)
+    pixels = pixels + rng.integers(-20, 20, pixels.shape)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+@pytest.mark.parametrize("size", [(300, 200), (2000, 1500)], ids=["small", "reduced"])
+def test_preprocess_matches_reference_compose(size):
+    # Large images go through Image.reduce() first (reducing_gap), so allow a few levels.
+    image = gradient_image(*size)
+    expected = reference_transform()(image).unsqueeze(0)
+    actual = preprocess_images([image]).cpu()
+
+    assert actual.shape == expected.shape
+    difference = (actual - expected).abs()
+    assert difference.max().item() < 0.05
+    assert difference.mean().item() < 0.01
+
+
+def test_preprocess_converts_non_rgb_images():
+    image = gradient_image(64, 48).convert("L")
+    expected = reference_transform()(image.convert("RGB")).unsqueeze(0)
+    assert torch.allclose(preprocess_images([image]).cpu(), expected, atol=1e-5)
+
+
+def test_decode_opens_the_upload_once(monkeypatch):
+    opened = []
+    real_open = Image.open
+    monkeypatch.setattr(image_processing.Image, "open", lambda fp: opened.append(fp) or real_open(fp))
+
+    decoded, message = decode_image(image_bytes((40, 30), format="PNG"))
+    assert message == "OK"
+    assert len(opened) == 1
+    assert (decoded.format, decoded.size, decoded.image.mode) == ("PNG", (40, 30), "RGB")
+
+
+def test_large_jpeg_is_decoded_at_reduced_scale_keeping_original_size():
+    decoded, _ = decode_image(image_bytes((1792, 1344), format="JPEG"))
+    assert decoded.size == (1792, 1344)
+    assert decoded.image.width < 1792
+    assert min(decoded.image.size) >= 224
+
+
+def test_decode_rejects_non_images():
+    decoded, message = decode_image(b"not an image")
+    assert decoded is None
+    assert "Invalid image" in message
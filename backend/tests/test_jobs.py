@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services import jobs
+from app.services.executor import shutdown_executor
+from app.services.jobs import DONE, QUEUED, RUNNING, JobQueueFull, MemoryJobQueue, SQLiteJobQueue
+
+INVALID = {"success": False, "error": "Uploaded file must be an image."}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def queue(request, tmp_path):
+    if request.param == "memory":
+        queue = MemoryJobQueue(max_items=4)
+    else:
+        queue = SQLiteJobQueue(str(tmp_path / "jobs.db"), max_items=4)
+    yield queue
+    queue.close()
+
+
+def submit(queue, count: int = 3) -> str:
+    # The second upload was rejected when it was read.
+    payloads = [b"image-%d" % i if i != 1 else None for i in range(count)]
+    return queue.submit([f"{i}.png" for i in range(count)], payloads, {1: INVALID})
+
+
+def test_job_lifecycle(queue):
+    job_id = submit(queue)
+    job = queue.get(job_id)
+    assert (job["status"], job["total"], job["completed"]) == (RUNNING, 3, 1)
+    assert job["results"] == [{"index": 1, "filename": "1.png", **INVALID}]
+
+    items = queue.claim(max_items=8, timeout=0)
+    assert [(item.index, item.payload) for item in items] == [(0, b"image-0"), (2, b"image-2")]
+    assert queue.stats()["running_items"] == 2
+
+    queue.complete(items, [{"success": True, "index_seen": item.index} for item in items])
+    job = queue.get(job_id)
+    assert (job["status"], job["completed"]) == (DONE, 3)
+    assert [result["index"] for result in job["results"]] == [0, 1, 2]
+    assert queue.get("missing") is None
+
+
+def test_untouched_job_is_queued(queue):
+    job_id = queue.submit(["a.png"], [b"a"], {})
+    assert queue.get(job_id)["status"] == QUEUED
+
+
+def test_released_items_are_claimed_again_first(queue):
+    first = submit(queue)
+    queue.submit(["b.png"], [b"b"], {})
+    items = queue.claim(max_items=1, timeout=0)
+    queue.release(items)
+    again = queue.claim(max_items=1, timeout=0)
+    assert [(item.job_id, item.index) for item in again] == [(first, 0)]
+
+
+def test_full_queue_refuses_jobs(queue):
+    queue.submit(["a.png"] * 4, [b"a"] * 4, {})
+    with pytest.raises(JobQueueFull):
+        queue.submit(["b.png"], [b"b"], {})
+
+
+def test_purge_keeps_unfinished_jobs(queue):
+    job_id = submit(queue)
+    items = queue.claim(max_items=8, timeout=0)
+    time.sleep(0.01)
+    assert queue.purge(max_age_seconds=0) == 0
+    assert queue.get(job_id) is not None
+
+    queue.complete(items, [{"success": True}] * len(items))
+    assert queue.purge(max_age_seconds=3600) == 0
+    assert queue.purge(max_age_seconds=0) == 1
+    assert queue.get(job_id) is None
+    assert queue.stats()["jobs"] == 0
+
+
+class FlakyQueue(MemoryJobQueue):
+    """Fails the first claim, as a locked SQLite database would."""
+
+    def __init__(self):
+        super().__init__(max_items=8)
+        self.failures = 1
+
+    def claim(self, max_items, timeout):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("database is locked")
+        return super().claim(max_items, min(timeout, 0.05))
+
+
+def test_worker_survives_queue_errors(monkeypatch):
+    monkeypatch.setattr(jobs, "WORKER_RETRY_SECONDS", 0.01)
+    monkeypatch.setattr(jobs, "predict_batch", lambda images: [{"success": True} for _ in images])
+    queue = FlakyQueue()
+    job_id = queue.submit(["a.png", "b.png"], [b"a", b"b"], {})
+
+    async def run():
+        worker = asyncio.create_task(jobs._run_worker(queue))
+        try:
+            for _ in range(200):
+                if queue.get(job_id)["status"] == DONE:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+
+    try:
+        asyncio.run(run())
+    finally:
+        shutdown_executor()
+    assert queue.failures == 0
+    assert queue.get(job_id)["results"] == [
+        {"index": 0, "filename": "a.png", "success": True},
+        {"index": 1, "filename": "b.png", "success": True},
+    ]
@@ -0,0 +1,47 @@
+from prometheus_client import REGISTRY
+
+from app.utils import metrics
+from app.utils.metrics import DEVICE, ERROR, REJECTED, SUCCESS, StageTimer, outcome_of, record_reused
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_outcome_of_results():
+    assert outcome_of({"success": True}) == SUCCESS
+    assert outcome_of({"success": True, "rejected": True}) == REJECTED
+    assert outcome_of({"success": False}) == ERROR
+
+
+def test_stage_timer_charges_each_image_of_a_shared_stage():
+    labels = {"backbone": "test-timer", "device": DEVICE}
+    before = sample("pdv_stage_duration_seconds_count", stage="forward", outcome=SUCCESS, **labels)
+
+    timer = StageTimer(3)
+    with timer.stage("forward", [0, 2]):
+        pass
+    timer.add("decode", [1], 0.5)
+    timer.observe([{"success": True}, {"success": False}, {"success": True}], "test-timer")
+
+    assert sample("pdv_stage_duration_seconds_count", stage="forward", outcome=SUCCESS, **labels) == before + 2
+    assert sample("pdv_stage_duration_seconds_sum", stage="decode", outcome=ERROR, **labels) == 0.5
+    assert sample("pdv_predictions_total", outcome=SUCCESS, source="computed", **labels) == 2
+    assert sample("pdv_prediction_duration_seconds_count", outcome=ERROR, **labels) == 1
+
+
+def test_reused_results_are_counted_by_source():
+    labels = {"backbone": "test-reused", "device": DEVICE, "outcome": SUCCESS}
+    record_reused({"success": True}, "test-reused", "cache")
+    record_reused({"success": True}, "test-reused", "coalesced")
+    assert sample("pdv_predictions_total", source="cache", **labels) == 1
+    assert sample("pdv_predictions_total", source="coalesced", **labels) == 1
+
+
+def test_metrics_endpoint_exposes_pipeline_metrics(client):
+    metrics.TTA_ESCALATIONS.inc()
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "pdv_tta_escalations_total" in response.text
+    assert "pdv_stage_duration_seconds" in response.text
@@ -0,0 +1,47 @@
+import pytest
+import torch
+
+from app.utils.ood import ACCEPT, AMBIGUOUS, REJECT, OODDetector, ood_score
+
+
+def make_detector(method: str = "energy") -> OODDetector:
+    stats = {
+        "class_means": torch.eye(2),
+        "precision": torch.eye(2),
+        "scores": {method: torch.arange(101, dtype=torch.float32)},
+    }
+    return OODDetector(stats, method, accept_quantile=0.5, reject_quantile=0.1)
+
+
+def test_thresholds_come_from_in_distribution_quantiles():
+    detector = make_detector()
+    assert detector.accept_threshold == pytest.approx(50.0)
+    assert detector.reject_threshold == pytest.approx(10.0)
+
+
+def test_decisions_split_at_thresholds():
+    detector = make_detector()
+    # With one dominant logit the energy score is that logit.
+    logits = torch.tensor([[50.0, -1e4], [49.0, -1e4], [10.0, -1e4], [9.0, -1e4]])
+    assert detector.decide(logits) == [ACCEPT, AMBIGUOUS, AMBIGUOUS, REJECT]
+    stats = detector.stats()
+    assert (stats[ACCEPT], stats[AMBIGUOUS], stats[REJECT]) == (1, 2, 1)
+
+
+def test_mahalanobis_prefers_features_near_a_class_mean():
+    class_means = torch.tensor([[0.0, 0.0], [4.0, 4.0]])
+    features = torch.tensor([[4.0, 4.0], [2.0, 2.0], [10.0, -10.0]])
+    scores = ood_score("mahalanobis", torch.zeros(3, 2), features, class_means, torch.eye(2))
+    assert scores.tolist() == pytest.approx([0.0, -8.0, -200.0])
+
+
+def test_energy_and_msp_rank_confident_logits_higher():
+    logits = torch.tensor([[8.0, 0.0], [0.5, 0.0]])
+    for method in ("energy", "msp"):
+        scores = ood_score(method, logits)
+        assert scores[0] > scores[1]
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        make_detector("entropy")
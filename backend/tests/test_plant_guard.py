@@ -0,0 +1,38 @@
+import types
+
+import torch
+
+from app.config import settings
+from app.utils import plant_guard
+from app.utils.plant_guard import ALL_LABELS, PLANT_LABELS, load_text_embeddings, zero_shot_plant_probs
+
+
+def test_label_embeddings_are_encoded_once_and_persisted(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "guard_cache_dir", str(tmp_path))
+    calls = []
+
+    def encode_labels(model, processor, device):
+        calls.append(model)
+        return torch.eye(len(ALL_LABELS), 4)
+
+    monkeypatch.setattr(plant_guard, "encode_labels", encode_labels)
+    first = load_text_embeddings("clip", None, torch.device("cpu"), "openai/clip-vit-base-patch32")
+    second = load_text_embeddings("clip", None, torch.device("cpu"), "openai/clip-vit-base-patch32")
+
+    assert calls == ["clip"]
+    assert torch.equal(first, second)
+
+
+def test_label_cache_is_keyed_by_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "guard_cache_dir", str(tmp_path))
+    assert plant_guard._text_cache_path("model-a") != plant_guard._text_cache_path("model-b")
+    assert plant_guard._text_cache_path("model-a") == plant_guard._text_cache_path("model-a")
+
+
+def test_zero_shot_probability_is_mass_on_plant_labels():
+    model = types.SimpleNamespace(logit_scale=torch.tensor(0.0))  # exp(0) = 1
+    text_embeds = torch.eye(len(ALL_LABELS))
+    image_embeds = torch.zeros(1, len(ALL_LABELS))  # equal logits for every label
+
+    probs = zero_shot_plant_probs(model, text_embeds, image_embeds)
+    assert torch.allclose(probs, torch.tensor([len(PLANT_LABELS) / len(ALL_LABELS)]))
@@ -0,0 +1,49 @@
+import queue
+import sqlite3
+import threading
+
+import pytest
+
+from app.services import prediction
+
+
+class LockedCache:
+    def get(self, namespace, key):
+        return None
+
+    def put(self, namespace, key, value):
+        raise sqlite3.OperationalError("database is locked")
+
+
+@pytest.fixture
+def routed_entry(monkeypatch, make_entry):
+    entry = make_entry("default")
+
+    class Registry:
+        def route(self):
+            return entry.acquire()
+
+    monkeypatch.setattr(prediction, "registry", Registry())
+    monkeypatch.setattr(prediction, "get_result_cache", LockedCache)
+    monkeypatch.setattr(
+        prediction,
+        "_predict_uncached",
+        lambda images, entry, timer: [{"success": True, "prediction": {"class_name": "healthy"}} for _ in images],
+    )
+    return entry
+
+
+def test_cache_failure_reaches_coalesced_waiters(routed_entry):
+    outcome = queue.Queue()
+
+    def run():
+        try:
+            # The duplicate upload waits on the first one's single-flight future.
+            outcome.put(prediction.predict_batch([b"leaf", b"leaf"]))
+        except Exception as exc:
+            outcome.put(exc)
+
+    threading.Thread(target=run, daemon=True).start()
+    assert isinstance(outcome.get(timeout=5), sqlite3.OperationalError)
+    assert prediction.single_flight_stats()["in_flight"] == 0
+    assert routed_entry.to_dict()["in_flight"] == 0
@@ -0,0 +1,87 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import torch
+
+from app.services import registry as registry_module
+from app.services.registry import ModelRegistry
+
+
+@pytest.fixture
+def models(monkeypatch, make_entry):
+    monkeypatch.setattr(registry_module, "build_entry", make_entry)
+    registry = ModelRegistry()
+    registry.load("default", "v1.pth", "efficientnet_b0")
+    yield registry
+    registry.close()
+
+
+def test_route_acquires_active_entry(models):
+    entry = models.route()
+    assert entry.name == "default"
+    assert entry.to_dict()["in_flight"] == 1
+    entry.release()
+    assert entry.to_dict()["in_flight"] == 0
+
+
+def test_reload_keeps_engine_open_for_routed_requests(models):
+    routed = [models.route() for _ in range(6)]
+    previous = routed[0]
+    models.load("default", "v2.pth", "efficientnet_b0")
+
+    inputs = torch.zeros(1, 3, 4, 4)
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        outputs = list(pool.map(lambda entry: entry.engine.infer(inputs), routed))
+    assert all(output.shape == (1, 3, 4, 4) for output in outputs)
+
+    for entry in routed[:-1]:
+        entry.release()
+    previous.engine.submit(inputs).result()  # one request still holds the old entry
+    routed[-1].release()
+    with pytest.raises(RuntimeError, match="closed"):
+        previous.engine.submit(inputs)
+
+    current = models.route()
+    assert current.model_path == "v2.pth"
+    current.release()
+
+
+def test_swap_under_load(models):
+    models.load("candidate", "candidate.pth", "resnet50")
+    models.set_candidate("candidate", 50)
+    inputs = torch.zeros(1, 3, 4, 4)
+    errors = []
+    stop = threading.Event()
+
+    def client():
+        while not stop.is_set():
+            entry = models.route()
+            try:
+                entry.engine.infer(inputs)
+            except Exception as exc:  # pragma: no cover - the failure being tested for
+                errors.append(exc)
+            finally:
+                entry.release()
+
+    threads = [threading.Thread(target=client) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for version in range(3):
+        time.sleep(0.05)
+        models.load("default", f"v{version + 2}.pth", "efficientnet_b0")
+    time.sleep(0.05)
+    models.unload("candidate")
+    time.sleep(0.05)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert models.stats()["models"].keys() == {"default"}
+
+
+def test_unload_active_model_is_refused(models):
+    with pytest.raises(ValueError):
+        models.unload("default")
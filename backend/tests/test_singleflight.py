@@ -0,0 +1,34 @@
+import pytest
+
+from app.services.singleflight import SingleFlight
+
+
+def test_waiters_share_the_leaders_result():
+    flight = SingleFlight()
+    future, leader = flight.claim("key")
+    waiter, follower = flight.claim("key")
+    assert leader and not follower
+    assert waiter is future
+
+    flight.resolve("key", {"success": True})
+    assert waiter.result(timeout=1) == {"success": True}
+    assert flight.stats() == {"in_flight": 0, "computed": 1, "coalesced": 1}
+
+
+def test_waiters_get_the_leaders_exception():
+    flight = SingleFlight()
+    flight.claim("key")
+    waiter, _ = flight.claim("key")
+
+    flight.fail("key", ValueError("boom"))
+    with pytest.raises(ValueError, match="boom"):
+        waiter.result(timeout=1)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_resolved_key_is_computed_again():
+    flight = SingleFlight()
+    flight.claim("key")
+    flight.resolve("key", 1)
+    _, leader = flight.claim("key")
+    assert leader
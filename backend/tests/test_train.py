@@ -0,0 +1,17 @@
+import time
+
+import torch
+
+from training.train import PeakMemory
+
+
+def test_peak_memory_is_measured_per_block():
+    cpu = torch.device("cpu")
+    with PeakMemory(cpu, interval=0.01) as busy:
+        block = bytearray(256 * 2**20)
+        time.sleep(0.1)
+        del block
+    with PeakMemory(cpu, interval=0.01) as idle:
+        time.sleep(0.05)
+
+    assert busy.mb - idle.mb > 128
@@ -0,0 +1,38 @@
+import torch
+from PIL import Image
+
+from app.utils import plant_guard
+from app.utils.plant_guard import REJECTION_MESSAGE, check_plant_validity_batch
+from training.train_guard import calibrate_threshold, decision_metrics, train_head
+
+
+def test_threshold_keeps_target_recall_on_plants():
+    probs = torch.tensor([0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 0.95, 0.05])
+    labels = torch.tensor([1] * 10 + [0, 0])
+    for target_recall in (0.5, 0.9, 1.0):
+        threshold = calibrate_threshold(probs, labels, target_recall)
+        assert decision_metrics(probs >= threshold, labels)["plant_recall"] >= target_recall
+    assert calibrate_threshold(probs, labels, 0.5) > calibrate_threshold(probs, labels, 0.9)
+
+
+def test_head_separates_plant_embeddings():
+    generator = torch.Generator().manual_seed(0)
+    embeds = torch.randn(64, 8, generator=generator)
+    labels = (embeds[:, 0] > 0).long()
+    head = train_head(embeds, labels, epochs=300, lr=0.1, weight_decay=0.0)
+
+    with torch.no_grad():
+        accept = head(embeds) >= 0.5
+    assert decision_metrics(accept, labels)["accuracy"] > 0.9
+
+
+def test_guard_applies_the_tier_threshold(monkeypatch):
+    def scorer(embeds):
+        return embeds[:, 0]
+
+    monkeypatch.setattr(plant_guard, "_get_clip", lambda: (None, None, scorer, 0.5))
+    monkeypatch.setattr(plant_guard, "encode_images", lambda model, processor, images: torch.tensor([[0.9], [0.1]]))
+
+    blank = Image.new("RGB", (8, 8))
+    assert check_plant_validity_batch([blank, blank]) == [(True, None), (False, REJECTION_MESSAGE)]
+    assert check_plant_validity_batch([]) == []
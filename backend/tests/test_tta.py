@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+import torch
+
+from app.config import settings
+from app.services import prediction
+from app.services.prediction import ClassifierOutput, _escalate_uncertain
+from app.services.tta import TTAStats, augment, averaged_probabilities, hflip
+from app.utils.metrics import StageTimer
+
+
+class UniformEngine:
+    """Stands in for a BatchingEngine whose model is unsure about everything."""
+
+    def __init__(self, num_classes: int = 4):
+        self.num_classes = num_classes
+        self.batch_sizes = []
+
+    def infer(self, inputs: torch.Tensor) -> torch.Tensor:
+        self.batch_sizes.append(inputs.shape[0])
+        return torch.zeros(inputs.shape[0], self.num_classes)
+
+
+def test_augment_groups_outputs_by_view():
+    inputs = torch.arange(2 * 3 * 8 * 8, dtype=torch.float32).reshape(2, 3, 8, 8)
+    augmented = augment(inputs, ["hflip", "center_crop"])
+    assert augmented.shape == (4, 3, 8, 8)
+    assert torch.equal(augmented[:2], hflip(inputs))
+
+    with pytest.raises(ValueError, match="rotate"):
+        augment(inputs, ["rotate"])
+
+
+def test_views_are_averaged_with_the_original_prediction():
+    probs = np.array([[1.0, 0.0, 0.0, 0.0]])
+    averaged = averaged_probabilities(UniformEngine(), torch.zeros(1, 3, 8, 8), probs, ["hflip", "vflip", "center_crop"])
+    np.testing.assert_allclose(averaged, [[0.4375, 0.1875, 0.1875, 0.1875]])
+
+
+def test_only_low_confidence_images_are_escalated(monkeypatch):
+    monkeypatch.setattr(settings, "tta_confidence_threshold", 0.6)
+    monkeypatch.setattr(settings, "tta_views", ["hflip", "vflip"])
+    stats = TTAStats()
+    monkeypatch.setattr(prediction, "tta_stats", stats)
+
+    def output(probs):
+        return ClassifierOutput(np.array(probs), torch.zeros(1, 4), None, torch.zeros(3, 8, 8))
+
+    outputs = {0: output([0.9, 0.1, 0.0, 0.0]), 1: output([0.3, 0.5, 0.1, 0.1]), 2: output([0.7, 0.3, 0.0, 0.0])}
+    engine = UniformEngine()
+    _escalate_uncertain(engine, outputs, StageTimer(3))
+
+    assert engine.batch_sizes == [2]  # two views of the one uncertain image, in one pass
+    np.testing.assert_allclose(outputs[0].probs, [0.9, 0.1, 0.0, 0.0])
+    np.testing.assert_allclose(outputs[1].probs, (np.array([0.3, 0.5, 0.1, 0.1]) + 0.5) / 3)
+    assert stats.to_dict()["escalated"] == 1
+    assert stats.to_dict()["escalation_rate"] == pytest.approx(1 / 3, abs=1e-4)
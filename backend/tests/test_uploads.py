@@ -0,0 +1,75 @@
+import asyncio
+from io import BytesIO
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+
+from app.config import settings
+from app.routes import uploads
+from app.routes.uploads import read_upload
+from app.utils.image_processing import decode_image
+from tests.conftest import image_bytes
+
+
+def upload(body: bytes, content_type: str = "image/png", size: int | None = None) -> UploadFile:
+    # size=None is a chunked upload: nothing is known until the bytes arrive.
+    return UploadFile(BytesIO(body), size=size, filename="leaf.png", headers=Headers({"content-type": content_type}))
+
+
+def read(file: UploadFile) -> bytes:
+    return asyncio.run(read_upload(file))
+
+
+def test_reads_upload_in_small_chunks(monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_SIZE", 16)
+    body = image_bytes((64, 64), format="JPEG")
+    assert read(upload(body, "image/jpeg")) == body
+
+
+def test_upload_is_decoded_in_place():
+    payload = read(upload(image_bytes((48, 32))))
+    assert isinstance(payload, memoryview) and payload.readonly
+    decoded, message = decode_image(payload)
+    assert message == "OK"
+    assert (decoded.format, decoded.size) == ("PNG", (48, 32))
+
+
+def test_declared_size_over_limit_is_413(monkeypatch):
+    monkeypatch.setattr(settings, "max_file_size", 100)
+    with pytest.raises(HTTPException) as error:
+        read(upload(image_bytes(), size=10_000))
+    assert error.value.status_code == 413
+
+
+def test_streamed_bytes_over_limit_are_413(monkeypatch):
+    monkeypatch.setattr(settings, "max_file_size", 1024)
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_SIZE", 256)
+    body = image_bytes((256, 256), format="BMP")
+    with pytest.raises(HTTPException) as error:
+        read(upload(body, "image/bmp"))
+    assert error.value.status_code == 413
+
+
+def test_too_many_pixels_are_422_from_the_header(monkeypatch):
+    monkeypatch.setattr(settings, "max_image_pixels", 1000)
+    with pytest.raises(HTTPException) as error:
+        read(upload(image_bytes((64, 64))))
+    assert error.value.status_code == 422
+
+
+def test_disallowed_format_is_422(monkeypatch):
+    monkeypatch.setattr(settings, "allowed_extensions", {"jpeg", "jpg"})
+    with pytest.raises(HTTPException) as error:
+        read(upload(image_bytes()))
+    assert error.value.status_code == 422
+    assert error.value.detail.startswith("Unsupported format: PNG")
+
+
+def test_non_image_and_empty_uploads_are_400():
+    with pytest.raises(HTTPException) as error:
+        read(upload(b"hello", "text/plain"))
+    assert error.value.status_code == 400
+    with pytest.raises(HTTPException) as error:
+        read(upload(b""))
+    assert error.value.status_code == 400
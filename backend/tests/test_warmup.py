@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from app.services import executor as executor_module
+from app.services import warmup
+from app.services.executor import InferenceExecutor
+from app.services.warmup import FAILED, MISSING, PENDING, READY, Readiness, combine_reports
+
+
+@pytest.fixture
+def readiness(monkeypatch):
+    state = Readiness()
+    monkeypatch.setattr(warmup, "readiness", state)
+    return state
+
+
+def test_thread_mode_loads_models_in_this_process(monkeypatch, readiness):
+    monkeypatch.setattr(warmup, "load_classifier", lambda: READY)
+    monkeypatch.setattr(warmup, "load_guard", lambda: MISSING)
+    asyncio.run(warmup.warm_up_models())
+    assert readiness.components == {"classifier": READY, "guard": MISSING}
+    assert not readiness.ready
+
+
+def test_process_mode_waits_for_worker_reports(monkeypatch, readiness):
+    def load():
+        raise AssertionError("the API process must not load models in process mode")
+
+    monkeypatch.setattr(warmup, "load_classifier", load)
+    monkeypatch.setattr(warmup, "load_guard", load)
+
+    class Workers:
+        kind = "process"
+
+        def wait_for_workers(self):
+            return [{"classifier": READY, "guard": READY}] * 2
+
+    asyncio.run(warmup.warm_up_models(Workers()))
+    assert readiness.ready
+
+
+def test_one_unready_worker_holds_back_readiness():
+    reports = [
+        {"classifier": READY, "guard": READY},
+        {"classifier": MISSING, "guard": FAILED},
+        {"classifier": FAILED, "guard": READY},
+    ]
+    assert combine_reports(reports) == {"classifier": FAILED, "guard": FAILED}
+    assert combine_reports(reports[:2]) == {"classifier": MISSING, "guard": FAILED}
+    assert combine_reports([{"classifier": READY}]) == {"classifier": READY, "guard": FAILED}
+    assert combine_reports([{"classifier": PENDING, "guard": READY}])["classifier"] == PENDING
+
+
+def test_thread_executor_keeps_torch_threads(monkeypatch):
+    calls = []
+    monkeypatch.setattr(executor_module.torch, "set_num_threads", calls.append)
+    monkeypatch.setattr(executor_module.settings, "torch_num_threads", 0)
+    executor = InferenceExecutor("thread", max_workers=4, max_queue=0, retry_after=1)
+    try:
+        assert asyncio.run(executor.run(sum, [1, 2])) == 3
+    finally:
+        executor.shutdown()
+    assert calls == []
+
+
+def test_ready_endpoint_is_gated_on_every_component(client, monkeypatch):
+    monkeypatch.setitem(warmup.readiness.components, "classifier", READY)
+    monkeypatch.setitem(warmup.readiness.components, "guard", PENDING)
+    response = client.get("/api/health/ready")
+    assert response.status_code == 503
+    assert response.json()["components"] == {"classifier": READY, "guard": PENDING}
+
+    monkeypatch.setitem(warmup.readiness.components, "guard", READY)
+    response = client.get("/api/health/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+
+
+def test_load_failures_are_reported_not_raised(monkeypatch):
+    def broken(sizes):
+        raise RuntimeError("corrupt checkpoint")
+
+    monkeypatch.setattr(warmup, "warm_up_classifier", broken)
+    monkeypatch.setattr(warmup, "warm_up_guard", broken)
+    assert warmup.load_classifier() == FAILED
+    assert warmup.load_guard() == FAILED
+
+    monkeypatch.setattr(warmup, "warm_up_classifier", lambda sizes: False)
+    assert warmup.load_classifier() == MISSING
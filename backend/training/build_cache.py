@@ -0,0 +1,106 @@
+"""
+Pre-decode the PlantVillage images into a memory-mapped training cache.
+
+Every image is decoded once, resized so its shorter side is --image-size,
+center-cropped to a square and stored as uint8 HWC in shards of
+--shard-size images (images-00000.npy, ...). labels.npy holds the class
+index of every image and manifest.json the class names, the shard layout
+and the source path of every image. Read it with
+training.dataset.CachedImageDataset, or pass --cache-dir to training.train.
+
+The default size of 256 matches VAL_TRANSFORMS' resize, so training crops
+and validation center crops see the same pixels as from the JPEGs.
+
+Usage:
+    python -m training.build_cache --data-dir data/PlantVillage --output data/cache/plantvillage-256
+"""
+
+import argparse
+import json
+import time
+from functools import partial
+from multiprocessing import Pool
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+from torchvision import datasets
+
+from training.dataset import CACHE_MANIFEST, CACHE_VERSION
+
+
+def load_square(path: str, size: int) -> np.ndarray:
+    with Image.open(path) as image:
+        image = image.convert("RGB")
+        width, height = image.size
+        scale = size / min(width, height)
+        resized = (max(size, round(width * scale)), max(size, round(height * scale)))
+        if resized != image.size:
+            image = image.resize(resized, Image.Resampling.BILINEAR, reducing_gap=3.0)
+        left, top = (resized[0] - size) // 2, (resized[1] - size) // 2
+        return np.asarray(image.crop((left, top, left + size, top + size)))
+
+
+def build_cache(
+    data_dir: str, output_dir: str, image_size: int = 256, shard_size: int = 4096, workers: int = 4
+) -> dict:
+    folder = datasets.ImageFolder(root=data_dir)
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+
+    paths = [path for path, _ in folder.samples]
+    labels = np.asarray(folder.targets, dtype=np.int64)
+    np.save(output / "labels.npy", labels)
+
+    shards = []
+    load = partial(load_square, size=image_size)
+    with Pool(workers) as pool:
+        for start in range(0, len(paths), shard_size):
+            chunk = paths[start : start + shard_size]
+            name = f"images-{len(shards):05d}.npy"
+            images = np.lib.format.open_memmap(
+                output / name, mode="w+", dtype=np.uint8, shape=(len(chunk), image_size, image_size, 3)
+            )
+            for offset, array in enumerate(pool.imap(load, chunk, chunksize=32)):
+                images[offset] = array
+            images.flush()
+            del images
+            shards.append({"file": name, "count": len(chunk)})
+            print(f"  {start + len(chunk)}/{len(paths)} images")
+
+    manifest = {
+        "version": CACHE_VERSION,
+        "source": str(Path(data_dir).resolve()),
+        "image_size": image_size,
+        "classes": folder.classes,
+        "count": len(paths),
+        "labels": "labels.npy",
+        "shards": shards,
+        "samples": [Path(path).relative_to(data_dir).as_posix() for path in paths],
+    }
+    # Written last: a cache without a manifest is an interrupted build.
+    (output / CACHE_MANIFEST).write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a pre-decoded, memory-mapped PlantVillage cache")
+    parser.add_argument("--data-dir", type=str, default="data/PlantVillage")
+    parser.add_argument("--output", type=str, default="data/cache/plantvillage-256")
+    parser.add_argument("--image-size", type=int, default=256)
+    parser.add_argument("--shard-size", type=int, default=4096, help="Images per shard file")
+    parser.add_argument("--workers", type=int, default=4, help="Decoding processes")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    manifest = build_cache(args.data_dir, args.output, args.image_size, args.shard_size, args.workers)
+    elapsed = time.perf_counter() - start
+    size_gb = manifest["count"] * args.image_size**2 * 3 / 1e9
+    print(
+        f"Cached {manifest['count']} images ({len(manifest['classes'])} classes, {len(manifest['shards'])} shards, "
+        f"{size_gb:.1f} GB) to {args.output} in {elapsed:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Convert a training checkpoint (.pth) to safetensors for memory-mapped serving.
+
+Weights are stored under a "model." prefix and OOD statistics under
+"ood_stats."; the remaining metadata (backbone, class names, ...) goes into
+the safetensors header as JSON. Point PDV_MODEL_PATH at the output to use it.
+
+Usage:
+    python -m training.convert_checkpoint --model-path models/saved/plant_disease_model.pth
+"""
+
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+import torch
+from safetensors.torch import save_file
+
+from app.models.classifier import load_checkpoint
+
+
+def save_safetensors(checkpoint: dict, output: str | Path) -> None:
+    """Write a checkpoint dict (the :func:`load_checkpoint` layout) as safetensors."""
+    checkpoint = dict(checkpoint)
+    tensors = {f"model.{key}": value.contiguous() for key, value in checkpoint.pop("model_state_dict").items()}
+    ood_stats = checkpoint.pop("ood_stats", None)
+    if ood_stats is not None:
+        tensors["ood_stats.class_means"] = ood_stats["class_means"].contiguous()
+        tensors["ood_stats.precision"] = ood_stats["precision"].contiguous()
+        for method, scores in ood_stats["scores"].items():
+            tensors[f"ood_stats.scores.{method}"] = scores.contiguous()
+
+    metadata = {key: json.dumps(value) for key, value in checkpoint.items()}
+    save_file(tensors, str(output), metadata=metadata)
+
+
+def save_checkpoint(checkpoint: dict, path: str | Path) -> None:
+    """Overwrite a checkpoint in its own format (by suffix).
+
+    The new file is written beside the old one and renamed over it, since
+    ``load_checkpoint`` memory-maps the tensors being saved from the old file.
+    """
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.tmp")
+    if path.suffix == ".safetensors":
+        save_safetensors(checkpoint, tmp)
+    else:
+        torch.save(checkpoint, tmp)
+    os.replace(tmp, path)
+
+
+def to_safetensors(model_path: str, output_path: str | None = None) -> Path:
+    output = Path(output_path) if output_path else Path(model_path).with_suffix(".safetensors")
+    save_safetensors(load_checkpoint(model_path), output)
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a checkpoint to safetensors")
+    parser.add_argument("--model-path", type=str, required=True)
+    parser.add_argument("--output", type=str, default=None)
+    args = parser.parse_args()
+
+    output = to_safetensors(args.model_path, args.output)
+    print(f"Saved {output} ({output.stat().st_size / 2**20:.1f} MB)")
+
+    for path in (Path(args.model_path), output):
+        start = time.perf_counter()
+        load_checkpoint(path)
+        print(f"  load_checkpoint({path.name}): {1000 * (time.perf_counter() - start):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,10 +16,25 @@ Expected directory structure:
 The dataset contains 38 classes of plant leaf images across 14 plant species.
 """
 
+import json
+import random
+from collections import defaultdict
 from pathlib import Path
 
-from torch.utils.data import DataLoader, random_split
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Dataset, DistributedSampler
 from torchvision import datasets, transforms
+from torchvision.transforms import v2
+
+from training.distributed import is_main_process
+
+CACHE_MANIFEST = "manifest.json"
+CACHE_VERSION = 1
+
+SPLIT_VERSION = 1
+DEFAULT_SPLIT_FILE = "data/splits/plantvillage.json"
+DEFAULT_SEED = 42
 
 TRAIN_TRANSFORMS = transforms.Compose(
     [
@@ -42,49 +57,251 @@ VAL_TRANSFORMS = transforms.Compose(
     ]
 )
 
+# The same augmentation for CachedImageDataset, applied to uint8 CHW tensors.
+# The cache is already resized to 256, so validation only needs the crop.
+CACHED_TRAIN_TRANSFORMS = v2.Compose(
+    [
+        v2.RandomResizedCrop(224, scale=(0.8, 1.0), antialias=True),
+        v2.RandomHorizontalFlip(),
+        v2.RandomVerticalFlip(),
+        v2.RandomRotation(15),
+        v2.ColorJitter(brightness=0.2, contrast=0.2, saturation=0.2, hue=0.1),
+        v2.ToDtype(torch.float32, scale=True),
+        v2.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
+    ]
+)
+
+CACHED_VAL_TRANSFORMS = v2.Compose(
+    [
+        v2.CenterCrop(224),
+        v2.ToDtype(torch.float32, scale=True),
+        v2.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
+    ]
+)
+
+
+def read_cache_manifest(cache_dir: str) -> dict:
+    path = Path(cache_dir) / CACHE_MANIFEST
+    if not path.exists():
+        raise FileNotFoundError(
+            f"No dataset cache at {Path(cache_dir).resolve()}. Build one with python -m training.build_cache"
+        )
+    manifest = json.loads(path.read_text())
+    if manifest.get("version") != CACHE_VERSION:
+        raise ValueError(f"Dataset cache {cache_dir} has format {manifest.get('version')}, expected {CACHE_VERSION}")
+    return manifest
+
+
+class CachedImageDataset(Dataset):
+    """Images from a cache written by training.build_cache, as uint8 CHW tensors.
+
+    Shards are memory-mapped copy-on-write: a sample is a view into the page
+    cache, shared by every DataLoader worker, until the transform produces a
+    new tensor. ``indices`` restricts the dataset to part of the cache.
+    """
+
+    def __init__(self, cache_dir: str, transform=None, indices=None):
+        manifest = read_cache_manifest(cache_dir)
+        self.cache_dir = Path(cache_dir)
+        self.transform = transform
+        self.classes = manifest["classes"]
+        self.targets = np.load(self.cache_dir / manifest["labels"])
+        self.indices = np.arange(manifest["count"]) if indices is None else np.asarray(indices, dtype=np.int64)
+        self._files = [self.cache_dir / shard["file"] for shard in manifest["shards"]]
+        self._offsets = np.cumsum([0] + [shard["count"] for shard in manifest["shards"]])
+        self._shards = None
+
+    def __getstate__(self):
+        # Workers started with spawn/forkserver re-open the shards instead of
+        # receiving a pickled copy of every image.
+        state = self.__dict__.copy()
+        state["_shards"] = None
+        return state
+
+    def _open(self) -> list[np.ndarray]:
+        if self._shards is None:
+            self._shards = [np.load(path, mmap_mode="c") for path in self._files]
+        return self._shards
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, i: int) -> tuple[torch.Tensor, int]:
+        index = int(self.indices[i])
+        shard = int(np.searchsorted(self._offsets, index, side="right")) - 1
+        image = torch.from_numpy(self._open()[shard][index - self._offsets[shard]]).permute(2, 0, 1)
+        if self.transform is not None:
+            image = self.transform(image)
+        return image, int(self.targets[index])
+
+
+class ImageListDataset(Dataset):
+    """The images of one split, decoded from ``root`` with the split's own transform."""
+
+    def __init__(self, root: str, files: list[str], labels: list[int], classes: list[str], transform=None):
+        self.root = Path(root)
+        self.files = files
+        self.targets = labels
+        self.classes = classes
+        self.transform = transform
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def __getitem__(self, i: int):
+        image = datasets.folder.default_loader(str(self.root / self.files[i]))
+        if self.transform is not None:
+            image = self.transform(image)
+        return image, self.targets[i]
+
+
+def create_split(samples: list[tuple[str, int]], classes: list[str], val_split: float, seed: int) -> dict:
+    """Stratified train/val split of (relative path, label) pairs, reproducible from ``seed``."""
+    by_class = defaultdict(list)
+    for path, label in samples:
+        by_class[label].append(path)
+
+    rng = random.Random(seed)
+    split = {"train": {"files": [], "labels": []}, "val": {"files": [], "labels": []}}
+    for label in sorted(by_class):
+        files = sorted(by_class[label])
+        rng.shuffle(files)
+        val_size = int(len(files) * val_split)
+        for name, chunk in (("val", files[:val_size]), ("train", files[val_size:])):
+            split[name]["files"].extend(chunk)
+            split[name]["labels"].extend([label] * len(chunk))
+    return {"version": SPLIT_VERSION, "seed": seed, "val_split": val_split, "classes": classes, **split}
+
+
+def load_split(
+    split_file: str = DEFAULT_SPLIT_FILE,
+    data_dir: str = "data/PlantVillage",
+    val_split: float = 0.2,
+    seed: int = DEFAULT_SEED,
+    cache_dir: str | None = None,
+) -> dict:
+    """Read the split manifest, creating and saving it on first use.
+
+    A new split lists the images of the cache when ``cache_dir`` is given,
+    otherwise it scans ``data_dir``; an existing one is reused without either.
+    """
+    path = Path(split_file)
+    if path.exists():
+        split = json.loads(path.read_text())
+        if split.get("version") != SPLIT_VERSION:
+            raise ValueError(f"Split file {path} has format {split.get('version')}, expected {SPLIT_VERSION}")
+        if (split["seed"], split["val_split"]) != (seed, val_split):
+            raise ValueError(
+                f"Split file {path} was made with seed={split['seed']}, val_split={split['val_split']}; "
+                "pass matching values or a different --split-file"
+            )
+        return split
+
+    if cache_dir:
+        manifest = read_cache_manifest(cache_dir)
+        labels = np.load(Path(cache_dir) / manifest["labels"]).tolist()
+        samples, classes = list(zip(manifest["samples"], labels)), manifest["classes"]
+    else:
+        data_path = Path(data_dir)
+        if not data_path.exists():
+            raise FileNotFoundError(
+                f"Dataset not found at {data_path.resolve()}. "
+                "Download from https://www.kaggle.com/datasets/emmarex/plantdisease"
+            )
+        folder = datasets.ImageFolder(root=str(data_path))
+        samples = [(Path(file).relative_to(data_path).as_posix(), label) for file, label in folder.samples]
+        classes = folder.classes
+
+    split = create_split(samples, classes, val_split, seed)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(split))
+    print(f"Split saved to {path}")
+    return split
+
+
+def split_dataset(
+    split: dict, name: str, data_dir: str = "data/PlantVillage", cache_dir: str | None = None, transform=None
+) -> Dataset:
+    """Dataset over one split ("train" or "val"), from the JPEGs or from the cache.
+
+    ``transform`` defaults to the split's augmentation for that source.
+    """
+    files, labels = split[name]["files"], split[name]["labels"]
+    if cache_dir:
+        if transform is None:
+            transform = CACHED_TRAIN_TRANSFORMS if name == "train" else CACHED_VAL_TRANSFORMS
+        manifest = read_cache_manifest(cache_dir)
+        if manifest["classes"] != split["classes"]:
+            raise ValueError(f"Dataset cache {cache_dir} has different classes than the split")
+        positions = {file: index for index, file in enumerate(manifest["samples"])}
+        missing = sum(file not in positions for file in files)
+        if missing:
+            raise ValueError(f"{missing} images of the {name} split are not in {cache_dir}; rebuild the cache")
+        return CachedImageDataset(cache_dir, transform, [positions[file] for file in files])
+
+    if transform is None:
+        transform = TRAIN_TRANSFORMS if name == "train" else VAL_TRANSFORMS
+    return ImageListDataset(data_dir, files, labels, split["classes"], transform)
+
 
 def get_dataloaders(
     data_dir: str = "data/PlantVillage",
     batch_size: int = 32,
     val_split: float = 0.2,
     num_workers: int = 4,
+    cache_dir: str | None = None,
+    split_file: str = DEFAULT_SPLIT_FILE,
+    seed: int = DEFAULT_SEED,
+    persistent_workers: bool = False,
+    prefetch_factor: int | None = None,
+    distributed: bool = False,
 ) -> tuple[DataLoader, DataLoader, list[str]]:
-    data_path = Path(data_dir)
-    if not data_path.exists():
-        raise FileNotFoundError(
-            f"Dataset not found at {data_path.resolve()}. "
-            "Download from https://www.kaggle.com/datasets/emmarex/plantdisease"
-        )
-
-    full_dataset = datasets.ImageFolder(root=str(data_path))
-    class_names = full_dataset.classes
+    """Train and validation loaders over the split in ``split_file``.
 
-    total = len(full_dataset)
-    val_size = int(total * val_split)
-    train_size = total - val_size
+    With ``distributed`` both loaders read only this process's shard of their
+    split (DistributedSampler); call ``train_loader.sampler.set_epoch`` every
+    epoch to reshuffle.
+    """
+    split = load_split(split_file, data_dir, val_split, seed, cache_dir)
+    class_names = split["classes"]
+    train_dataset = split_dataset(split, "train", data_dir, cache_dir)
+    val_dataset = split_dataset(split, "val", data_dir, cache_dir)
 
-    train_dataset, val_dataset = random_split(full_dataset, [train_size, val_size])
+    # Worker options are only valid with worker processes.
+    worker_options = {}
+    if num_workers > 0:
+        worker_options = {"persistent_workers": persistent_workers, "prefetch_factor": prefetch_factor}
 
-    train_dataset.dataset.transform = TRAIN_TRANSFORMS
-    val_dataset.dataset.transform = VAL_TRANSFORMS
+    train_sampler = val_sampler = None
+    if distributed:
+        train_sampler = DistributedSampler(train_dataset, shuffle=True, seed=seed)
+        # Pads the last shard with up to world_size - 1 repeated images.
+        val_sampler = DistributedSampler(val_dataset, shuffle=False)
 
     train_loader = DataLoader(
         train_dataset,
         batch_size=batch_size,
-        shuffle=True,
+        shuffle=train_sampler is None,
+        sampler=train_sampler,
         num_workers=num_workers,
-        pin_memory=True,
+        pin_memory=torch.cuda.is_available(),
+        **worker_options,
     )
 
     val_loader = DataLoader(
         val_dataset,
         batch_size=batch_size,
         shuffle=False,
+        sampler=val_sampler,
         num_workers=num_workers,
-        pin_memory=True,
+        pin_memory=torch.cuda.is_available(),
+        **worker_options,
     )
 
-    print(f"Dataset loaded: {total} images, {len(class_names)} classes")
-    print(f"  Train: {train_size} | Validation: {val_size}")
+    if is_main_process():
+        source = f"cache {cache_dir}" if cache_dir else data_dir
+        total = len(train_dataset) + len(val_dataset)
+        print(f"Dataset loaded from {source}: {total} images, {len(class_names)} classes")
+        print(f"  Train: {len(train_dataset)} | Validation: {len(val_dataset)} | Split: {split_file} (seed {seed})")
 
     return train_loader, val_loader, class_names
@@ -0,0 +1,295 @@
+"""
+Distill a trained classifier into a smaller MobileNetV3 student.
+
+The student is trained on the teacher's split with a mix of the soft-target
+loss (KL divergence between temperature-softened teacher and student
+distributions, scaled by T^2) and the usual cross-entropy on the labels:
+
+    loss = alpha * T^2 * KL(teacher_T || student_T) + (1 - alpha) * CE(student, label)
+
+The best student by validation accuracy is saved in the training.train
+checkpoint format (with OOD statistics), so it is served like any other
+checkpoint with PDV_MODEL_BACKBONE set to the student backbone.
+distillation_report.json next to it compares teacher and student accuracy,
+CPU latency and parameter count.
+
+Usage:
+    python -m training.distill --teacher-path models/saved/plant_disease_model.pth \
+        --student mobilenet_v3_large --cache-dir data/cache/plantvillage-256 --epochs 15
+"""
+
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+import torch.optim as optim
+
+from app.models import classifier
+from training.dataset import DEFAULT_SEED, DEFAULT_SPLIT_FILE, get_dataloaders
+from training.ood import compute_ood_stats
+from training.train import PeakMemory, build_model, validate
+
+STUDENTS = ("mobilenet_v3_small", "mobilenet_v3_large")
+
+
+def distillation_loss(
+    student_logits: torch.Tensor, teacher_logits: torch.Tensor, labels: torch.Tensor, temperature: float, alpha: float
+) -> torch.Tensor:
+    soft = F.kl_div(
+        F.log_softmax(student_logits.float() / temperature, dim=1),
+        F.log_softmax(teacher_logits.float() / temperature, dim=1),
+        reduction="batchmean",
+        log_target=True,
+    )
+    hard = F.cross_entropy(student_logits.float(), labels)
+    return alpha * temperature**2 * soft + (1 - alpha) * hard
+
+
+def distill_one_epoch(
+    student: nn.Module,
+    teacher: nn.Module,
+    loader,
+    optimizer,
+    device: torch.device,
+    temperature: float,
+    alpha: float,
+    bf16: bool = False,
+    channels_last: bool = False,
+) -> tuple[float, float]:
+    student.train()
+    running_loss = torch.zeros((), device=device)
+    correct = torch.zeros((), device=device)
+    total = 0
+    memory_format = torch.channels_last if channels_last else torch.contiguous_format
+
+    for batch_idx, (images, labels) in enumerate(loader):
+        images = images.to(device, memory_format=memory_format, non_blocking=True)
+        labels = labels.to(device, non_blocking=True)
+
+        with torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=bf16):
+            with torch.no_grad():
+                teacher_logits = teacher(images)
+            outputs = student(images)
+        loss = distillation_loss(outputs, teacher_logits, labels, temperature, alpha)
+
+        optimizer.zero_grad(set_to_none=True)
+        loss.backward()
+        optimizer.step()
+
+        running_loss += loss.detach() * images.size(0)
+        correct += outputs.argmax(1).eq(labels).sum()
+        total += labels.size(0)
+
+        if (batch_idx + 1) % 50 == 0:
+            print(f"    Batch {batch_idx + 1}/{len(loader)} — Loss: {loss.item():.4f}")
+
+    return running_loss.item() / total, correct.item() / total
+
+
+@torch.inference_mode()
+def measure_latency(model: nn.Module, batch_size: int, repeats: int = 30, warmup: int = 5) -> float:
+    """Median eager CPU forward latency in milliseconds for one batch."""
+    model = model.cpu().eval()
+    inputs = torch.randn(batch_size, 3, 224, 224)
+    for _ in range(warmup):
+        model(inputs)
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model(inputs)
+        latencies.append(time.perf_counter() - start)
+    return round(1000 * statistics.median(latencies), 3)
+
+
+def profile(name: str, backbone: str, model: nn.Module, val_acc: float, batch_sizes: list[int]) -> dict:
+    latency = {f"bs{batch_size}": measure_latency(model, batch_size) for batch_size in batch_sizes}
+    return {
+        "name": name,
+        "backbone": backbone,
+        "val_acc": round(val_acc, 4),
+        "params_m": round(sum(p.numel() for p in model.parameters()) / 1e6, 2),
+        "cpu_latency_ms": latency,
+        "cpu_images_per_sec": {key: round(1000 * int(key[2:]) / ms, 1) for key, ms in latency.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distill a Plant Disease classifier into a MobileNetV3 student")
+    parser.add_argument("--teacher-path", type=str, required=True)
+    parser.add_argument("--student", type=str, default="mobilenet_v3_large", choices=STUDENTS)
+    parser.add_argument("--output-path", type=str, default=None, help="Default: <student>.pth next to the teacher")
+    parser.add_argument("--data-dir", type=str, default="data/PlantVillage")
+    parser.add_argument("--cache-dir", type=str, default=None)
+    parser.add_argument("--split-file", type=str, default=None, help="Defaults to the teacher's split file")
+    parser.add_argument("--val-split", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--epochs", type=int, default=15)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--lr", type=float, default=2e-3)
+    parser.add_argument("--weight-decay", type=float, default=1e-4)
+    parser.add_argument("--temperature", type=float, default=4.0)
+    parser.add_argument("--alpha", type=float, default=0.7, help="Weight of the soft-target loss")
+    parser.add_argument("--num-workers", type=int, default=4)
+    parser.add_argument("--bf16", action="store_true")
+    parser.add_argument("--channels-last", action="store_true")
+    parser.add_argument("--latency-batch-sizes", type=str, default="1,16")
+    args = parser.parse_args()
+
+    torch.manual_seed(args.seed)
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    print(f"Using device: {device}")
+
+    checkpoint = classifier.load_checkpoint(args.teacher_path, "cpu")
+    num_classes, class_names = checkpoint["num_classes"], checkpoint["class_names"]
+    teacher = classifier.build_model(num_classes, checkpoint["backbone"])
+    teacher.load_state_dict(checkpoint["model_state_dict"])
+    teacher.to(device).eval()
+    teacher.requires_grad_(False)
+
+    split_file = args.split_file or checkpoint.get("split_file") or DEFAULT_SPLIT_FILE
+    train_loader, val_loader, split_classes = get_dataloaders(
+        data_dir=args.data_dir,
+        batch_size=args.batch_size,
+        val_split=args.val_split,
+        num_workers=args.num_workers,
+        cache_dir=args.cache_dir,
+        split_file=split_file,
+        seed=args.seed,
+    )
+    if split_classes != class_names:
+        raise SystemExit(f"The classes of {split_file} do not match the teacher's")
+
+    student = build_model(num_classes, args.student).to(device)
+    if args.channels_last:
+        teacher = teacher.to(memory_format=torch.channels_last)
+        student = student.to(memory_format=torch.channels_last)
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.AdamW(student.parameters(), lr=args.lr, weight_decay=args.weight_decay)
+    scheduler = optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=args.epochs)
+
+    _, teacher_acc = validate(teacher, val_loader, criterion, device, bf16=args.bf16, channels_last=args.channels_last)
+    print(f"Teacher ({checkpoint['backbone']}) validation accuracy: {teacher_acc:.4f}")
+
+    output_path = Path(args.output_path or Path(args.teacher_path).with_name(f"{args.student}.pth"))
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    best_val_acc = 0.0
+    history = []
+
+    print(f"\nDistilling {checkpoint['backbone']} into {args.student} for {args.epochs} epochs")
+    print(f"{'='*60}")
+
+    for epoch in range(args.epochs):
+        start = time.time()
+        with PeakMemory(device) as memory:
+            train_loss, train_acc = distill_one_epoch(
+                student,
+                teacher,
+                train_loader,
+                optimizer,
+                device,
+                args.temperature,
+                args.alpha,
+                bf16=args.bf16,
+                channels_last=args.channels_last,
+            )
+            train_seconds = time.time() - start
+            val_loss, val_acc = validate(
+                student, val_loader, criterion, device, bf16=args.bf16, channels_last=args.channels_last
+            )
+        scheduler.step()
+
+        elapsed = time.time() - start
+        lr = optimizer.param_groups[0]["lr"]
+        images_per_sec = len(train_loader.dataset) / train_seconds
+        print(
+            f"Epoch {epoch + 1:3d}/{args.epochs} | "
+            f"Train Loss: {train_loss:.4f}  Acc: {train_acc:.4f} | "
+            f"Val Loss: {val_loss:.4f}  Acc: {val_acc:.4f} | "
+            f"LR: {lr:.6f} | {elapsed:.1f}s | {images_per_sec:.1f} img/s"
+        )
+        history.append(
+            {
+                "epoch": epoch + 1,
+                "train_loss": train_loss,
+                "train_acc": train_acc,
+                "val_loss": val_loss,
+                "val_acc": val_acc,
+                "lr": lr,
+                "epoch_seconds": round(elapsed, 2),
+                "train_images_per_sec": round(images_per_sec, 1),
+                "peak_memory_mb": memory.mb,
+            }
+        )
+
+        if val_acc > best_val_acc:
+            best_val_acc = val_acc
+            torch.save(
+                {
+                    "model_state_dict": student.state_dict(),
+                    "class_names": class_names,
+                    "backbone": args.student,
+                    "num_classes": num_classes,
+                    "epoch": epoch + 1,
+                    "val_acc": val_acc,
+                    "split_file": split_file,
+                    "teacher": {"path": args.teacher_path, "backbone": checkpoint["backbone"], "val_acc": teacher_acc},
+                    "distillation": {"temperature": args.temperature, "alpha": args.alpha},
+                },
+                output_path,
+            )
+            print(f"    -> Saved best student (val_acc: {val_acc:.4f})")
+
+    print(f"\n{'='*60}")
+    print(f"Distillation complete. Best student validation accuracy: {best_val_acc:.4f}")
+
+    student_checkpoint = torch.load(output_path, map_location=device, weights_only=True)
+    student.load_state_dict(student_checkpoint["model_state_dict"])
+    student_checkpoint["ood_stats"] = compute_ood_stats(student, val_loader, device, num_classes)
+    torch.save(student_checkpoint, output_path)
+    print(f"OOD statistics saved to {output_path}")
+
+    batch_sizes = [int(size) for size in args.latency_batch_sizes.split(",")]
+    teacher = teacher.to(memory_format=torch.contiguous_format)
+    student = student.to(memory_format=torch.contiguous_format)
+    models = [
+        profile("teacher", checkpoint["backbone"], teacher, teacher_acc, batch_sizes),
+        profile("student", args.student, student, best_val_acc, batch_sizes),
+    ]
+    first = f"bs{batch_sizes[0]}"
+    report = {
+        "teacher": models[0],
+        "student": models[1],
+        "accuracy_delta": round(models[1]["val_acc"] - models[0]["val_acc"], 4),
+        "param_ratio": round(models[0]["params_m"] / models[1]["params_m"], 2),
+        "cpu_speedup": {
+            key: round(models[0]["cpu_latency_ms"][key] / models[1]["cpu_latency_ms"][key], 2)
+            for key in models[0]["cpu_latency_ms"]
+        },
+        "torch_threads": torch.get_num_threads(),
+    }
+
+    print(f"\n{'Model':<10} {'Backbone':<20} {'Val acc':>8} {'Params (M)':>11} {f'CPU ms ({first})':>14}")
+    for entry in models:
+        print(
+            f"{entry['name']:<10} {entry['backbone']:<20} {entry['val_acc']:>8.4f} {entry['params_m']:>11.2f} "
+            f"{entry['cpu_latency_ms'][first]:>14.2f}"
+        )
+    print(
+        f"Student: {report['cpu_speedup'][first]:.1f}x faster at {first}, "
+        f"{report['param_ratio']:.1f}x fewer parameters, accuracy {report['accuracy_delta']:+.4f}"
+    )
+
+    report_path = output_path.with_name("distillation_report.json")
+    report_path.write_text(json.dumps(report, indent=2))
+    with open(output_path.with_name("distillation_history.json"), "w") as f:
+        json.dump(history, f, indent=2)
+    print(f"Report saved to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
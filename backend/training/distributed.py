@@ -0,0 +1,61 @@
+"""
+Process-group setup for data-parallel training launched with torchrun.
+
+torchrun sets RANK, WORLD_SIZE, LOCAL_RANK and LOCAL_WORLD_SIZE for every
+process; without them everything here is a no-op and training runs in a
+single process as before.
+"""
+
+import os
+from typing import NamedTuple
+
+import torch
+import torch.distributed as dist
+
+
+class DistInfo(NamedTuple):
+    rank: int
+    world_size: int
+    local_rank: int
+
+    @property
+    def enabled(self) -> bool:
+        return self.world_size > 1
+
+
+def setup_distributed(backend: str = "gloo", threads_per_process: int | None = None) -> DistInfo:
+    """Join the process group torchrun started, if any.
+
+    torchrun pins every process to one intra-op thread by default, which
+    leaves most of a CPU node idle; the cores are split evenly between the
+    local processes instead, unless ``threads_per_process`` is given.
+    """
+    world_size = int(os.environ.get("WORLD_SIZE", 1))
+    if world_size <= 1:
+        return DistInfo(0, 1, 0)
+
+    dist.init_process_group(backend=backend)
+    local_world_size = int(os.environ.get("LOCAL_WORLD_SIZE", world_size))
+    torch.set_num_threads(threads_per_process or max(1, (os.cpu_count() or 1) // local_world_size))
+    return DistInfo(dist.get_rank(), world_size, int(os.environ.get("LOCAL_RANK", 0)))
+
+
+def is_main_process() -> bool:
+    return not dist.is_initialized() or dist.get_rank() == 0
+
+
+def all_reduce_sum(tensor: torch.Tensor) -> torch.Tensor:
+    """Sum ``tensor`` over all processes in place (a no-op without a process group)."""
+    if dist.is_initialized():
+        dist.all_reduce(tensor, op=dist.ReduceOp.SUM)
+    return tensor
+
+
+def barrier() -> None:
+    if dist.is_initialized():
+        dist.barrier()
+
+
+def cleanup_distributed() -> None:
+    if dist.is_initialized():
+        dist.destroy_process_group()
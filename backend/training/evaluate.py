@@ -1,6 +1,9 @@
 """
 Evaluation script for the trained Plant Disease model.
 
+By default the validation split the checkpoint was trained with is
+evaluated (its "split_file"); --split all evaluates every image in --data-dir.
+
 Usage:
     python -m training.evaluate --model-path models/saved/plant_disease_model.pth --data-dir data/PlantVillage
 """
@@ -12,12 +15,21 @@ from pathlib import Path
 
 import torch
 from torch.utils.data import DataLoader
-from torchvision import datasets, transforms
+from torchvision import datasets
 
 from app.models.classifier import build_model
-
-
-def evaluate(model_path: str, data_dir: str, batch_size: int = 32, num_workers: int = 4):
+from training.dataset import CACHED_VAL_TRANSFORMS, VAL_TRANSFORMS, split_dataset
+
+
+def evaluate(
+    model_path: str,
+    data_dir: str,
+    batch_size: int = 32,
+    num_workers: int = 4,
+    split_file: str | None = None,
+    split: str = "val",
+    cache_dir: str | None = None,
+):
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     print(f"Using device: {device}")
 
@@ -31,16 +43,17 @@ def evaluate(model_path: str, data_dir: str, batch_size: int = 32, num_workers:
     model.to(device)
     model.eval()
 
-    val_transforms = transforms.Compose(
-        [
-            transforms.Resize(256),
-            transforms.CenterCrop(224),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-        ]
-    )
-
-    dataset = datasets.ImageFolder(root=data_dir, transform=val_transforms)
+    split_file = split_file or checkpoint.get("split_file")
+    if split == "all" or split_file is None:
+        split = "all"
+        dataset = datasets.ImageFolder(root=data_dir, transform=VAL_TRANSFORMS)
+    else:
+        with open(split_file) as f:
+            manifest = json.load(f)
+        # Validation transforms for either split: no augmentation when measuring accuracy.
+        transform = CACHED_VAL_TRANSFORMS if cache_dir else VAL_TRANSFORMS
+        dataset = split_dataset(manifest, split, data_dir, cache_dir, transform)
+    print(f"Evaluating {len(dataset)} images ({split} split{f' of {split_file}' if split != 'all' else ''})")
     loader = DataLoader(dataset, batch_size=batch_size, shuffle=False, num_workers=num_workers)
 
     class_correct = defaultdict(int)
@@ -77,6 +90,8 @@ def evaluate(model_path: str, data_dir: str, batch_size: int = 32, num_workers:
         print(f"{cls:<55} {acc:>10.4f} {correct:>10} {total:>8}")
 
     results = {
+        "split": split,
+        "split_file": split_file if split != "all" else None,
         "overall_accuracy": overall_acc,
         "total_correct": total_correct,
         "total_samples": total_samples,
@@ -92,12 +107,23 @@ def evaluate(model_path: str, data_dir: str, batch_size: int = 32, num_workers:
 def main():
     parser = argparse.ArgumentParser(description="Evaluate Plant Disease Model")
     parser.add_argument("--model-path", type=str, required=True)
-    parser.add_argument("--data-dir", type=str, required=True)
+    parser.add_argument("--data-dir", type=str, default="data/PlantVillage")
     parser.add_argument("--batch-size", type=int, default=32)
     parser.add_argument("--num-workers", type=int, default=4)
+    parser.add_argument("--split-file", type=str, default=None, help="Defaults to the checkpoint's split file")
+    parser.add_argument("--split", type=str, default="val", choices=["train", "val", "all"])
+    parser.add_argument("--cache-dir", type=str, default=None, help="Read images from a training.build_cache cache")
     args = parser.parse_args()
 
-    evaluate(args.model_path, args.data_dir, args.batch_size, args.num_workers)
+    evaluate(
+        args.model_path,
+        args.data_dir,
+        args.batch_size,
+        args.num_workers,
+        split_file=args.split_file,
+        split=args.split,
+        cache_dir=args.cache_dir,
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,229 @@
+"""
+Export a trained checkpoint to the optimized CPU inference backends and check
+their accuracy against the eager model.
+
+Usage:
+    python -m training.export --model-path models/saved/plant_disease_model.pth \
+        --backends torchscript static_int8 onnx --data-dir data/PlantVillage
+
+Artifacts are written next to the checkpoint (see app.models.backends.artifact_path)
+and selected at serving time with PDV_INFERENCE_BACKEND. With --data-dir (or
+--cache-dir), static int8 is calibrated on images of the checkpoint's train
+split and accuracy is checked on its validation split. Without either, both
+use random inputs and the check only reports agreement with the eager model.
+"""
+
+import argparse
+import copy
+import json
+import time
+from pathlib import Path
+
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader, Subset
+
+from app.models.backends import (
+    ARTIFACT_SUFFIXES,
+    BACKENDS,
+    OnnxRuntimeModel,
+    artifact_path,
+    quantize_dynamic_int8,
+)
+from app.models.classifier import checkpoint_model, load_checkpoint
+from training.dataset import (
+    CACHED_VAL_TRANSFORMS,
+    DEFAULT_SEED,
+    DEFAULT_SPLIT_FILE,
+    VAL_TRANSFORMS,
+    load_split,
+    split_dataset,
+)
+
+
+def load_checkpoint_model(model_path: str, backbone: str | None = None) -> tuple[nn.Module, dict]:
+    """The eager model of any checkpoint the app can serve (.pth, .safetensors or a bare state dict)."""
+    checkpoint = load_checkpoint(model_path, "cpu")
+    return checkpoint_model(checkpoint, backbone), checkpoint
+
+
+def random_batches(num_samples: int, batch_size: int) -> list[tuple[torch.Tensor, None]]:
+    generator = torch.Generator().manual_seed(0)
+    return [
+        (torch.randn(min(batch_size, num_samples - start), 3, 224, 224, generator=generator), None)
+        for start in range(0, num_samples, batch_size)
+    ]
+
+
+def get_batches(
+    split: dict, name: str, data_dir: str, cache_dir: str | None, num_samples: int, batch_size: int
+) -> list[tuple[torch.Tensor, torch.Tensor]]:
+    """A seeded sample of ``num_samples`` images of one split, without augmentation."""
+    transform = CACHED_VAL_TRANSFORMS if cache_dir else VAL_TRANSFORMS
+    dataset = split_dataset(split, name, data_dir, cache_dir, transform)
+    generator = torch.Generator().manual_seed(0)
+    indices = torch.randperm(len(dataset), generator=generator)[:num_samples].tolist()
+    loader = DataLoader(Subset(dataset, indices), batch_size=batch_size, shuffle=False)
+    return list(loader)
+
+
+def export_torchscript(model: nn.Module, example: torch.Tensor, path: Path) -> None:
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example)
+        traced = torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+    traced.save(str(path))
+
+
+def export_static_int8(model: nn.Module, calibration: list[torch.Tensor], path: Path) -> None:
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    torch.backends.quantized.engine = "x86" if "x86" in torch.backends.quantized.supported_engines else "fbgemm"
+    qconfig_mapping = get_default_qconfig_mapping(torch.backends.quantized.engine)
+    prepared = prepare_fx(copy.deepcopy(model), qconfig_mapping, example_inputs=(calibration[0],))
+    with torch.no_grad():
+        for images in calibration:
+            prepared(images)
+    quantized = convert_fx(prepared)
+    with torch.no_grad():
+        traced = torch.jit.trace(quantized, calibration[0])
+        traced = torch.jit.freeze(traced)
+    traced.save(str(path))
+
+
+def export_onnx(model: nn.Module, example: torch.Tensor, path: Path) -> None:
+    torch.onnx.export(
+        model,
+        example,
+        str(path),
+        input_names=["input"],
+        output_names=["logits"],
+        dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=17,
+    )
+
+
+def load_exported(backend: str, model: nn.Module, path: Path):
+    if backend == "eager":
+        return model
+    if backend == "compile":
+        return torch.compile(copy.deepcopy(model), dynamic=True)
+    if backend == "dynamic_int8":
+        return quantize_dynamic_int8(copy.deepcopy(model))
+    if backend == "onnx":
+        return OnnxRuntimeModel(path)
+    return torch.jit.load(str(path), map_location="cpu")
+
+
+@torch.no_grad()
+def compare(reference: nn.Module, candidate, batches: list) -> dict:
+    agree = 0
+    correct = 0
+    reference_correct = 0
+    labelled = 0
+    total = 0
+    max_prob_delta = 0.0
+    elapsed = 0.0
+
+    for images, labels in batches:
+        ref_probs = reference(images).softmax(dim=1)
+        start = time.perf_counter()
+        logits = candidate(images)
+        elapsed += time.perf_counter() - start
+        probs = logits.float().softmax(dim=1)
+
+        agree += (probs.argmax(1) == ref_probs.argmax(1)).sum().item()
+        max_prob_delta = max(max_prob_delta, (probs - ref_probs).abs().max().item())
+        total += images.size(0)
+        if labels is not None:
+            correct += (probs.argmax(1) == labels).sum().item()
+            reference_correct += (ref_probs.argmax(1) == labels).sum().item()
+            labelled += labels.size(0)
+
+    report = {
+        "top1_agreement": agree / total,
+        "max_prob_delta": max_prob_delta,
+        "images_per_sec": total / elapsed if elapsed > 0 else None,
+    }
+    if labelled:
+        report["accuracy"] = correct / labelled
+        report["accuracy_delta"] = (correct - reference_correct) / labelled
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export classifier to optimized inference backends")
+    parser.add_argument("--model-path", type=str, required=True)
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        default=["torchscript", "static_int8", "onnx"],
+        choices=[b for b in BACKENDS if b != "eager"],
+    )
+    parser.add_argument("--data-dir", type=str, default=None, help="ImageFolder used for calibration and checks")
+    parser.add_argument("--cache-dir", type=str, default=None, help="Pre-decoded cache to read the images from")
+    parser.add_argument("--split-file", type=str, default=None, help="Defaults to the checkpoint's split file")
+    parser.add_argument("--val-split", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--backbone", type=str, default=None, help="For checkpoints that do not record one")
+    parser.add_argument("--num-samples", type=int, default=512, help="Validation images for the accuracy check")
+    parser.add_argument("--calibration-batches", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.01)
+    args = parser.parse_args()
+
+    model, checkpoint = load_checkpoint_model(args.model_path, args.backbone)
+    calibration_samples = args.calibration_batches * args.batch_size
+    if args.data_dir is None and args.cache_dir is None:
+        batches = random_batches(args.num_samples, args.batch_size)
+        calibration = [images for images, _ in random_batches(calibration_samples, args.batch_size)]
+    else:
+        split_file = args.split_file or checkpoint.get("split_file") or DEFAULT_SPLIT_FILE
+        data_dir = args.data_dir or "data/PlantVillage"
+        split = load_split(split_file, data_dir, args.val_split, args.seed, args.cache_dir)
+        print(f"Calibrating on the train split and checking on the val split of {split_file}")
+        batches = get_batches(split, "val", data_dir, args.cache_dir, args.num_samples, args.batch_size)
+        calibration = [
+            images
+            for images, _ in get_batches(split, "train", data_dir, args.cache_dir, calibration_samples, args.batch_size)
+        ]
+    example = batches[0][0][:1]
+
+    eager_report = compare(model, model, batches)
+    print(f"eager: {eager_report}")
+    results = {"eager": eager_report}
+    failed = []
+
+    for backend in args.backends:
+        path = artifact_path(args.model_path, backend) if backend in ARTIFACT_SUFFIXES else None
+        start = time.perf_counter()
+        if backend == "torchscript":
+            export_torchscript(model, example, path)
+        elif backend == "static_int8":
+            export_static_int8(model, calibration, path)
+        elif backend == "onnx":
+            export_onnx(model, example, path)
+        export_time = time.perf_counter() - start
+
+        report = compare(model, load_exported(backend, model, path), batches)
+        report["export_seconds"] = export_time
+        report["artifact"] = str(path) if path else None
+        results[backend] = report
+        print(f"{backend}: {report}")
+
+        drop = -report.get("accuracy_delta", report["top1_agreement"] - 1.0)
+        if drop > args.max_accuracy_drop:
+            failed.append(backend)
+            print(f"    !! {backend} exceeds the allowed accuracy drop ({drop:.4f} > {args.max_accuracy_drop})")
+
+    output_path = Path(args.model_path).parent / "export_report.json"
+    with open(output_path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nReport saved to {output_path}")
+
+    if failed:
+        raise SystemExit(f"Accuracy check failed for: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Compute out-of-distribution statistics for a trained checkpoint.
+
+Stores per-class feature means, the shared feature precision matrix and the
+in-distribution score distribution of every OOD method under "ood_stats" in
+the checkpoint. This is what the PDV_OOD_GUARD serving mode reads.
+training.train runs this automatically on the best checkpoint.
+
+Only the validation split of the checkpoint's split manifest is scored:
+training images score as more in-distribution than unseen ones, which would
+bias the thresholds toward accepting.
+
+Usage:
+    python -m training.ood --model-path models/saved/plant_disease_model.pth --data-dir data/PlantVillage
+"""
+
+import argparse
+import json
+
+import torch
+from torch.utils.data import DataLoader
+
+from app.config import settings
+from app.models.classifier import checkpoint_model, forward_with_features, load_checkpoint
+from app.utils.ood import OOD_METHODS, ood_score
+from training.convert_checkpoint import save_checkpoint
+from training.dataset import CACHED_VAL_TRANSFORMS, VAL_TRANSFORMS, split_dataset
+
+
+@torch.no_grad()
+def compute_ood_stats(model: torch.nn.Module, loader, device: torch.device, num_classes: int) -> dict:
+    model.eval()
+    all_logits, all_features, all_labels = [], [], []
+    for images, labels in loader:
+        logits, features = forward_with_features(model, images.to(device))
+        all_logits.append(logits.float().cpu())
+        all_features.append(features.float().cpu())
+        all_labels.append(labels)
+
+    logits = torch.cat(all_logits)
+    features = torch.cat(all_features).double()
+    labels = torch.cat(all_labels)
+
+    class_means = torch.stack([features[labels == c].mean(dim=0) for c in range(num_classes)])
+    centered = features - class_means[labels]
+    covariance = centered.T @ centered / len(features)
+    precision = torch.linalg.pinv(covariance, hermitian=True)
+
+    class_means, precision = class_means.float(), precision.float()
+    scores = {
+        method: ood_score(method, logits, features.float(), class_means, precision).sort().values
+        for method in OOD_METHODS
+    }
+    return {"class_means": class_means, "precision": precision, "scores": scores}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add OOD statistics to a Plant Disease checkpoint")
+    parser.add_argument("--model-path", type=str, required=True)
+    parser.add_argument("--data-dir", type=str, required=True)
+    parser.add_argument("--cache-dir", type=str, default=None)
+    parser.add_argument("--split-file", type=str, default=None, help="Defaults to the checkpoint's split file")
+    parser.add_argument("--backbone", type=str, default=None, help="For checkpoints that do not record one")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--num-workers", type=int, default=4)
+    args = parser.parse_args()
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    checkpoint = load_checkpoint(args.model_path, "cpu")
+    model = checkpoint_model(checkpoint, args.backbone)
+    model.to(device)
+    num_classes = checkpoint.get("num_classes", settings.num_classes)
+
+    split_file = args.split_file or checkpoint.get("split_file")
+    if split_file is None:
+        raise SystemExit("The checkpoint records no split file; pass the --split-file it was trained with")
+    with open(split_file) as f:
+        split = json.load(f)
+    transform = CACHED_VAL_TRANSFORMS if args.cache_dir else VAL_TRANSFORMS
+    dataset = split_dataset(split, "val", args.data_dir, args.cache_dir, transform)
+    loader = DataLoader(dataset, batch_size=args.batch_size, shuffle=False, num_workers=args.num_workers)
+
+    checkpoint["ood_stats"] = compute_ood_stats(model, loader, device, num_classes)
+    save_checkpoint(checkpoint, args.model_path)
+    print(f"OOD statistics from {len(dataset)} validation images of {split_file} saved to {args.model_path}")
+
+
+if __name__ == "__main__":
+    main()
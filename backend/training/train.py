@@ -3,19 +3,33 @@ Training script for the Plant Disease Classification model.
 
 Usage:
     python -m training.train --data-dir data/PlantVillage --epochs 20 --backbone efficientnet_b0
+    python -m training.train --cache-dir data/cache/plantvillage-256 --epochs 20
+    python -m training.train --cache-dir data/cache/plantvillage-256 --bf16 --channels-last --compile \
+        --grad-accum-steps 2 --persistent-workers --prefetch-factor 4
+    torchrun --standalone --nproc-per-node 4 -m training.train --cache-dir data/cache/plantvillage-256
 """
 
 import argparse
+import contextlib
 import json
+import threading
 import time
 from pathlib import Path
 
 import torch
 import torch.nn as nn
 import torch.optim as optim
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import DataLoader, DistributedSampler
 from torchvision import models
 
-from training.dataset import get_dataloaders
+from app.utils.memory import memory_usage
+from training.dataset import DEFAULT_SEED, DEFAULT_SPLIT_FILE, get_dataloaders, load_split
+from training.distributed import all_reduce_sum, barrier, cleanup_distributed, is_main_process, setup_distributed
+from training.ood import compute_ood_stats
+
+
+BACKBONES = ("efficientnet_b0", "resnet50", "mobilenet_v3_small", "mobilenet_v3_large")
 
 
 def build_model(num_classes: int, backbone: str = "efficientnet_b0") -> nn.Module:
@@ -25,43 +39,114 @@ def build_model(num_classes: int, backbone: str = "efficientnet_b0") -> nn.Modul
     elif backbone == "resnet50":
         model = models.resnet50(weights=models.ResNet50_Weights.IMAGENET1K_V2)
         model.fc = nn.Linear(model.fc.in_features, num_classes)
+    elif backbone == "mobilenet_v3_small":
+        model = models.mobilenet_v3_small(weights=models.MobileNet_V3_Small_Weights.IMAGENET1K_V1)
+        model.classifier[3] = nn.Linear(model.classifier[3].in_features, num_classes)
+    elif backbone == "mobilenet_v3_large":
+        model = models.mobilenet_v3_large(weights=models.MobileNet_V3_Large_Weights.IMAGENET1K_V2)
+        model.classifier[3] = nn.Linear(model.classifier[3].in_features, num_classes)
     else:
         raise ValueError(f"Unsupported backbone: {backbone}")
     return model
 
 
+def _autocast(device: torch.device, bf16: bool):
+    return torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=bf16)
+
+
+def _to_device(images, labels, device: torch.device, channels_last: bool):
+    memory_format = torch.channels_last if channels_last else torch.contiguous_format
+    images = images.to(device, memory_format=memory_format, non_blocking=True)
+    return images, labels.to(device, non_blocking=True)
+
+
+class PeakMemory:
+    """Peak memory while the ``with`` block runs, as ``.mb``.
+
+    On CUDA this is peak allocated device memory. On CPU the RSS of this
+    process is sampled every ``interval`` seconds; DataLoader worker
+    processes are not included.
+    """
+
+    def __init__(self, device: torch.device, interval: float = 0.05):
+        self.device = device
+        self.interval = interval
+        self.mb = 0.0
+        self._peak = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._peak = max(self._peak, memory_usage()["rss"])
+
+    def __enter__(self) -> "PeakMemory":
+        if self.device.type == "cuda":
+            torch.cuda.reset_peak_memory_stats(self.device)
+        else:
+            self._peak = memory_usage()["rss"]
+            self._thread = threading.Thread(target=self._sample, name="peak-memory", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self.device.type == "cuda":
+            peak = torch.cuda.max_memory_allocated(self.device)
+        else:
+            self._stop.set()
+            self._thread.join()
+            peak = max(self._peak, memory_usage()["rss"])
+        self.mb = round(peak / 2**20, 1)
+
+
 def train_one_epoch(
     model: nn.Module,
     loader,
     criterion,
     optimizer,
     device: torch.device,
+    bf16: bool = False,
+    channels_last: bool = False,
+    grad_accum_steps: int = 1,
+    max_batches: int | None = None,
 ) -> tuple[float, float]:
+    """One pass over ``loader`` (or its first ``max_batches``); loss and accuracy over all processes."""
     model.train()
-    running_loss = 0.0
-    correct = 0
+    # Accumulated on the device, so there is no host sync per batch.
+    running_loss = torch.zeros((), device=device)
+    correct = torch.zeros((), device=device)
     total = 0
+    num_batches = min(len(loader), max_batches or len(loader))
+    # The DDP module under a torch.compile wrapper.
+    ddp = getattr(model, "_orig_mod", model)
 
+    optimizer.zero_grad(set_to_none=True)
     for batch_idx, (images, labels) in enumerate(loader):
-        images, labels = images.to(device), labels.to(device)
-
-        optimizer.zero_grad()
-        outputs = model(images)
-        loss = criterion(outputs, labels)
-        loss.backward()
-        optimizer.step()
-
-        running_loss += loss.item() * images.size(0)
-        _, predicted = outputs.max(1)
+        if batch_idx == num_batches:
+            break
+        images, labels = _to_device(images, labels, device, channels_last)
+        step = (batch_idx + 1) % grad_accum_steps == 0 or batch_idx + 1 == num_batches
+
+        # DDP all-reduces gradients only on the batch that steps the optimizer.
+        accumulating = not step and isinstance(ddp, DistributedDataParallel)
+        with ddp.no_sync() if accumulating else contextlib.nullcontext():
+            with _autocast(device, bf16):
+                outputs = model(images)
+                loss = criterion(outputs, labels)
+            (loss / grad_accum_steps).backward()
+
+        if step:
+            optimizer.step()
+            optimizer.zero_grad(set_to_none=True)
+
+        running_loss += loss.detach() * images.size(0)
+        correct += outputs.argmax(1).eq(labels).sum()
         total += labels.size(0)
-        correct += predicted.eq(labels).sum().item()
 
-        if (batch_idx + 1) % 50 == 0:
-            print(f"    Batch {batch_idx + 1}/{len(loader)} — Loss: {loss.item():.4f}")
+        if (batch_idx + 1) % 50 == 0 and is_main_process():
+            print(f"    Batch {batch_idx + 1}/{num_batches} — Loss: {loss.item():.4f}")
 
-    epoch_loss = running_loss / total
-    epoch_acc = correct / total
-    return epoch_loss, epoch_acc
+    return _reduce_metrics(running_loss, correct, total, device)
 
 
 @torch.no_grad()
@@ -70,79 +155,177 @@ def validate(
     loader,
     criterion,
     device: torch.device,
+    bf16: bool = False,
+    channels_last: bool = False,
 ) -> tuple[float, float]:
     model.eval()
-    running_loss = 0.0
-    correct = 0
+    running_loss = torch.zeros((), device=device)
+    correct = torch.zeros((), device=device)
     total = 0
 
     for images, labels in loader:
-        images, labels = images.to(device), labels.to(device)
-        outputs = model(images)
-        loss = criterion(outputs, labels)
+        images, labels = _to_device(images, labels, device, channels_last)
+        with _autocast(device, bf16):
+            outputs = model(images)
+            loss = criterion(outputs, labels)
 
-        running_loss += loss.item() * images.size(0)
-        _, predicted = outputs.max(1)
+        running_loss += loss.float() * images.size(0)
+        correct += outputs.argmax(1).eq(labels).sum()
         total += labels.size(0)
-        correct += predicted.eq(labels).sum().item()
 
-    epoch_loss = running_loss / total
-    epoch_acc = correct / total
-    return epoch_loss, epoch_acc
+    return _reduce_metrics(running_loss, correct, total, device)
+
+
+def _reduce_metrics(running_loss: torch.Tensor, correct: torch.Tensor, total: int, device: torch.device):
+    """Mean loss and accuracy over every process's batches."""
+    sums = all_reduce_sum(torch.stack([running_loss.float(), correct, torch.tensor(float(total), device=device)]))
+    loss_sum, correct_sum, count = sums.tolist()
+    return loss_sum / count, correct_sum / count
 
 
 def main():
     parser = argparse.ArgumentParser(description="Train Plant Disease Classifier")
     parser.add_argument("--data-dir", type=str, default="data/PlantVillage")
-    parser.add_argument("--backbone", type=str, default="efficientnet_b0", choices=["efficientnet_b0", "resnet50"])
+    parser.add_argument("--backbone", type=str, default="efficientnet_b0", choices=BACKBONES)
     parser.add_argument("--epochs", type=int, default=20)
     parser.add_argument("--batch-size", type=int, default=32)
     parser.add_argument("--lr", type=float, default=1e-3)
     parser.add_argument("--weight-decay", type=float, default=1e-4)
     parser.add_argument("--output-dir", type=str, default="models/saved")
     parser.add_argument("--num-workers", type=int, default=4)
+    parser.add_argument(
+        "--cache-dir", type=str, default=None, help="Read images from a training.build_cache cache instead of JPEGs"
+    )
+    parser.add_argument(
+        "--split-file", type=str, default=DEFAULT_SPLIT_FILE, help="Train/val split manifest, created on first use"
+    )
+    parser.add_argument("--val-split", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Seeds the split and the training run")
+
+    # Throughput options; all off by default.
+    parser.add_argument("--bf16", action="store_true", help="bfloat16 autocast (fast on CPUs with AVX512-BF16/AMX)")
+    parser.add_argument("--channels-last", action="store_true", help="NHWC memory format for model and inputs")
+    parser.add_argument("--compile", action="store_true", help="torch.compile the model before training")
+    parser.add_argument(
+        "--grad-accum-steps", type=int, default=1, help="Batches per optimizer step (effective batch = batch-size x N)"
+    )
+    parser.add_argument("--persistent-workers", action="store_true", help="Keep DataLoader workers between epochs")
+    parser.add_argument("--prefetch-factor", type=int, default=None, help="Batches loaded in advance per worker")
+
+    # Distributed data parallel, used when launched with torchrun.
+    parser.add_argument("--dist-backend", type=str, default="gloo", choices=["gloo", "nccl"])
+    parser.add_argument(
+        "--threads-per-process", type=int, default=None, help="Intra-op threads (default: cores / local processes)"
+    )
+    parser.add_argument(
+        "--max-train-batches", type=int, default=None, help="Stop each epoch after N batches (benchmarks, smoke tests)"
+    )
     args = parser.parse_args()
+    if args.grad_accum_steps < 1:
+        parser.error("--grad-accum-steps must be at least 1")
+
+    dist_info = setup_distributed(args.dist_backend, args.threads_per_process)
+    try:
+        train(args, dist_info)
+    finally:
+        cleanup_distributed()
+
 
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    print(f"Using device: {device}")
+def train(args, dist_info):
+    # Per-process seed: DDP copies rank 0's weights, and each rank gets different augmentation.
+    torch.manual_seed(args.seed + dist_info.rank)
+    is_main = is_main_process()
+
+    if torch.cuda.is_available():
+        device = torch.device("cuda", dist_info.local_rank)
+        torch.cuda.set_device(device)
+    else:
+        device = torch.device("cpu")
+    if is_main:
+        print(f"Using device: {device} x {dist_info.world_size} process(es), {torch.get_num_threads()} threads each")
+
+    # Rank 0 creates the split manifest on first use; the others then read it.
+    if is_main:
+        load_split(args.split_file, args.data_dir, args.val_split, args.seed, args.cache_dir)
+    barrier()
 
     train_loader, val_loader, class_names = get_dataloaders(
         data_dir=args.data_dir,
         batch_size=args.batch_size,
+        val_split=args.val_split,
         num_workers=args.num_workers,
+        cache_dir=args.cache_dir,
+        split_file=args.split_file,
+        seed=args.seed,
+        persistent_workers=args.persistent_workers,
+        prefetch_factor=args.prefetch_factor,
+        distributed=dist_info.enabled,
     )
     num_classes = len(class_names)
 
     model = build_model(num_classes, args.backbone).to(device)
+    if args.channels_last:
+        model = model.to(memory_format=torch.channels_last)
+    # Checkpoints are saved from `model`; the DDP and compiled wrappers share its parameters.
+    # DDP goes on first so its gradient bucketing hooks are compiled with the graph.
+    train_model = model
+    if dist_info.enabled:
+        train_model = DistributedDataParallel(model, device_ids=[device.index] if device.type == "cuda" else None)
+    if args.compile:
+        train_model = torch.compile(train_model)
     criterion = nn.CrossEntropyLoss()
 
     optimizer = optim.AdamW(model.parameters(), lr=args.lr, weight_decay=args.weight_decay)
     scheduler = optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=args.epochs)
 
     output_dir = Path(args.output_dir)
-    output_dir.mkdir(parents=True, exist_ok=True)
+    if is_main:
+        output_dir.mkdir(parents=True, exist_ok=True)
 
     best_val_acc = 0.0
     history = []
 
-    print(f"\nTraining {args.backbone} for {args.epochs} epochs")
-    print(f"{'='*60}")
+    if is_main:
+        print(f"\nTraining {args.backbone} for {args.epochs} epochs")
+        print(f"{'='*60}")
 
     for epoch in range(args.epochs):
+        if isinstance(train_loader.sampler, DistributedSampler):
+            train_loader.sampler.set_epoch(epoch)
         start = time.time()
-
-        train_loss, train_acc = train_one_epoch(model, train_loader, criterion, optimizer, device)
-        val_loss, val_acc = validate(model, val_loader, criterion, device)
+        with PeakMemory(device) as memory:
+            train_loss, train_acc = train_one_epoch(
+                train_model,
+                train_loader,
+                criterion,
+                optimizer,
+                device,
+                bf16=args.bf16,
+                channels_last=args.channels_last,
+                grad_accum_steps=args.grad_accum_steps,
+                max_batches=args.max_train_batches,
+            )
+            train_seconds = time.time() - start
+            val_loss, val_acc = validate(
+                train_model, val_loader, criterion, device, bf16=args.bf16, channels_last=args.channels_last
+            )
         scheduler.step()
 
         elapsed = time.time() - start
         lr = optimizer.param_groups[0]["lr"]
+        # Images trained on by all processes together.
+        batches = min(len(train_loader), args.max_train_batches or len(train_loader))
+        images = min(len(train_loader.dataset), batches * args.batch_size * dist_info.world_size)
+        images_per_sec = images / train_seconds
+        peak_mb = memory.mb
+        if not is_main:
+            continue
 
         print(
             f"Epoch {epoch + 1:3d}/{args.epochs} | "
             f"Train Loss: {train_loss:.4f}  Acc: {train_acc:.4f} | "
             f"Val Loss: {val_loss:.4f}  Acc: {val_acc:.4f} | "
-            f"LR: {lr:.6f} | {elapsed:.1f}s"
+            f"LR: {lr:.6f} | {elapsed:.1f}s | {images_per_sec:.1f} img/s | {peak_mb:.0f} MB"
         )
 
         history.append(
@@ -153,6 +336,10 @@ def main():
                 "val_loss": val_loss,
                 "val_acc": val_acc,
                 "lr": lr,
+                "epoch_seconds": round(elapsed, 2),
+                "train_images_per_sec": round(images_per_sec, 1),
+                "peak_memory_mb": peak_mb,
+                "world_size": dist_info.world_size,
             }
         )
 
@@ -167,14 +354,29 @@ def main():
                     "num_classes": num_classes,
                     "epoch": epoch + 1,
                     "val_acc": val_acc,
+                    "split_file": args.split_file,
                 },
                 save_path,
             )
             print(f"    -> Saved best model (val_acc: {val_acc:.4f})")
 
+    if not is_main:
+        return
+
     print(f"\n{'='*60}")
     print(f"Training complete. Best validation accuracy: {best_val_acc:.4f}")
 
+    save_path = output_dir / "plant_disease_model.pth"
+    if save_path.exists():
+        checkpoint = torch.load(save_path, map_location=device, weights_only=True)
+        model.load_state_dict(checkpoint["model_state_dict"])
+        if dist_info.enabled:
+            # The statistics need every validation image, not this process's shard.
+            val_loader = DataLoader(val_loader.dataset, batch_size=args.batch_size, num_workers=args.num_workers)
+        checkpoint["ood_stats"] = compute_ood_stats(model, val_loader, device, num_classes)
+        torch.save(checkpoint, save_path)
+        print(f"OOD statistics saved to {save_path}")
+
     with open(output_dir / "training_history.json", "w") as f:
         json.dump(history, f, indent=2)
     print(f"Training history saved to {output_dir / 'training_history.json'}")
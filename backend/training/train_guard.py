@@ -0,0 +1,188 @@
+"""
+Train and calibrate a lightweight plant/non-plant guard head.
+
+A logistic head is fit on L2-normalized image embeddings from a small CLIP
+model (ViT-B/32 by default). The decision threshold is then calibrated on a
+held-out split so that at least --target-recall of real leaf photos pass. The
+script also reports agreement with the current zero-shot CLIP guard on the
+same images.
+
+Usage:
+    python -m training.train_guard --plant-dir data/PlantVillage --non-plant-dir data/NonPlant
+
+--non-plant-dir should contain everyday non-leaf photos (animals, people,
+vehicles, rooms, documents, ...), in any sub-folder layout. Serve the result
+with PDV_GUARD_TIER=clip_head and PDV_GUARD_HEAD_PATH pointing at the output.
+"""
+
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+
+import torch
+import torch.nn as nn
+from PIL import Image
+
+from app.config import settings
+from app.utils.plant_guard import PlantHead, encode_images, load_clip, load_text_embeddings, zero_shot_plant_probs
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".jfif", ".png", ".webp", ".bmp", ".gif", ".tif", ".tiff"}
+
+
+def list_images(root: str, limit: int, rng: random.Random) -> list[Path]:
+    root_path = Path(root)
+    if not root_path.exists():
+        raise FileNotFoundError(f"Image directory not found at {root_path.resolve()}")
+    paths = sorted(p for p in root_path.rglob("*") if p.suffix.lower() in IMAGE_EXTENSIONS)
+    rng.shuffle(paths)
+    return paths[:limit]
+
+
+def embed_paths(model, processor, paths: list[Path], batch_size: int) -> tuple[torch.Tensor, float]:
+    """Embed images in batches; returns (embeddings, seconds spent in CLIP)."""
+    chunks = []
+    elapsed = 0.0
+    for start in range(0, len(paths), batch_size):
+        images = [Image.open(p).convert("RGB") for p in paths[start : start + batch_size]]
+        begin = time.perf_counter()
+        chunks.append(encode_images(model, processor, images).cpu())
+        elapsed += time.perf_counter() - begin
+        if (start // batch_size + 1) % 20 == 0:
+            print(f"    Embedded {start + len(images)}/{len(paths)}")
+    return torch.cat(chunks), elapsed
+
+
+def train_head(embeds: torch.Tensor, labels: torch.Tensor, epochs: int, lr: float, weight_decay: float) -> PlantHead:
+    head = PlantHead(embeds.shape[1])
+    optimizer = torch.optim.AdamW(head.parameters(), lr=lr, weight_decay=weight_decay)
+    # Balance plant and non-plant examples regardless of how many of each we have.
+    pos_weight = (labels == 0).sum() / (labels == 1).sum().clamp(min=1)
+    criterion = nn.BCEWithLogitsLoss(pos_weight=pos_weight)
+
+    head.train()
+    for epoch in range(epochs):
+        optimizer.zero_grad()
+        loss = criterion(head.linear(embeds).squeeze(-1), labels.float())
+        loss.backward()
+        optimizer.step()
+        if (epoch + 1) % 100 == 0:
+            print(f"    Epoch {epoch + 1}/{epochs} — Loss: {loss.item():.4f}")
+    head.eval()
+    return head
+
+
+def calibrate_threshold(plant_probs: torch.Tensor, labels: torch.Tensor, target_recall: float) -> float:
+    """Highest threshold that still accepts at least target_recall of the plant images."""
+    positives = plant_probs[labels == 1].sort().values
+    index = int((1.0 - target_recall) * len(positives))
+    return float(positives[min(index, len(positives) - 1)])
+
+
+def decision_metrics(accept: torch.Tensor, labels: torch.Tensor) -> dict:
+    plant = labels == 1
+    return {
+        "accuracy": (accept == plant).float().mean().item(),
+        "plant_recall": accept[plant].float().mean().item(),
+        "non_plant_rejection": (~accept[~plant]).float().mean().item(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train a lightweight plant guard head")
+    parser.add_argument("--plant-dir", type=str, required=True)
+    parser.add_argument("--non-plant-dir", type=str, required=True)
+    parser.add_argument("--clip-model", type=str, default="openai/clip-vit-base-patch32")
+    parser.add_argument("--reference-clip", type=str, default=settings.guard_clip_model)
+    parser.add_argument("--max-per-class", type=int, default=3000)
+    parser.add_argument("--val-split", type=float, default=0.2)
+    parser.add_argument("--target-recall", type=float, default=0.99)
+    parser.add_argument("--epochs", type=int, default=500)
+    parser.add_argument("--lr", type=float, default=1e-2)
+    parser.add_argument("--weight-decay", type=float, default=1e-4)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=str, default=settings.guard_head_path)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    torch.manual_seed(args.seed)
+
+    plant_paths = list_images(args.plant_dir, args.max_per_class, rng)
+    non_plant_paths = list_images(args.non_plant_dir, args.max_per_class, rng)
+    samples = [(p, 1) for p in plant_paths] + [(p, 0) for p in non_plant_paths]
+    rng.shuffle(samples)
+    val_size = int(len(samples) * args.val_split)
+    train_samples, val_samples = samples[val_size:], samples[:val_size]
+    print(f"Guard dataset: {len(plant_paths)} plant, {len(non_plant_paths)} non-plant images")
+    print(f"  Train: {len(train_samples)} | Validation: {len(val_samples)}")
+
+    print(f"\nEmbedding with {args.clip_model}")
+    model, processor = load_clip(args.clip_model)
+    train_embeds, _ = embed_paths(model, processor, [p for p, _ in train_samples], args.batch_size)
+    val_embeds, head_seconds = embed_paths(model, processor, [p for p, _ in val_samples], args.batch_size)
+    train_labels = torch.tensor([label for _, label in train_samples])
+    val_labels = torch.tensor([label for _, label in val_samples])
+
+    print("\nTraining guard head")
+    head = train_head(train_embeds, train_labels, args.epochs, args.lr, args.weight_decay)
+    with torch.no_grad():
+        val_probs = head(val_embeds)
+    threshold = calibrate_threshold(val_probs, val_labels, args.target_recall)
+    head_accept = val_probs >= threshold
+    head_metrics = decision_metrics(head_accept, val_labels)
+    print(f"Calibrated threshold: {threshold:.4f} | {head_metrics}")
+
+    print(f"\nScoring validation split with the reference zero-shot guard ({args.reference_clip})")
+    del model
+    reference, reference_processor = load_clip(args.reference_clip)
+    device = next(reference.parameters()).device
+    text_embeds = load_text_embeddings(reference, reference_processor, device, args.reference_clip)
+    reference_embeds, reference_seconds = embed_paths(
+        reference, reference_processor, [p for p, _ in val_samples], args.batch_size
+    )
+    reference_probs = zero_shot_plant_probs(reference, text_embeds, reference_embeds.to(device)).cpu()
+    reference_accept = reference_probs >= settings.guard_plant_threshold
+    reference_metrics = decision_metrics(reference_accept, val_labels)
+
+    report = {
+        "clip_model": args.clip_model,
+        "reference_clip": args.reference_clip,
+        "threshold": threshold,
+        "target_recall": args.target_recall,
+        "val_samples": len(val_samples),
+        "head": {**head_metrics, "ms_per_image": 1000 * head_seconds / len(val_samples)},
+        "reference": {**reference_metrics, "ms_per_image": 1000 * reference_seconds / len(val_samples)},
+        "agreement": (head_accept == reference_accept).float().mean().item(),
+        "disagreements": [
+            {"path": str(path), "label": label, "head": float(h), "reference": float(r)}
+            for (path, label), h, r, a, b in zip(val_samples, val_probs, reference_probs, head_accept, reference_accept)
+            if a != b
+        ],
+    }
+    print(
+        f"Agreement with reference guard: {report['agreement']:.4f} | "
+        f"head {report['head']['ms_per_image']:.1f} ms/img vs reference {report['reference']['ms_per_image']:.1f} ms/img"
+    )
+
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    torch.save(
+        {
+            "clip_model": args.clip_model,
+            "embed_dim": train_embeds.shape[1],
+            "state_dict": head.state_dict(),
+            "threshold": threshold,
+        },
+        output_path,
+    )
+    report_path = output_path.with_name(output_path.stem + "_report.json")
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nGuard head saved to {output_path}")
+    print(f"Agreement report saved to {report_path}")
+
+
+if __name__ == "__main__":
+    main()